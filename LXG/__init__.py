@@ -1,11 +1,17 @@
+# arcpy is optional: without ArcGIS (eg. Linux compute nodes) the workflows run on the GDAL/OGR backend
 from .migration import GDB2SDE
 from .replication import AppendNewFeatures, BatchImportXML, ReplicateSDE2GDB
 from .analysis import CheckDifferences
 from .dataloader import OGRDataLoader, DataLoader
 from .assets import BRSO
+from .apis import get_backend, ConnectionManager
+from .snapshot import SnapshotStore, Snapshot
+from .frozen import FrozenRegistry
+from .verification import Verification
 from .utils import (MigrationLog,
                     ReplicationLog,
                     ToBRSO,
+                    ReprojectToBRSO,
                     ToShapefile,
                     GenerateScript,
                     TemporaryDirectory,
@@ -13,8 +19,7 @@ from .utils import (MigrationLog,
                     delete_workdir,
                     )
 
-from .tol import TOLNewFeatures, TOLReplication
+from .tol import TOLNewFeatures, TOLReplication, TOLBatch, TOLReplicaManager
 from . import _version
 
 __version__ = _version.get_versions()['version']
-
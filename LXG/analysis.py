@@ -4,19 +4,20 @@ Author : Lerry William
 
 import os
 import sys
-import arcpy
 import pandas as pd
 import numpy as np
+from .snapshot import Snapshot
 
 
 class CheckDifferences:
     """
-    dataframe input should be a merge between old data and new data
+    dataframe input should be a merge between old data and new data, a `LXG.Snapshot` stands for its
+    inventory
     """
 
     def __init__(self, dataframe_init, dataframe_new):
-        self.df1 = dataframe_init
-        self.df2 = dataframe_new
+        self.df1 = dataframe_init.inventory() if isinstance(dataframe_init, Snapshot) else dataframe_init
+        self.df2 = dataframe_new.inventory() if isinstance(dataframe_new, Snapshot) else dataframe_new
 
     def missing(self):
         merge = pd.merge(self.df1, self.df2, on='FeatureClasses', how='right')
@@ -0,0 +1,36 @@
+"""
+Geoprocessing backends, arcpy when installed and GDAL/OGR otherwise (`LXG_BACKEND` overrides it).
+
+Usage:
+    ```
+    backend = get_backend("ogr")
+    for ds in backend.list_datasets(r"/data/KCH.gdb"):
+        print(ds, backend.list_featureclasses(r"/data/KCH.gdb", "*", "Polygon", ds))
+    ```
+"""
+import os
+from .base import Backend, where_in, where_ranges, oid_ranges, basename
+from .connections import ConnectionManager
+
+
+def get_backend(backend=None):
+    """Backend instance from None (auto), a name ("arcpy", "ogr"/"gdal") or an instance"""
+    if isinstance(backend, Backend):
+        return backend
+    if backend is None:
+        backend = os.environ.get("LXG_BACKEND")
+    if backend is None:
+        try:
+            import arcpy  # noqa: F401
+            backend = "arcpy"
+        except ImportError:
+            backend = "ogr"
+
+    if backend.lower() == "arcpy":
+        from .arcpy_backend import ArcpyBackend
+        return ArcpyBackend()
+    elif backend.lower() in ("ogr", "gdal"):
+        from .ogr_backend import OGRBackend
+        return OGRBackend()
+
+    raise ValueError(f"Unknown backend {backend}, use arcpy or ogr")
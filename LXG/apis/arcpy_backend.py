@@ -0,0 +1,222 @@
+"""
+Author : Lerry William
+
+arcpy implementation of the geoprocessing backend (ArcGIS Pro / Enterprise).
+"""
+import os
+import uuid
+import arcpy
+import numpy as np
+from .base import Backend, where_in, platform_name
+
+RELATION = {"INTERSECT": "INTERSECT",
+            "WITHIN_A_DISTANCE": "WITHIN_A_DISTANCE",
+            "HAVE_THEIR_CENTER_IN": "HAVE_THEIR_CENTER_IN"}
+EXCLUDE_FIELDS = ['OBJECT_ID', 'OBJECTID', 'OBJECT_ID1', 'OBJECT_ID2', 'SHAPE']
+
+
+def _layer_name(prefix="lyr"):
+    return f"{prefix}_{uuid.uuid4().hex}"
+
+
+class ArcpyBackend(Backend):
+    name = "arcpy"
+    Error = arcpy.ExecuteError
+
+    def __init__(self, scratch="in_memory"):
+        self.scratch = scratch
+
+    def exists(self, path):
+        return arcpy.Exists(path)
+
+    def delete(self, path):
+        if arcpy.Exists(path):
+            arcpy.Delete_management(path)
+
+    def create_workspace(self, path):
+        self.delete(path)
+        arcpy.CreateFileGDB_management(os.path.dirname(path), os.path.basename(path), "9.3")
+
+        return path
+
+    def compact(self, workspace):
+        arcpy.Compact_management(workspace)
+
+    def connect(self, folder, platform, instance, username, password, database=None, name="temp.sde"):
+        platform = platform_name(platform)
+        assert platform is not None and platform != ""
+
+        conn = {"out_folder_path": folder,
+                "out_name": name,
+                "database_platform": platform,
+                "instance": instance,
+                "account_authentication": "DATABASE_AUTH",
+                "database": database if platform == "POSTGRESQL" else "",
+                "username": username,
+                "password": password,
+                "save_user_pass": "SAVE_USERNAME"}
+
+        temp_sde = os.path.join(conn["out_folder_path"], conn["out_name"])
+
+        if arcpy.Exists(temp_sde):
+            arcpy.Delete_management(temp_sde)
+
+        arcpy.CreateDatabaseConnection_management(**conn)
+
+        return temp_sde
+
+    def list_datasets(self, workspace, wildcard="*", dataset_type="Feature"):
+        arcpy.env.workspace = workspace
+        return sorted(arcpy.ListDatasets(wildcard, dataset_type) or [])
+
+    def list_featureclasses(self, workspace, wildcard="*", shape_type="All", dataset=None):
+        arcpy.env.workspace = workspace
+        return sorted(arcpy.ListFeatureClasses(wildcard, shape_type, dataset) or [])
+
+    def describe(self, featureclass):
+        desc = arcpy.Describe(featureclass)
+        return {"shape_type": getattr(desc, "shapeType", None),
+                "oid_field": desc.OIDFieldName,
+                "fields": [(f.name, f.type, f.editable) for f in arcpy.ListFields(featureclass)],
+                "spatial_reference": desc.spatialReference.exportToString() if hasattr(desc, "spatialReference") else None,
+                "xy_resolution": getattr(getattr(desc, "spatialReference", None), "XYResolution", None)}
+
+    def search(self, featureclass, fields, where=None):
+        with arcpy.da.SearchCursor(featureclass, fields, where_clause=where) as rows:
+            for row in rows:
+                yield row
+
+    def insert(self, featureclass, fields, rows):
+        shape = fields.index("SHAPE@WKB") if "SHAPE@WKB" in fields else None
+        count = 0
+        with arcpy.da.InsertCursor(featureclass, [("SHAPE@" if f == "SHAPE@WKB" else f) for f in fields]) as cursor:
+            for row in rows:
+                if shape is not None and row[shape] is not None:
+                    row = list(row)
+                    row[shape] = arcpy.FromWKB(bytearray(row[shape]))
+                cursor.insertRow(row)
+                count += 1
+
+        return count
+
+    def count(self, featureclass, where=None):
+        if where is None:
+            return int(arcpy.GetCount_management(featureclass).getOutput(0))
+        view = _layer_name("tab")
+        arcpy.MakeTableView_management(featureclass, view, where)
+        try:
+            return int(arcpy.GetCount_management(view).getOutput(0))
+        finally:
+            arcpy.Delete_management(view)
+
+    def copy(self, source, target):
+        arcpy.Copy_management(source, target)
+
+    def fieldmapping(self, fc_source, fc_target):
+        fieldMappings = arcpy.FieldMappings()
+        field_tgt = arcpy.ListFields(fc_target)
+        namelist_tgt = []
+
+        # Creating field maps for the two files
+        fieldMappings.addTable(fc_source)
+        fieldMappings.addTable(fc_target)
+
+        for fd in field_tgt:
+            if fd.name not in EXCLUDE_FIELDS and fd.type != "OID" and fd.editable is True:
+                namelist_tgt.append(fd.name)
+
+        for field in fieldMappings.fields:
+            if field.name not in namelist_tgt:
+                fieldMappings.removeFieldMap(fieldMappings.findFieldMapIndex(field.name))
+
+        return fieldMappings
+
+    def append(self, source, target, oids=None, where=None):
+        if oids is not None:
+            if len(oids) == 0:
+                return
+            where = where_in(arcpy.Describe(source).OIDFieldName, oids)
+
+        inputs = source
+        if where is not None:
+            inputs = _layer_name()
+            arcpy.MakeFeatureLayer_management(source, inputs, where)
+        try:
+            arcpy.Append_management(inputs, target, "NO_TEST", field_mapping=self.fieldmapping(inputs, target))
+        finally:
+            if inputs != source:
+                arcpy.Delete_management(inputs)
+
+    def truncate(self, featureclass):
+        # DeleteRows through a view also works on versioned data, TruncateTable does not
+        view = _layer_name("tab")
+        arcpy.MakeTableView_management(featureclass, view)
+        try:
+            arcpy.DeleteRows_management(view)
+        finally:
+            arcpy.Delete_management(view)
+
+    def delete_rows(self, featureclass, where):
+        # one DeleteRows on a view deletes in bulk, an UpdateCursor round-trips every row
+        view = _layer_name("tab")
+        arcpy.MakeTableView_management(featureclass, view, where)
+        try:
+            count = int(arcpy.GetCount_management(view).getOutput(0))
+            if count > 0:
+                arcpy.DeleteRows_management(view)
+            return count
+        finally:
+            arcpy.Delete_management(view)
+
+    def select_by_location(self, featureclass, select_features, relation="INTERSECT", distance=None,
+                           invert=False, select_oids=None):
+        in_layer = _layer_name()
+        arcpy.MakeFeatureLayer_management(featureclass, in_layer)
+        select_layer = select_features
+        if select_oids is not None:
+            select_layer = _layer_name()
+            arcpy.MakeFeatureLayer_management(select_features, select_layer,
+                                              where_in(arcpy.Describe(select_features).OIDFieldName, select_oids))
+        try:
+            arcpy.SelectLayerByLocation_management(in_layer, RELATION[relation], select_layer,
+                                                   None if distance is None else f"{distance} Meters",
+                                                   "NEW_SELECTION",
+                                                   "INVERT" if invert else "NOT_INVERT")
+            fids = arcpy.Describe(in_layer).FIDSet
+            return np.array(fids.split(";"), dtype=np.int64) if fids.strip() else np.empty(0, dtype=np.int64)
+        finally:
+            arcpy.Delete_management(in_layer)
+            if select_layer != select_features:
+                arcpy.Delete_management(select_layer)
+
+    def feature_to_point(self, featureclass, output, method="CENTROID", where=None):
+        if where is not None:
+            layer = _layer_name()
+            arcpy.MakeFeatureLayer_management(featureclass, layer, where)
+            try:
+                return self.feature_to_point(layer, output, method)
+            finally:
+                arcpy.Delete_management(layer)
+
+        if method == "CENTROID":
+            arcpy.FeatureToPoint_management(featureclass, output, "CENTROID")
+        elif method == "MIDPOINT":
+            arcpy.GeneratePointsAlongLines_management(Input_Features=featureclass,
+                                                      Output_Feature_Class=output,
+                                                      Point_Placement="PERCENTAGE",
+                                                      Distance="",
+                                                      Percentage=50,
+                                                      Include_End_Points="")
+        elif method == "COPY":
+            arcpy.CopyFeatures_management(featureclass, output)
+        else:
+            raise ValueError(f"Unknown method {method}")
+
+        return output
+
+    def scratch_path(self, name):
+        return os.path.join(self.scratch, name)
+
+    def clear_scratch(self):
+        arcpy.ClearWorkspaceCache_management()
+        arcpy.Delete_management(self.scratch)
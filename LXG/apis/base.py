@@ -0,0 +1,232 @@
+"""
+Author : Lerry William
+
+Geoprocessing backend interface, paths are `<workspace>/<dataset>/<featureclass>`.
+"""
+import os
+import re
+import logging
+import itertools
+import numpy as np
+import pandas as pd
+from ..logger import _add_message
+from ..metrics import span
+
+SHAPE_TYPES = ("Point", "Multipoint", "Polyline", "Polygon")
+# field types left out of the attribute columns of `read_batches`
+SKIP_TYPES = ("OID", "Geometry", "Blob", "Raster")
+# column names of `read_batches`
+OID = "OID"
+GEOMETRY = "geometry"
+# XY resolution (meters) of the featureclasses whose spatial reference does not tell it
+XY_RESOLUTION = 0.0001
+
+
+def xy_resolution(desc):
+    """XY resolution of a `Backend.describe`, `XY_RESOLUTION` when unknown"""
+    return desc.get("xy_resolution") or XY_RESOLUTION
+
+
+class Backend:
+    """Operations the workflows need. Subclasses implement every method below."""
+    name = None
+    # exception raised by failing geoprocessing calls
+    Error = RuntimeError
+
+    def exists(self, path):
+        raise NotImplementedError
+
+    def delete(self, path):
+        raise NotImplementedError
+
+    def create_workspace(self, path):
+        """Create an empty file geodatabase (or GeoPackage), replacing an existing one"""
+        raise NotImplementedError
+
+    def compact(self, workspace):
+        pass
+
+    def connect(self, folder, platform, instance, username, password, database=None, name="temp.sde"):
+        """Enterprise geodatabase workspace (ORACLE or POSTGRESQL), connection files are written into `folder`"""
+        raise NotImplementedError
+
+    def ping(self, workspace):
+        """True when the workspace answers, opens a session without listing anything"""
+        try:
+            self.list_datasets(workspace, "LXG_PING_*")
+            return True
+        except Exception:
+            return False
+
+    # catalog
+    def list_datasets(self, workspace, wildcard="*", dataset_type="Feature"):
+        """Sorted dataset names of a workspace (dataset_type "ALL" includes non feature datasets on arcpy)"""
+        raise NotImplementedError
+
+    def list_featureclasses(self, workspace, wildcard="*", shape_type="All", dataset=None):
+        """Sorted featureclass names, of `dataset` only when given"""
+        raise NotImplementedError
+
+    def describe(self, featureclass):
+        """dict of shape_type, oid_field, fields [(name, type, editable)], spatial_reference (WKT) and
+        xy_resolution (None when unknown)"""
+        raise NotImplementedError
+
+    # cursors
+    def search(self, featureclass, fields, where=None):
+        """Iterate over rows (tuples of `fields`)"""
+        raise NotImplementedError
+
+    def insert(self, featureclass, fields, rows):
+        """Insert rows, returns the number of rows written"""
+        raise NotImplementedError
+
+    def count(self, featureclass, where=None):
+        raise NotImplementedError
+
+    def read_batches(self, featureclass, fields=None, where=None, batch_size=65536):
+        """DataFrames of `OID`, the attribute `fields` (default all) and `geometry` (WKB bytes),
+        `batch_size` rows at a time"""
+        if fields is None:
+            fields = [name for name, ftype, _ in self.describe(featureclass)["fields"] if ftype not in SKIP_TYPES]
+        rows = self.search(featureclass, ["OID@"] + list(fields) + ["SHAPE@WKB"], where)
+        while True:
+            chunk = list(itertools.islice(rows, batch_size))
+            if not chunk:
+                return
+            df = pd.DataFrame.from_records(chunk, columns=[OID] + list(fields) + [GEOMETRY])
+            df[OID] = df[OID].astype(np.int64)
+            df[GEOMETRY] = [None if wkb is None else bytes(wkb) for wkb in df[GEOMETRY]]
+            yield df
+
+    def read(self, featureclass, fields=None, where=None):
+        """One DataFrame of `read_batches`"""
+        batches = list(self.read_batches(featureclass, fields, where))
+        if not batches:
+            return pd.DataFrame(columns=[OID] + list(fields or []) + [GEOMETRY])
+
+        return pd.concat(batches, ignore_index=True)
+
+    def centroids(self, featureclass, where=None):
+        """(oids, xy) arrays of the feature centroids, features without geometry are left out"""
+        rows = [(oid, xy) for oid, xy in self.search(featureclass, ["OID@", "SHAPE@XY"], where)
+                if xy is not None and xy[0] is not None]
+        oids = np.fromiter((oid for oid, _ in rows), dtype=np.int64, count=len(rows))
+        xy = np.array([xy for _, xy in rows], dtype=np.float64).reshape(-1, 2)
+
+        return oids, xy
+
+    # data management
+    def copy(self, source, target):
+        """Copy a featureclass or a whole feature dataset"""
+        raise NotImplementedError
+
+    def append(self, source, target, oids=None, where=None):
+        """Append rows of source into target, matching fields by name (OID and shape fields excluded)"""
+        raise NotImplementedError
+
+    def truncate(self, featureclass):
+        raise NotImplementedError
+
+    def delete_rows(self, featureclass, where):
+        """Delete rows matching `where`, returns the number of rows deleted"""
+        raise NotImplementedError
+
+    def delete_oids(self, featureclass, oids, batch_size=1000):
+        """Delete rows by OID, returns the number of rows deleted. Consecutive OIDs are sent as BETWEEN
+        ranges and every where clause holds at most `batch_size` terms."""
+        oids = np.asarray(oids, dtype=np.int64)
+        if len(oids) == 0:
+            return 0
+        oid_field = self.describe(featureclass)["oid_field"]
+
+        with span("delete", layer=basename(featureclass)) as s:
+            s.rows = sum(self.delete_rows(featureclass, where)
+                         for where in where_ranges(oid_field, oid_ranges(oids), batch_size))
+        self._deleted(featureclass, s)
+
+        return s.rows
+
+    def _deleted(self, featureclass, s):
+        self.message(f"[INFO]\tDeleted {s.rows} rows of {basename(featureclass)} "
+                     f"({s.rows / max(s.duration, 1e-9):.0f} rows/s)")
+
+    # spatial
+    def select_by_location(self, featureclass, select_features, relation="INTERSECT", distance=None,
+                           invert=False, select_oids=None):
+        """OIDs of `featureclass` INTERSECT, WITHIN_A_DISTANCE or HAVE_THEIR_CENTER_IN `select_features`,
+        a negative `distance` (meters) shrinks the selecting features"""
+        raise NotImplementedError
+
+    def feature_to_point(self, featureclass, output, method="CENTROID", where=None):
+        """Point featureclass with the attributes of `featureclass` (and ORIG_FID, the source OID).
+        method: CENTROID (polygons), MIDPOINT (lines, 50% along) or COPY (points)"""
+        raise NotImplementedError
+
+    # scratch
+    def scratch_path(self, name):
+        """Path of a temporary featureclass"""
+        raise NotImplementedError
+
+    def clear_scratch(self):
+        pass
+
+    def message(self, msg, level=logging.INFO):
+        _add_message(str(msg), level)
+
+    def error(self, e):
+        self.message(e, logging.ERROR)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+def where_in(field, values):
+    """`field IN (...)` clause, never matching for no values"""
+    if len(values) == 0:
+        return "1 = 0"
+    return f"{field} IN ({', '.join(str(int(v)) for v in values)})"
+
+
+def oid_ranges(oids):
+    """(n, 2) array of the inclusive [start, stop] runs of consecutive OIDs, duplicates and order ignored"""
+    oids = np.unique(np.asarray(oids, dtype=np.int64))
+    if len(oids) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    breaks = np.flatnonzero(np.diff(oids) != 1) + 1
+
+    return np.column_stack([oids[np.r_[0, breaks]], oids[np.r_[breaks - 1, len(oids) - 1]]])
+
+
+def where_ranges(field, ranges, max_terms=1000):
+    """Where clauses covering the OID `ranges`, each with at most `max_terms` terms (Oracle allows 1000
+    values in an IN list). Runs of 3 or more OIDs become one BETWEEN term, shorter runs IN values."""
+    terms = []
+    for start, stop in ranges:
+        if stop - start >= 2:
+            terms.append((start, stop))
+        else:
+            terms.extend((v, v) for v in range(start, stop + 1))
+
+    for i in range(0, len(terms), max_terms):
+        chunk = terms[i:i + max_terms]
+        values = [str(start) for start, stop in chunk if start == stop]
+        parts = [f"{field} BETWEEN {start} AND {stop}" for start, stop in chunk if start != stop]
+        if values:
+            parts.append(f"{field} IN ({', '.join(values)})")
+        yield " OR ".join(parts)
+
+
+def basename(path):
+    """Featureclass name without the SDE owner prefix (SDE.KCH_LOT or sde_gis.sde.KCH_LOT -> KCH_LOT)"""
+    return re.sub(r'^(\w+\.)?sde\.', '', os.path.basename(path), flags=re.IGNORECASE)
+
+
+def platform_name(platform):
+    """ORACLE / POSTGRESQL from the spellings used in the configs (oracle, postgres, ...)"""
+    if platform == "oracle":
+        return "ORACLE"
+    elif platform == "postgres":
+        return "POSTGRESQL"
+
+    return platform
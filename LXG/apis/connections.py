@@ -0,0 +1,191 @@
+"""
+Author : Lerry William
+
+Enterprise geodatabase connections cached once and shared by the workflows and their pool workers.
+
+Usage:
+    ```
+    connections = ConnectionManager(max_sessions=4)
+    sde = connections.get("ORACLE", "10.0.0.5/sde", "sde", password)
+
+    # in a pool worker, with the pickled manager
+    with connections.session(sde):
+        backend.append(source, os.path.join(sde, "SDE.KCH_LOT"))
+    ```
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+from .base import platform_name
+
+try:
+    import keyring
+except ImportError:
+    keyring = None
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+KEYRING_SERVICE = "LXG"
+
+
+def _lock(f):
+    """Non blocking exclusive lock of an open file, False when another process holds it"""
+    try:
+        if sys.platform == "win32":
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(f):
+    if sys.platform == "win32":
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class Session:
+    """Slot of a database held while the `with` block runs"""
+    def __init__(self, lock_files, timeout=600.0, poll=0.5):
+        self.lock_files = lock_files
+        self.timeout = timeout
+        self.poll = poll
+        self.file = None
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            for lock_file in self.lock_files:
+                f = open(lock_file, "a+")
+                if _lock(f):
+                    self.file = f
+                    return self
+                f.close()
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No free session after {self.timeout}s ({len(self.lock_files)} sessions in use)")
+            time.sleep(self.poll)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            _unlock(self.file)
+        finally:
+            self.file.close()
+            self.file = None
+
+
+class ConnectionManager:
+    """Cache of enterprise geodatabase connections.
+
+    Args:
+        directory (optional): folder of the connection files, default ~/.LXG_WORKSPACE/connections
+        max_sessions (optional): concurrent sessions per connection, across processes,
+            default `LXG_MAX_SESSIONS` or 4
+        backend (optional): "arcpy", "ogr" or a `LXG.apis.Backend`, default arcpy when available
+    """
+    def __init__(self, directory=None, max_sessions=None, backend=None):
+        self.directory = os.path.join(os.path.expanduser('~'), ".LXG_WORKSPACE", "connections") \
+            if directory is None else directory
+        self.max_sessions = int(os.environ.get("LXG_MAX_SESSIONS", 4)) if max_sessions is None else max_sessions
+        self.backend = backend
+        self._connections = {}
+
+    def _backend(self):
+        from . import get_backend
+        return get_backend(self.backend)
+
+    def __getstate__(self):
+        # workers rebuild their own backend, live connections are not shared between processes
+        state = self.__dict__.copy()
+        state["_connections"] = {}
+        if not isinstance(self.backend, (str, type(None))):
+            state["backend"] = self.backend.name
+        return state
+
+    @staticmethod
+    def key(platform, instance, username, database=None):
+        """Stable id of a database user, the connection file name"""
+        platform = platform_name(platform)
+        database = database if platform == "POSTGRESQL" else None
+        raw = "|".join(str(v).lower() for v in (platform, instance, database, username))
+
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def index_file(self):
+        return os.path.join(self.directory, "connections.json")
+
+    def _index(self):
+        try:
+            with open(self.index_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _register(self, key, platform, instance, username, database):
+        index = self._index()
+        index[key] = {"platform": platform_name(platform), "instance": instance,
+                      "database": database, "username": username}
+        with open(self.index_file, "w") as f:
+            json.dump(index, f, indent=2)
+
+    @staticmethod
+    def password(instance, username):
+        """Password from the environment or the system keyring, None when not found"""
+        pwd = os.environ.get("LXG_SDE_PASSWORD")
+        if pwd is None and keyring is not None:
+            pwd = keyring.get_password(KEYRING_SERVICE, f"{username}@{instance}")
+
+        return pwd
+
+    def get(self, platform, instance, username, password=None, database=None):
+        """Workspace (connection file or OGR `LXGSDE:<key>@<directory>` alias) of a database user, created when missing
+        or when the cached one does not answer anymore"""
+        key = self.key(platform, instance, username, database)
+        backend = self._backend()
+        cached = self._connections.get(key, os.path.join(self.directory, f"{key}.sde"))
+        if backend.exists(cached) and backend.ping(cached):
+            self._connections[key] = cached
+            return cached
+
+        password = self.password(instance, username) if password is None else password
+        if password is None:
+            raise ValueError(f"No password for {username}@{instance}, pass it or set LXG_SDE_PASSWORD")
+
+        os.makedirs(self.directory, exist_ok=True)
+        conn = backend.connect(self.directory, platform, instance, username, password, database, f"{key}.sde")
+        if not backend.ping(conn):
+            raise ConnectionError(f"Cannot connect to {platform_name(platform)} {instance} as {username}")
+        self._register(key, platform, instance, username, database)
+        self._connections[key] = conn
+
+        return conn
+
+    def session(self, workspace, timeout=600.0):
+        """Context manager holding a session slot of the connection `workspace`"""
+        os.makedirs(self.directory, exist_ok=True)
+        name = os.path.splitext(os.path.basename(workspace))[0] if workspace.lower().endswith(".sde") \
+            else hashlib.sha1(workspace.encode("utf-8")).hexdigest()[:16]
+
+        return Session([os.path.join(self.directory, f"{name}.{i}.lock") for i in range(self.max_sessions)], timeout)
+
+    def clear(self):
+        """Delete every cached connection file"""
+        backend = self._backend()
+        for key in self._index():
+            backend.delete(os.path.join(self.directory, f"{key}.sde"))
+        if os.path.isfile(self.index_file):
+            os.remove(self.index_file)
+        self._connections.clear()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(directory={self.directory}, max_sessions={self.max_sessions})"
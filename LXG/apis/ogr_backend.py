@@ -0,0 +1,593 @@
+"""
+Author : Lerry William
+
+GDAL/OGR implementation of the geoprocessing backend, databases are `LXGSDE:<key>@<directory>` aliases.
+"""
+import os
+import re
+import shutil
+import fnmatch
+import tempfile
+from datetime import datetime
+from urllib.parse import quote, unquote
+import numpy as np
+import pandas as pd
+from osgeo import gdal, ogr, osr
+from .base import Backend, where_in, platform_name, basename, OID, GEOMETRY
+from .connections import ConnectionManager
+from ..geometry import RaggedGeometry, feature_points
+from ..metrics import span
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+gdal.UseExceptions()
+ogr.UseExceptions()
+
+# ArrowArrayStream interface of OGR layers
+ARROW_STREAM = int(gdal.VersionInfo()) >= 3060000
+
+DRIVERS = {".gdb": "OpenFileGDB", ".gpkg": "GPKG", ".sqlite": "SQLite", ".mdb": "PGeo", ".shp": "ESRI Shapefile"}
+EXCLUDE_FIELDS = ['OBJECT_ID', 'OBJECTID', 'OBJECT_ID1', 'OBJECT_ID2', 'SHAPE', 'SHAPE_LENGTH', 'SHAPE_AREA',
+                  'ORIG_FID']
+# workspace prefix of the enterprise databases, and their connections made in this process
+DATABASE = "LXGSDE:"
+DATABASE_DRIVERS = {"ORACLE": "OCI", "POSTGRESQL": "PostgreSQL"}
+_connections = {}
+SHAPE_TYPE = {ogr.wkbPoint: "Point",
+              ogr.wkbMultiPoint: "Multipoint",
+              ogr.wkbLineString: "Polyline",
+              ogr.wkbMultiLineString: "Polyline",
+              ogr.wkbPolygon: "Polygon",
+              ogr.wkbMultiPolygon: "Polygon"}
+
+
+def _match(name, wildcard):
+    return wildcard in (None, "", "*") or fnmatch.fnmatch(name.upper(), wildcard.upper())
+
+
+def _xy_resolution(layer):
+    """XY resolution of a FileGDB layer from the XYScale of its definition, None for other formats"""
+    definition = layer.GetMetadata_List("xml:definition")
+    scale = re.search(r"<XYScale>([^<]+)</XYScale>", definition[0]) if definition else None
+    return 1.0 / float(scale.group(1)) if scale and float(scale.group(1)) > 0 else None
+
+
+def _database(workspace):
+    """Connection parameters (platform, instance, database, username, password) of a `LXGSDE:<key>@<directory>`
+    workspace, None for any other workspace"""
+    if not workspace.upper().startswith(DATABASE):
+        return None
+    key, _, directory = workspace[len(DATABASE):].partition("@")
+    conn = _connections.get(key)
+    if conn is None:
+        # another process made the connection: parameters from the index of its directory, password from
+        # the environment
+        conn = ConnectionManager(unquote(directory) or None)._index().get(key)
+        if conn is None:
+            raise ValueError(f"Unknown connection {workspace}")
+        conn = dict(conn, password=ConnectionManager.password(conn["instance"], conn["username"]))
+        if conn["password"] is None:
+            raise ValueError(f"No password for {conn['username']}@{conn['instance']}, set LXG_SDE_PASSWORD")
+        _connections[key] = conn
+
+    return conn
+
+
+def _dsn(workspace):
+    """OGR datasource name of a workspace, with the credentials of the database workspaces"""
+    conn = _database(workspace)
+    if conn is None:
+        return workspace
+    if conn["platform"] == "POSTGRESQL":
+        host, _, port = conn["instance"].partition(",")
+        return f"PG:host={host} dbname={conn['database']} user={conn['username']} password={conn['password']}" + \
+            (f" port={port}" if port else "")
+
+    return f"OCI:{conn['username']}/{conn['password']}@{conn['instance']}"
+
+
+def _value(feature, field):
+    """Field value as the arcpy cursors return it, datetime for the date fields"""
+    if feature.GetFieldType(field) in (ogr.OFTDate, ogr.OFTDateTime) and feature.IsFieldSetAndNotNull(field):
+        year, month, day, hour, minute, second, _ = feature.GetFieldAsDateTime(field)
+        return datetime(year, month, day, hour, minute, int(second), int(second % 1 * 1e6))
+
+    return feature.GetField(field)
+
+
+def _midpoint(geometry):
+    """Point 50% along a (multi)linestring, measured over all parts"""
+    parts = [geometry.GetGeometryRef(i) for i in range(geometry.GetGeometryCount())] \
+        if ogr.GT_Flatten(geometry.GetGeometryType()) == ogr.wkbMultiLineString else [geometry]
+    half = sum(part.Length() for part in parts) / 2.0
+    for part in parts:
+        length = part.Length()
+        if half <= length:
+            return part.Value(half)
+        half -= length
+
+    return parts[-1].Value(parts[-1].Length())
+
+
+class OGRBackend(Backend):
+    name = "ogr"
+    Error = RuntimeError
+
+    def __init__(self, scratch=None):
+        self.scratch = scratch if scratch is not None else tempfile.mkdtemp(prefix="lxg_scratch_")
+
+    # paths
+    @staticmethod
+    def split(path):
+        """(workspace, dataset, name) of a `<workspace>/<dataset>/<featureclass>` path.
+        A single name after the workspace is returned as name, see `resolve`."""
+        match = re.match(r'^([A-Z]{2,}:[^/\\]*)[/\\]?(.*)$', path)
+        if match:
+            # database connection string, eg. PG:dbname=sde_gis host=127.0.0.1/SDE.KCH_LOT
+            workspace, rest = match.group(1), [p for p in re.split(r'[/\\]', match.group(2)) if p]
+        else:
+            parts = os.path.normpath(path).split(os.sep)
+            idx = next((i for i, p in enumerate(parts) if os.path.splitext(p)[1].lower() in DRIVERS), None)
+            if idx is None:
+                return path, None, None
+            if parts[idx].lower().endswith(".shp"):
+                return os.sep.join(parts[:idx + 1]), None, os.path.splitext(parts[idx])[0]
+            workspace, rest = os.sep.join(parts[:idx + 1]), parts[idx + 1:]
+
+        if len(rest) == 0:
+            return workspace, None, None
+        if len(rest) == 1:
+            return workspace, None, rest[0]
+
+        return workspace, rest[0], rest[-1]
+
+    def resolve(self, path):
+        """(workspace, dataset, featureclass), telling apart `<workspace>/<dataset>` and `<workspace>/<featureclass>`"""
+        workspace, dataset, name = self.split(path)
+        if dataset is None and name is not None:
+            try:
+                ds = self.open(workspace)
+            except RuntimeError:
+                ds = None
+            if ds is not None and ds.GetLayerByName(name) is None and name in self._groups(ds, workspace):
+                return workspace, name, None
+
+        return workspace, dataset, name
+
+    @staticmethod
+    def open(workspace, update=False):
+        return gdal.OpenEx(_dsn(workspace), gdal.OF_VECTOR | (gdal.OF_UPDATE if update else 0))
+
+    def layer(self, featureclass, update=False):
+        """(datasource, layer), keep the datasource referenced while using the layer"""
+        workspace, _, name = self.resolve(featureclass)
+        ds = self.open(workspace, update)
+        layer = ds.GetLayerByName(name) if name is not None else None
+        if layer is None:
+            raise RuntimeError(f"{featureclass} does not exist")
+
+        return ds, layer
+
+    @staticmethod
+    def _groups(ds, workspace):
+        """{dataset: [layer names]}"""
+        try:
+            root = ds.GetRootGroup()
+        except RuntimeError:
+            root = None
+        if root is not None:
+            groups = {name: list(root.OpenGroup(name).GetVectorLayerNames() or []) for name in root.GetGroupNames() or []}
+            if groups:
+                return groups
+
+        stem = os.path.splitext(os.path.basename(workspace.rstrip("/\\")))[0]
+        return {stem: [ds.GetLayerByIndex(i).GetName() for i in range(ds.GetLayerCount())]}
+
+    def exists(self, path):
+        workspace, dataset, name = self.resolve(path)
+        try:
+            ds = self.open(workspace)
+        except (RuntimeError, ValueError):
+            return False
+        if ds is None:
+            return False
+        if name is not None:
+            return ds.GetLayerByName(name) is not None
+        if dataset is not None:
+            return dataset in self._groups(ds, workspace)
+
+        return True
+
+    def delete(self, path):
+        workspace, dataset, name = self.resolve(path)
+        if name is None and dataset is None:
+            if os.path.isdir(workspace):
+                shutil.rmtree(workspace)
+            elif os.path.exists(workspace):
+                gdal.GetDriverByName(DRIVERS.get(os.path.splitext(workspace)[1].lower(), "GPKG")).Delete(workspace)
+            return
+        ds = self.open(workspace, update=True)
+        names = [name] if name is not None else self._groups(ds, workspace).get(dataset, [])
+        for n in names:
+            for i in range(ds.GetLayerCount()):
+                if ds.GetLayerByIndex(i).GetName() == n:
+                    ds.DeleteLayer(i)
+                    break
+
+    def create_workspace(self, path):
+        self.delete(path)
+        driver = gdal.GetDriverByName(DRIVERS[os.path.splitext(path)[1].lower()])
+        driver.Create(path, 0, 0, 0, gdal.GDT_Unknown)
+
+        return path
+
+    def compact(self, workspace):
+        ds = self.open(workspace, update=True)
+        try:
+            ds.ExecuteSQL("VACUUM" if workspace.lower().endswith(".gpkg") else "REPACK")
+        except RuntimeError:
+            pass
+
+    def connect(self, folder, platform, instance, username, password, database=None, name="temp.sde"):
+        """`LXGSDE:<key>@<folder>` workspace, the credentials stay in memory, nothing is written to `folder`.
+        Other processes look the key up in the `ConnectionManager` index of `folder`."""
+        platform = platform_name(platform)
+        if platform not in DATABASE_DRIVERS:
+            raise ValueError(f"Unsupported platform {platform}")
+        key = ConnectionManager.key(platform, instance, username, database)
+        _connections[key] = {"platform": platform, "instance": instance, "database": database,
+                             "username": username, "password": password}
+
+        return f"{DATABASE}{key}@{quote(os.path.abspath(folder), safe='')}"
+
+    # catalog
+    def list_datasets(self, workspace, wildcard="*", dataset_type="Feature"):
+        return sorted(name for name in self._groups(self.open(workspace), workspace) if _match(name, wildcard))
+
+    def list_featureclasses(self, workspace, wildcard="*", shape_type="All", dataset=None):
+        ds = self.open(workspace)
+        groups = self._groups(ds, workspace)
+        names = groups.get(dataset, []) if dataset is not None else sum(groups.values(), [])
+        out = []
+        for name in names:
+            layer = ds.GetLayerByName(name)
+            kind = SHAPE_TYPE.get(ogr.GT_Flatten(layer.GetGeomType()))
+            if kind is None or not _match(name, wildcard):
+                continue
+            if shape_type in (None, "", "All") or shape_type == kind:
+                out.append(name)
+
+        return sorted(out)
+
+    def describe(self, featureclass):
+        ds, layer = self.layer(featureclass)
+        defn = layer.GetLayerDefn()
+        srs = layer.GetSpatialRef()
+        return {"shape_type": SHAPE_TYPE.get(ogr.GT_Flatten(layer.GetGeomType())),
+                "oid_field": layer.GetFIDColumn() or "FID",
+                "fields": [(defn.GetFieldDefn(i).GetName(), defn.GetFieldDefn(i).GetTypeName(), True)
+                           for i in range(defn.GetFieldCount())],
+                "spatial_reference": None if srs is None else srs.ExportToWkt(),
+                "xy_resolution": _xy_resolution(layer)}
+
+    # cursors
+    def search(self, featureclass, fields, where=None):
+        ds, layer = self.layer(featureclass)
+        layer.SetAttributeFilter(where)
+        for feature in layer:
+            row = []
+            for field in fields:
+                if field == "OID@":
+                    row.append(feature.GetFID())
+                elif field in ("SHAPE@WKB", "SHAPE@XY"):
+                    geom = feature.GetGeometryRef()
+                    if geom is None:
+                        row.append(None)
+                    elif field == "SHAPE@WKB":
+                        row.append(bytes(geom.ExportToIsoWkb()))
+                    else:
+                        c = geom.Centroid()
+                        row.append((c.GetX(), c.GetY()))
+                else:
+                    row.append(_value(feature, field))
+            yield tuple(row)
+
+    def read_batches(self, featureclass, fields=None, where=None, batch_size=65536):
+        """Arrow stream of the layer (GDAL >= 3.6): whole columns per batch, no OGR feature objects.
+        Falls back to reading feature by feature on older GDAL."""
+        ds, layer = self.layer(featureclass)
+        defn = layer.GetLayerDefn()
+        names = [defn.GetFieldDefn(i).GetName() for i in range(defn.GetFieldCount())]
+        fields = [f for f in names if f.upper() not in EXCLUDE_FIELDS] if fields is None else list(fields)
+        layer.SetAttributeFilter(where)
+        # unread columns are not even decoded
+        layer.SetIgnoredFields([f for f in names if f not in fields])
+        try:
+            if ARROW_STREAM and hasattr(layer, "GetArrowStreamAsNumPy"):
+                yield from self._arrow_batches(layer, fields, batch_size)
+            else:
+                yield from self._feature_batches(layer, fields, batch_size)
+        finally:
+            layer.SetIgnoredFields([])
+            layer.SetAttributeFilter(None)
+
+    @staticmethod
+    def _arrow_batches(layer, fields, batch_size):
+        options = ["INCLUDE_FID=YES", f"MAX_FEATURES_IN_BATCH={batch_size}", "GEOMETRY_ENCODING=WKB"]
+        fid = layer.GetFIDColumn() or "OGC_FID"
+        geometry = layer.GetGeometryColumn() or "wkb_geometry"
+        if pa is not None:
+            for batch in layer.GetArrowStreamAsPyArrow(options):
+                df = batch.to_pandas()
+                yield pd.DataFrame({OID: df[fid].to_numpy(dtype=np.int64),
+                                    **{f: df[f] for f in fields},
+                                    GEOMETRY: df[geometry] if geometry in df else None})
+        else:
+            for batch in layer.GetArrowStreamAsNumPy(options):
+                columns = {}
+                for f in fields:
+                    values = batch[f]
+                    # string columns come as bytes
+                    if values.dtype == object and len(values) and isinstance(values[0], bytes):
+                        values = pd.Series(values).str.decode("utf-8").to_numpy()
+                    columns[f] = values
+                yield pd.DataFrame({OID: np.asarray(batch[fid], dtype=np.int64), **columns,
+                                    GEOMETRY: batch.get(geometry)})
+
+    @staticmethod
+    def _feature_batches(layer, fields, batch_size):
+        rows = []
+        for feature in layer:
+            geom = feature.GetGeometryRef()
+            rows.append((feature.GetFID(), *(feature.GetField(f) for f in fields),
+                         None if geom is None else bytes(geom.ExportToIsoWkb())))
+            if len(rows) == batch_size:
+                yield pd.DataFrame.from_records(rows, columns=[OID] + fields + [GEOMETRY])
+                rows = []
+        if rows:
+            yield pd.DataFrame.from_records(rows, columns=[OID] + fields + [GEOMETRY])
+
+    def centroids(self, featureclass, where=None):
+        """Centroids (polygons), midpoints (lines) or the points themselves, from the bulk reader"""
+        oids, xy = [], []
+        for batch in self.read_batches(featureclass, fields=[], where=where):
+            points = feature_points(RaggedGeometry.from_wkb(batch[GEOMETRY]))
+            valid = ~np.isnan(points[:, 0])
+            oids.append(batch[OID].to_numpy(dtype=np.int64)[valid])
+            xy.append(points[valid])
+        if not oids:
+            return np.empty(0, dtype=np.int64), np.empty((0, 2))
+
+        return np.concatenate(oids), np.concatenate(xy)
+
+    def insert(self, featureclass, fields, rows):
+        ds, layer = self.layer(featureclass, update=True)
+        defn = layer.GetLayerDefn()
+        count = 0
+        layer.StartTransaction()
+        for row in rows:
+            feature = ogr.Feature(defn)
+            for field, value in zip(fields, row):
+                if field == "OID@":
+                    continue
+                if field == "SHAPE@WKB":
+                    if value is not None:
+                        feature.SetGeometry(ogr.CreateGeometryFromWkb(bytes(value)))
+                elif field == "SHAPE@XY":
+                    if value is not None:
+                        point = ogr.Geometry(ogr.wkbPoint)
+                        point.AddPoint_2D(*value)
+                        feature.SetGeometry(point)
+                elif value is not None:
+                    feature.SetField(field, value)
+            layer.CreateFeature(feature)
+            count += 1
+        layer.CommitTransaction()
+
+        return count
+
+    def count(self, featureclass, where=None):
+        ds, layer = self.layer(featureclass)
+        layer.SetAttributeFilter(where)
+
+        return layer.GetFeatureCount()
+
+    # data management
+    def copy(self, source, target):
+        src_ws, src_ds, src_name = self.resolve(source)
+        tgt_ws, tgt_ds, tgt_name = self.split(target)
+        src = self.open(src_ws)
+        if src_name is None:
+            layers = self._groups(src, src_ws).get(src_ds, [])
+            tgt_ds, tgt_name = tgt_ds or tgt_name, None
+        else:
+            layers = [src_name]
+
+        ext = os.path.splitext(tgt_ws)[1].lower()
+        database = _database(tgt_ws)
+        options = {"format": DATABASE_DRIVERS[database["platform"]] if database else DRIVERS.get(ext, "OpenFileGDB"),
+                   "layers": layers}
+        if (database or os.path.exists(tgt_ws)) and ext != ".shp":
+            options["accessMode"] = "update"
+        if tgt_name is not None and ext != ".shp":
+            options["layerName"] = tgt_name
+        if ext == ".gdb" and tgt_ds is not None:
+            options["layerCreationOptions"] = [f"FEATURE_DATASET={tgt_ds}"]
+        gdal.VectorTranslate(_dsn(tgt_ws), src, **options)
+
+    def _common_fields(self, src_layer, tgt_layer):
+        src_defn, tgt_defn = src_layer.GetLayerDefn(), tgt_layer.GetLayerDefn()
+        src_names = {src_defn.GetFieldDefn(i).GetName().upper(): src_defn.GetFieldDefn(i).GetName()
+                     for i in range(src_defn.GetFieldCount())}
+        pairs = []
+        for i in range(tgt_defn.GetFieldCount()):
+            name = tgt_defn.GetFieldDefn(i).GetName()
+            if name.upper() in src_names and name.upper() not in EXCLUDE_FIELDS:
+                pairs.append((src_names[name.upper()], name))
+
+        return pairs
+
+    def append(self, source, target, oids=None, where=None):
+        src, src_layer = self.layer(source)
+        tgt, tgt_layer = self.layer(target, update=True)
+        if oids is not None:
+            if len(oids) == 0:
+                return 0
+            where = where_in(src_layer.GetFIDColumn() or "FID", oids)
+        src_layer.SetAttributeFilter(where)
+
+        pairs = self._common_fields(src_layer, tgt_layer)
+        defn = tgt_layer.GetLayerDefn()
+        count = 0
+        tgt_layer.StartTransaction()
+        for feature in src_layer:
+            out = ogr.Feature(defn)
+            for src_name, tgt_name in pairs:
+                out.SetField(tgt_name, feature.GetField(src_name))
+            geom = feature.GetGeometryRef()
+            if geom is not None:
+                out.SetGeometry(geom)
+            tgt_layer.CreateFeature(out)
+            count += 1
+        tgt_layer.CommitTransaction()
+
+        return count
+
+    def truncate(self, featureclass):
+        workspace, _, name = self.resolve(featureclass)
+        if workspace.lower().endswith((".gpkg", ".sqlite")):
+            ds = self.open(workspace, update=True)
+            ds.ExecuteSQL(f'DELETE FROM "{name}"')
+            return
+        self.delete_rows(featureclass, None)
+
+    def delete_rows(self, featureclass, where):
+        ds, layer = self.layer(featureclass, update=True)
+        layer.SetAttributeFilter(where)
+        fids = [feature.GetFID() for feature in layer]
+        layer.SetAttributeFilter(None)
+        layer.StartTransaction()
+        for fid in fids:
+            layer.DeleteFeature(fid)
+        layer.CommitTransaction()
+
+        return len(fids)
+
+    def delete_oids(self, featureclass, oids, batch_size=1000):
+        """Delete by FID in one transaction, no where clause needed"""
+        oids = np.unique(np.asarray(oids, dtype=np.int64))
+        if len(oids) == 0:
+            return 0
+        ds, layer = self.layer(featureclass, update=True)
+        with span("delete", layer=basename(featureclass)) as s:
+            s.rows = 0
+            layer.StartTransaction()
+            for fid in oids.tolist():
+                try:
+                    s.rows += layer.DeleteFeature(fid) == ogr.OGRERR_NONE
+                except RuntimeError:
+                    # FID already gone
+                    pass
+            layer.CommitTransaction()
+        self._deleted(featureclass, s)
+
+        return s.rows
+
+    # spatial
+    def select_by_location(self, featureclass, select_features, relation="INTERSECT", distance=None,
+                           invert=False, select_oids=None):
+        in_ds, in_layer = self.layer(featureclass)
+        sel_ds, sel_layer = self.layer(select_features)
+        if select_oids is not None:
+            sel_layer.SetAttributeFilter(where_in(sel_layer.GetFIDColumn() or "FID", select_oids))
+        distance = distance or 0.0
+        shrink = relation == "HAVE_THEIR_CENTER_IN" and distance < 0
+
+        selected = set()
+        for feature in sel_layer:
+            geom = feature.GetGeometryRef()
+            if geom is None:
+                continue
+            if shrink:
+                geom = geom.Buffer(distance)
+                if geom.IsEmpty():
+                    continue
+            minx, maxx, miny, maxy = geom.GetEnvelope()
+            pad = max(distance, 0.0)
+            in_layer.SetSpatialFilterRect(minx - pad, miny - pad, maxx + pad, maxy + pad)
+            for candidate in in_layer:
+                other = candidate.GetGeometryRef()
+                if other is None:
+                    continue
+                if relation == "HAVE_THEIR_CENTER_IN":
+                    other = other.Centroid()
+                if (other.Distance(geom) <= pad) if pad > 0 else other.Intersects(geom):
+                    selected.add(candidate.GetFID())
+        in_layer.SetSpatialFilter(None)
+
+        if invert:
+            return sorted({feature.GetFID() for feature in in_layer} - selected)
+
+        return sorted(selected)
+
+    def feature_to_point(self, featureclass, output, method="CENTROID", where=None):
+        src, src_layer = self.layer(featureclass)
+        src_layer.SetAttributeFilter(where)
+        out_ws, out_ds, out_name = self.split(output)
+        ds = self.open(out_ws, update=True) if os.path.exists(out_ws) else \
+            gdal.GetDriverByName(DRIVERS.get(os.path.splitext(out_ws)[1].lower(), "GPKG")).Create(
+                out_ws, 0, 0, 0, gdal.GDT_Unknown)
+        for i in range(ds.GetLayerCount()):
+            if ds.GetLayerByIndex(i).GetName() == out_name:
+                ds.DeleteLayer(i)
+                break
+
+        srs = src_layer.GetSpatialRef()
+        layer = ds.CreateLayer(out_name, srs=srs.Clone() if srs is not None else osr.SpatialReference(),
+                               geom_type=src_layer.GetGeomType() if method == "COPY" else ogr.wkbPoint)
+        src_defn = src_layer.GetLayerDefn()
+        names = []
+        for i in range(src_defn.GetFieldCount()):
+            fd = src_defn.GetFieldDefn(i)
+            if fd.GetName().upper() not in EXCLUDE_FIELDS:
+                layer.CreateField(fd)
+                names.append(fd.GetName())
+        layer.CreateField(ogr.FieldDefn("ORIG_FID", ogr.OFTInteger64))
+        defn = layer.GetLayerDefn()
+
+        layer.StartTransaction()
+        for feature in src_layer:
+            geom = feature.GetGeometryRef()
+            if geom is None or geom.IsEmpty():
+                continue
+            if method == "CENTROID":
+                point = geom.Centroid()
+            elif method == "MIDPOINT":
+                point = _midpoint(geom)
+            elif method == "COPY":
+                point = geom.Clone()
+            else:
+                raise ValueError(f"Unknown method {method}")
+            out = ogr.Feature(defn)
+            for name in names:
+                out.SetField(name, feature.GetField(name))
+            out.SetField("ORIG_FID", feature.GetFID())
+            out.SetGeometry(point)
+            layer.CreateFeature(out)
+        layer.CommitTransaction()
+
+        return output
+
+    # scratch
+    def scratch_path(self, name):
+        return os.path.join(self.scratch, f"{name}.gpkg", name)
+
+    def clear_scratch(self):
+        shutil.rmtree(self.scratch, ignore_errors=True)
+        os.makedirs(self.scratch, exist_ok=True)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(scratch={self.scratch})"
@@ -7,6 +7,15 @@ def BRSO():
     return crs
 
 
+def BRSO_WKT():
+    import os
+    dir_f = os.path.abspath(os.path.dirname(__file__))
+    with open(os.path.join(dir_f, 'projection', 'BRSO_4.prj'), 'r') as f:
+        wkt = f.read().strip()
+
+    return wkt
+
+
 def HQ():
     import arcpy
     import os
@@ -0,0 +1,140 @@
+"""
+Author : Lerry William
+
+Canonical geometries and their hashes, equal whatever the start vertex, orientation, precision or multipart type.
+
+Usage:
+    ```
+    geoms = RaggedGeometry.from_wkb(backend.read(featureclass, fields=[])["geometry"])
+    hashes = canonical_hashes(geoms, resolution=0.0001)              # (n,) uint64
+    hashes = canonical_hashes(geoms, resolution=0.0001, bits=128)    # (n, 2) uint64
+    ```
+"""
+import numpy as np
+from .geometry import RaggedGeometry, POLYGON, LINESTRING, _owners
+
+# base kind of the OGC types, 0 for null geometries: point, line, polygon
+KIND = np.array([0, 1, 2, 3, 1, 2, 3], dtype=np.uint8)
+HOLE = np.uint64(0x5ca1ab1e0dd5eed5)
+SEEDS = (np.uint64(0), np.uint64(0x9e3779b97f4a7c15))
+
+
+def _mix(h):
+    """splitmix64 finalizer of a uint64 array"""
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xbf58476d1ce4e5b9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94d049bb133111eb)
+
+    return h ^ (h >> np.uint64(31))
+
+
+def _segments(values, offsets, reduce=np.add, empty=0):
+    """`reduce` of values[offsets[i]:offsets[i + 1]] for every segment, `empty` for the empty ones"""
+    out = np.full(len(offsets) - 1, empty, dtype=values.dtype)
+    filled = np.diff(offsets) > 0
+    if filled.any():
+        out[filled] = reduce.reduceat(values, offsets[:-1][filled])
+
+    return out
+
+
+def _canonical(geoms, resolution, directed):
+    """(snapped int64 vertices, ring offsets) of the canonical form of `geoms`"""
+    q = np.round(geoms.xy / resolution).astype(np.int64)
+    nrings = len(geoms.ring_offsets) - 1
+    ring = np.repeat(np.arange(nrings), np.diff(geoms.ring_offsets))
+    ring_geom, exterior = _owners(geoms)
+    kind = KIND[geoms.types][ring_geom]
+
+    # vertices merged by the snapping, then the closing vertex of polygon rings
+    keep = np.ones(len(q), dtype=bool)
+    keep[1:] = (ring[1:] != ring[:-1]) | (q[1:] != q[:-1]).any(axis=1)
+    q, ring = q[keep], ring[keep]
+    size = np.bincount(ring, minlength=nrings)
+    start = np.r_[0, np.cumsum(size)[:-1]].astype(np.int64)
+    closed = np.flatnonzero((kind == POLYGON) & (size > 1))
+    closed = closed[(q[start[closed]] == q[start[closed] + size[closed] - 1]).all(axis=1)]
+    keep = np.ones(len(q), dtype=bool)
+    keep[start[closed] + size[closed] - 1] = False
+    q, ring = q[keep], ring[keep]
+    size = np.bincount(ring, minlength=nrings)
+    offsets = np.r_[0, np.cumsum(size)].astype(np.int64)
+    if len(q) == 0:
+        return q, offsets
+    start = offsets[:-1]
+    local = np.arange(len(q)) - start[ring]
+
+    # lowest vertex of every ring, x then y, first one when repeated
+    big = np.iinfo(np.int64).max
+    min_x = _segments(q[:, 0], offsets, np.minimum, big)
+    lowest = q[:, 0] == min_x[ring]
+    min_y = _segments(np.where(lowest, q[:, 1], big), offsets, np.minimum, big)
+    lowest &= q[:, 1] == min_y[ring]
+    first = _segments(np.where(lowest, local, big), offsets, np.minimum, 0)
+
+    # polygon rings: area sign around the lowest vertex, exteriors counterclockwise
+    d = (q - q[start[ring] + first[ring]]).astype(np.float64)
+    nxt = np.where(local == size[ring] - 1, start[ring], np.arange(len(q)) + 1)
+    area = np.bincount(ring, weights=d[:, 0] * d[nxt, 1] - d[nxt, 0] * d[:, 1], minlength=nrings)
+    direction = np.where((area >= 0) == exterior, 1, -1)
+
+    # lines: from the lowest end
+    is_line = kind == LINESTRING
+    last = start + size - 1
+    head, tail = q[np.minimum(start, len(q) - 1)], q[np.maximum(last, 0)]
+    reverse = (head[:, 0] > tail[:, 0]) | ((head[:, 0] == tail[:, 0]) & (head[:, 1] > tail[:, 1]))
+    line_direction = np.where(reverse & (not directed), -1, 1)
+    direction = np.where(is_line, line_direction, np.where(kind == POLYGON, direction, 1))
+    first = np.where(is_line, np.where(line_direction < 0, size - 1, 0), np.where(kind == POLYGON, first, 0))
+
+    position = ((local - first[ring]) * direction[ring]) % np.maximum(size[ring], 1)
+    out = np.empty_like(q)
+    out[start[ring] + position] = q
+
+    return out, offsets
+
+
+def canonicalize(geoms, resolution=0.0001, directed=False):
+    """RaggedGeometry in canonical form, coordinates snapped to `resolution` (XY only, polygon rings
+    closed again)"""
+    q, offsets = _canonical(geoms, resolution, directed)
+    nrings = len(offsets) - 1
+    ring_geom, _ = _owners(geoms)
+    size = np.diff(offsets)
+    close = np.flatnonzero((KIND[geoms.types][ring_geom] == POLYGON) & (size > 0))
+    q = np.insert(q, offsets[close + 1], q[offsets[close]], axis=0)
+    size[close] += 1
+    ring_offsets = np.r_[0, np.cumsum(size)] if nrings else np.zeros(1, dtype=np.int64)
+
+    return RaggedGeometry(geoms.types, q * resolution, ring_offsets, geoms.part_offsets, geoms.geom_offsets)
+
+
+def canonical_hashes(geoms, resolution=0.0001, bits=64, directed=False):
+    """Hash of the canonical form of every geometry: (n,) uint64 for 64 bits, (n, 2) uint64 for 128 bits"""
+    if bits not in (64, 128):
+        raise ValueError("bits must be 64 or 128")
+    q, offsets = _canonical(geoms, resolution, directed)
+    ring_geom, exterior = _owners(geoms)
+    size = np.diff(offsets).astype(np.uint64)
+    ring = np.repeat(np.arange(len(size)), size.astype(np.int64))
+    position = (np.arange(len(q)) - offsets[:-1][ring]).astype(np.uint64)
+    qu = q.view(np.uint64)
+
+    out = []
+    for seed in SEEDS[:bits // 64]:
+        vertex = _mix(_mix(_mix(qu[:, 0] ^ seed) ^ qu[:, 1]) ^ position)
+        rings = _mix(_segments(vertex, offsets) ^ size)
+        # holes are told apart from exteriors, each part sums its own rings
+        rings = _mix(rings ^ np.where(exterior, np.uint64(0), HOLE))
+        parts = _mix(_segments(rings, geoms.part_offsets))
+        geometries = _segments(parts, geoms.geom_offsets)
+        out.append(_mix(geometries ^ _mix(KIND[geoms.types].astype(np.uint64) + seed)))
+
+    return out[0] if bits == 64 else np.column_stack(out)
+
+
+def hex_digests(hashes):
+    """Hex strings of `canonical_hashes`, 16 or 32 characters"""
+    hashes = np.asarray(hashes, dtype=np.uint64).reshape(len(hashes), -1)
+    return ["".join(f"{int(v):016x}" for v in row) for row in hashes]
@@ -1,10 +1,14 @@
 import os
 import sys
-import arcpy
 import re
 import pandas as pd
 from osgeo import ogr
 
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
 ogr.UseExceptions()
 
 
@@ -111,6 +115,7 @@ class OGRDataLoader:
     Usage:
         OGRDataLoader(geodatabase='c:/path/to/helloworld.gdb')
         OGRDataLoader(geodatabase='c:/path/to/helloworld.mdb')
+        OGRDataLoader(geodatabase='/path/to/helloworld.gpkg')
 
     example:
         data = OGRDataLoader(geodatabase='c:/path/to/helloworld.gdb')
@@ -128,6 +133,9 @@ class OGRDataLoader:
         elif os.path.splitext(os.path.basename(self.gdb))[1] == '.gdb':
             self.gdb_type = "GDB"
             self.driver = ogr.GetDriverByName('OpenFileGDB')
+        elif os.path.splitext(os.path.basename(self.gdb))[1] == '.gpkg':
+            self.gdb_type = "GPKG"
+            self.driver = ogr.GetDriverByName('GPKG')
         else:
             sys.exit("Not a valid geodatabase")
 
@@ -165,6 +173,10 @@ class OGRDataLoader:
                     pass
                 else:
                     feat_list.append((feat.GetName(), feat.GetFeatureCount()))
+        elif self.gdb_type == "GPKG":
+            for layerNum in range(numLayers):
+                feat = self.datasets.GetLayerByIndex(layerNum)
+                feat_list.append((feat.GetName(), feat.GetFeatureCount()))
         else:
             pass
 
@@ -176,6 +188,14 @@ class OGRDataLoader:
 
     def esri_features_fullname(self):
         tem_feat_list = list()
+        if arcpy is None:
+            # without arcpy, OpenFileGDB layers are the featureclasses (tables have no geometry)
+            for layerNum in range(self.datasets.GetLayerCount()):
+                feat = self.datasets.GetLayerByIndex(layerNum)
+                if feat.GetGeomType() != ogr.wkbNone:
+                    tem_feat_list.append(os.path.join(self.gdb, feat.GetName()))
+            return tem_feat_list
+
         arcpy.env.workspace = self.gdb
         idx = 0
         working_files = arcpy.da.Walk(arcpy.env.workspace, datatype="FeatureClass", type=None)
@@ -0,0 +1,164 @@
+"""
+Author : Lerry William
+
+Registry of the frozen layers (closed DCDB_HISTORY_<year> datasets) the workflows skip once fingerprinted.
+
+Usage:
+    ```
+    frozen = FrozenRegistry()
+    frozen.freeze_history(r"C:\\LXG\\KCH_CMS.gdb")          # closed years, once
+    GDB2SDE(r"C:\\LXG\\KCH_CMS.gdb", ..., frozen=frozen)
+
+    if frozen.due(days=7):
+        frozen.verify(r"C:\\LXG\\KCH_CMS.gdb")              # [] when every fingerprint matches
+    ```
+"""
+import os
+import re
+import json
+from datetime import date, datetime, timedelta
+from .apis import get_backend, basename
+from .apis.base import SKIP_TYPES, GEOMETRY
+from .geometry import RaggedGeometry
+from .metrics import span
+from .snapshot import row_hashes, layer_hash, field_types
+
+# year datasets of the schema bundle, eg. KCH_CMS_DCDB_HISTORY_2010
+HISTORY = re.compile(r"_HISTORY_(\d{4})$", re.IGNORECASE)
+
+
+class FrozenRegistry:
+    """Fingerprints of the layers which do not change anymore.
+
+    Args:
+        path (optional): json file of the registry, default ~/.LXG_WORKSPACE/frozen.json
+        backend (optional): "arcpy", "ogr" or a `LXG.apis.Backend`, default arcpy when available
+    """
+    def __init__(self, path=None, backend=None):
+        self.path = os.path.join(os.path.expanduser('~'), ".LXG_WORKSPACE", "frozen.json") if path is None else path
+        self.backend = backend
+        try:
+            with open(self.path) as f:
+                self.registry = json.load(f)
+        except (OSError, ValueError):
+            self.registry = {"layers": {}, "datasets": [], "verified": None}
+
+    def _backend(self):
+        return get_backend(self.backend)
+
+    def __getstate__(self):
+        # pickled into pool workers, they rebuild their own backend
+        state = self.__dict__.copy()
+        if not isinstance(self.backend, (str, type(None))):
+            state["backend"] = self.backend.name
+        return state
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.registry, f, indent=2)
+        os.replace(tmp, self.path)
+
+    @property
+    def layers(self):
+        return self.registry["layers"]
+
+    @property
+    def datasets(self):
+        return self.registry["datasets"]
+
+    def is_frozen(self, name):
+        """True for a frozen featureclass, or dataset, name (SDE owner prefix ignored)"""
+        name = basename(name).upper()
+        return name in (n.upper() for n in self.layers) or name in (n.upper() for n in self.datasets)
+
+    def fingerprint(self, featureclass):
+        """dict of count, extent and content hash of a featureclass"""
+        backend = self._backend()
+        desc = backend.describe(featureclass)
+        fields = [name for name, ftype, _ in desc["fields"]
+                  if ftype not in SKIP_TYPES and name.upper() not in ("SHAPE", "SHAPE_LENGTH", "SHAPE_AREA")]
+        df = backend.read(featureclass, fields)
+        xy = RaggedGeometry.from_wkb(df[GEOMETRY]).xy
+
+        return {"count": len(df),
+                "extent": [round(float(v), 6) for v in (*xy.min(axis=0), *xy.max(axis=0))] if len(xy) else None,
+                "hash": layer_hash(row_hashes(df, field_types(desc)))}
+
+    def freeze(self, featureclass, dataset=None):
+        """Fingerprint a featureclass and add it to the registry"""
+        with span("freeze", layer=basename(featureclass)) as s:
+            fingerprint = self.fingerprint(featureclass)
+            s.rows = fingerprint["count"]
+        self.layers[basename(featureclass)] = dict(dataset=basename(dataset) if dataset else None,
+                                                   frozen=date.today().isoformat(), **fingerprint)
+        self.save()
+
+        return fingerprint
+
+    def freeze_dataset(self, geodatabase, dataset):
+        """Freeze every featureclass of a dataset, and the dataset itself"""
+        backend = self._backend()
+        for fc in backend.list_featureclasses(geodatabase, "*", "All", dataset):
+            self.freeze(os.path.join(geodatabase, dataset, fc), dataset)
+        if basename(dataset) not in self.datasets:
+            self.datasets.append(basename(dataset))
+        self.save()
+
+    def freeze_history(self, geodatabase, through=None):
+        """Freeze the DCDB_HISTORY_<year> datasets up to the year `through` (default last year), returns them"""
+        through = date.today().year - 1 if through is None else through
+        frozen = []
+        for ds in self._backend().list_datasets(geodatabase, "*HISTORY*"):
+            match = HISTORY.search(basename(ds))
+            if match and int(match.group(1)) <= through and not self.is_frozen(ds):
+                self.freeze_dataset(geodatabase, ds)
+                frozen.append(basename(ds))
+
+        return frozen
+
+    def thaw(self, name):
+        """Remove a featureclass or a dataset (with its featureclasses) from the registry"""
+        name = basename(name)
+        if name in self.datasets:
+            self.datasets.remove(name)
+            for layer in [k for k, v in self.layers.items() if v["dataset"] == name]:
+                del self.layers[layer]
+        self.layers.pop(name, None)
+        self.save()
+
+    def due(self, days=7):
+        """True when the last verification is older than `days`"""
+        verified = self.registry.get("verified")
+        return verified is None or datetime.fromisoformat(verified) < datetime.now() - timedelta(days=days)
+
+    def verify(self, geodatabase, full=False):
+        """Frozen layers of `geodatabase` not matching their fingerprint, only the counts unless `full`"""
+        backend = self._backend()
+        paths = {basename(fc): os.path.join(geodatabase, ds, fc)
+                 for ds in backend.list_datasets(geodatabase, "*")
+                 for fc in backend.list_featureclasses(geodatabase, "*", "All", ds)}
+
+        changed = []
+        for name, meta in sorted(self.layers.items()):
+            if name not in paths:
+                continue
+            with span("verify", layer=name):
+                if full:
+                    fingerprint = self.fingerprint(paths[name])
+                    ok = all(fingerprint[k] == meta[k] for k in ("count", "extent", "hash"))
+                else:
+                    ok = backend.count(paths[name]) == meta["count"]
+            if not ok:
+                backend.message(f"[WARNING]\t{name} does not match its frozen fingerprint")
+                changed.append(name)
+
+        self.registry["verified"] = datetime.now().isoformat(timespec='seconds')
+        self.save()
+
+        return changed
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path={self.path}, layers={len(self.layers)}, " \
+               f"datasets={len(self.datasets)})"
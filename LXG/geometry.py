@@ -0,0 +1,318 @@
+"""
+Author : Lerry William
+"""
+import struct
+import numpy as np
+
+POINT = 1
+LINESTRING = 2
+POLYGON = 3
+MULTIPOINT = 4
+MULTILINESTRING = 5
+MULTIPOLYGON = 6
+
+
+def _wkb_header(buffer, pos):
+    endian = '<' if buffer[pos] == 1 else '>'
+    code = struct.unpack_from(f'{endian}I', buffer, pos + 1)[0]
+    # EWKB flags (OGR/PostGIS) or ISO 1000 offsets (arcpy, OGR ExportToIsoWkb)
+    has_z = bool(code & 0x80000000)
+    has_m = bool(code & 0x40000000)
+    code &= 0x0FFFFFFF
+    if code >= 1000:
+        has_z = has_z or (code // 1000) in (1, 3)
+        has_m = has_m or (code // 1000) in (2, 3)
+        code %= 1000
+
+    return endian, code, has_z, has_m, pos + 5
+
+
+class RaggedGeometry:
+    """Geometries of a layer flattened into one coordinate array.
+
+    Each geometry is made of parts, each part of rings (a linestring or a polygon ring), each
+    ring of vertices, the way GeoArrow lays out coordinates:
+        coords[ring_offsets[r]:ring_offsets[r + 1]]         vertices of ring r
+        ring_offsets[part_offsets[p]:part_offsets[p + 1]]   rings of part p
+        part_offsets[geom_offsets[g]:geom_offsets[g + 1]]   parts of geometry g
+
+    Args:
+        types: base OGC geometry type per geometry (1 - 6)
+        coords: (N, dims) float64 array, dims is 2, 3 (XYZ or XYM) or 4 (XYZM)
+        ring_offsets, part_offsets, geom_offsets: int64 offsets as above
+        has_z, has_m: dimensionality of coords
+    """
+    def __init__(self, types, coords, ring_offsets, part_offsets, geom_offsets, has_z=False, has_m=False):
+        self.types = np.asarray(types, dtype=np.uint8)
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.ring_offsets = np.asarray(ring_offsets, dtype=np.int64)
+        self.part_offsets = np.asarray(part_offsets, dtype=np.int64)
+        self.geom_offsets = np.asarray(geom_offsets, dtype=np.int64)
+        self.has_z = has_z
+        self.has_m = has_m
+
+    def __len__(self):
+        return len(self.types)
+
+    @property
+    def xy(self):
+        return self.coords[:, :2]
+
+    @property
+    def num_points(self):
+        return len(self.coords)
+
+    @classmethod
+    def from_wkb(cls, wkbs):
+        """Parse an iterable of WKB blobs (bytes, bytearray or memoryview), None for empty geometry"""
+        types = []
+        chunks = []
+        ring_offsets = [0]
+        part_offsets = [0]
+        geom_offsets = [0]
+        dims = None
+        has_z = has_m = False
+
+        def read_ring(buffer, pos, endian, ndim):
+            n = struct.unpack_from(f'{endian}I', buffer, pos)[0]
+            pos += 4
+            chunks.append(np.frombuffer(buffer, dtype=f'{endian}f8', count=n * ndim, offset=pos).reshape(n, ndim))
+            ring_offsets.append(ring_offsets[-1] + n)
+            return pos + n * ndim * 8
+
+        def read_part(buffer, pos, code, endian, ndim):
+            if code == POINT:
+                xy = np.frombuffer(buffer, dtype=f'{endian}f8', count=ndim, offset=pos)
+                if not np.isnan(xy[0]):
+                    chunks.append(xy.reshape(1, ndim))
+                    ring_offsets.append(ring_offsets[-1] + 1)
+                    part_offsets.append(part_offsets[-1] + 1)
+                return pos + ndim * 8
+            if code == LINESTRING:
+                pos = read_ring(buffer, pos, endian, ndim)
+                part_offsets.append(part_offsets[-1] + 1)
+                return pos
+            if code == POLYGON:
+                nrings = struct.unpack_from(f'{endian}I', buffer, pos)[0]
+                pos += 4
+                for _ in range(nrings):
+                    pos = read_ring(buffer, pos, endian, ndim)
+                part_offsets.append(part_offsets[-1] + nrings)
+                return pos
+            raise ValueError(f"Unsupported WKB geometry type {code}")
+
+        for wkb in wkbs:
+            if wkb is None or len(wkb) == 0:
+                types.append(0)
+                geom_offsets.append(geom_offsets[-1])
+                continue
+
+            buffer = bytes(wkb)
+            endian, code, z, m, pos = _wkb_header(buffer, 0)
+            ndim = 2 + z + m
+            if dims is None:
+                dims, has_z, has_m = ndim, z, m
+            elif ndim != dims:
+                raise ValueError("Mixed coordinate dimensions in one layer")
+
+            nparts_before = len(part_offsets)
+            if code in (MULTIPOINT, MULTILINESTRING, MULTIPOLYGON):
+                nparts = struct.unpack_from(f'{endian}I', buffer, pos)[0]
+                pos += 4
+                for _ in range(nparts):
+                    endian, sub_code, _, _, pos = _wkb_header(buffer, pos)
+                    pos = read_part(buffer, pos, sub_code, endian, ndim)
+            else:
+                read_part(buffer, pos, code, endian, ndim)
+
+            types.append(code)
+            geom_offsets.append(geom_offsets[-1] + len(part_offsets) - nparts_before)
+
+        dims = 2 if dims is None else dims
+        coords = np.concatenate(chunks).astype(np.float64) if chunks else np.empty((0, dims))
+
+        return cls(types, coords, ring_offsets, part_offsets, geom_offsets, has_z, has_m)
+
+    def to_wkb(self):
+        """Serialize back to little-endian ISO WKB, one bytes object per geometry (None if empty)"""
+        offset = 1000 * (self.has_z + 2 * self.has_m)
+        coords = np.ascontiguousarray(self.coords, dtype='<f8')
+        out = []
+        for g in range(len(self.types)):
+            code = int(self.types[g])
+            p0, p1 = self.geom_offsets[g], self.geom_offsets[g + 1]
+            if code == 0:
+                out.append(None)
+                continue
+
+            parts = []
+            for p in range(p0, p1):
+                r0, r1 = self.part_offsets[p], self.part_offsets[p + 1]
+                if code in (POINT, MULTIPOINT):
+                    body = coords[self.ring_offsets[r0]].tobytes()
+                elif code in (LINESTRING, MULTILINESTRING):
+                    c0, c1 = self.ring_offsets[r0], self.ring_offsets[r0 + 1]
+                    body = struct.pack('<I', c1 - c0) + coords[c0:c1].tobytes()
+                else:
+                    body = struct.pack('<I', r1 - r0)
+                    for r in range(r0, r1):
+                        c0, c1 = self.ring_offsets[r], self.ring_offsets[r + 1]
+                        body += struct.pack('<I', c1 - c0) + coords[c0:c1].tobytes()
+                parts.append(body)
+
+            if code in (MULTIPOINT, MULTILINESTRING, MULTIPOLYGON):
+                header = struct.pack('<BI', 1, code - 3 + offset)
+                blob = struct.pack('<BII', 1, code + offset, len(parts)) + b''.join(header + b for b in parts)
+            elif parts:
+                blob = struct.pack('<BI', 1, code + offset) + parts[0]
+            else:
+                # empty single point/line/polygon
+                empty = {POINT: struct.pack('<2d', np.nan, np.nan), LINESTRING: b'\x00' * 4, POLYGON: b'\x00' * 4}
+                blob = struct.pack('<BI', 1, code + offset) + empty[code]
+            out.append(blob)
+
+        return out
+
+    def geometry_index(self):
+        """Index of the owning geometry for every vertex in coords"""
+        ring_of_vertex = np.repeat(np.arange(len(self.ring_offsets) - 1), np.diff(self.ring_offsets))
+        part_of_ring = np.repeat(np.arange(len(self.part_offsets) - 1), np.diff(self.part_offsets))
+        geom_of_part = np.repeat(np.arange(len(self.geom_offsets) - 1), np.diff(self.geom_offsets))
+
+        return geom_of_part[part_of_ring[ring_of_vertex]]
+
+
+def _edges(geoms):
+    """Start vertex of every ring edge (the last vertex of a ring starts no edge) and its ring"""
+    ring_sizes = np.diff(geoms.ring_offsets)
+    ring_of_vertex = np.repeat(np.arange(len(ring_sizes)), ring_sizes)
+    last = np.zeros(geoms.num_points, dtype=bool)
+    last[geoms.ring_offsets[1:][ring_sizes > 0] - 1] = True
+    start = np.flatnonzero(~last)
+
+    return start, ring_of_vertex[start]
+
+
+def _owners(geoms):
+    """Geometry of every ring, first ring of every part"""
+    part_of_ring = np.repeat(np.arange(len(geoms.part_offsets) - 1), np.diff(geoms.part_offsets))
+    geom_of_part = np.repeat(np.arange(len(geoms.geom_offsets) - 1), np.diff(geoms.geom_offsets))
+    exterior = np.zeros(len(part_of_ring), dtype=bool)
+    exterior[geoms.part_offsets[:-1][np.diff(geoms.part_offsets) > 0]] = True
+
+    return geom_of_part[part_of_ring], exterior
+
+
+def _first_vertex(geoms):
+    """(n, 2) first vertex of every geometry, NaN for empty ones"""
+    xy = np.full((len(geoms), 2), np.nan)
+    vertex_start = geoms.ring_offsets[geoms.part_offsets[geoms.geom_offsets[:-1]]]
+    has_vertex = geoms.ring_offsets[geoms.part_offsets[geoms.geom_offsets[1:]]] > vertex_start
+    xy[has_vertex] = geoms.xy[vertex_start[has_vertex]]
+
+    return xy
+
+
+def polygon_centroids(geoms):
+    """(n, 2) area weighted centroids of (multi)polygons, holes subtracted whatever the ring orientation.
+    Degenerate (zero area) geometries get the mean of their vertices, empty ones NaN."""
+    xy = geoms.xy
+    origin = _first_vertex(geoms)
+    ring_geom, exterior = _owners(geoms)
+    start, ring = _edges(geoms)
+    geom = ring_geom[ring]
+
+    # shoelace terms relative to the first vertex of the geometry, keeps the precision of large coordinates
+    a = xy[start] - origin[geom]
+    b = xy[start + 1] - origin[geom]
+    cross = a[:, 0] * b[:, 1] - b[:, 0] * a[:, 1]
+    nrings = len(ring_geom)
+    area = np.bincount(ring, weights=cross, minlength=nrings) / 2.0
+    sx = np.bincount(ring, weights=(a[:, 0] + b[:, 0]) * cross, minlength=nrings) / 6.0
+    sy = np.bincount(ring, weights=(a[:, 1] + b[:, 1]) * cross, minlength=nrings) / 6.0
+
+    # |area| for the exterior rings, -|area| for the holes
+    sign = np.sign(area) * np.where(exterior, 1.0, -1.0)
+    weight = np.bincount(ring_geom, weights=np.abs(area) * np.where(exterior, 1.0, -1.0), minlength=len(geoms))
+    cx = np.bincount(ring_geom, weights=sign * sx, minlength=len(geoms))
+    cy = np.bincount(ring_geom, weights=sign * sy, minlength=len(geoms))
+
+    result = np.full((len(geoms), 2), np.nan)
+    valid = np.abs(weight) > 0
+    result[valid] = origin[valid] + np.column_stack([cx[valid], cy[valid]]) / weight[valid, None]
+
+    degenerate = ~valid & ~np.isnan(origin[:, 0])
+    if degenerate.any():
+        vertex_geom = geoms.geometry_index()
+        counts = np.bincount(vertex_geom, minlength=len(geoms))
+        for dim in range(2):
+            result[degenerate, dim] = np.bincount(vertex_geom, weights=xy[:, dim], minlength=len(geoms))[degenerate] / \
+                counts[degenerate]
+
+    return result
+
+
+def line_midpoints(geoms):
+    """(n, 2) points 50% along (multi)linestrings, length measured over all parts in order"""
+    xy = geoms.xy
+    ring_geom, _ = _owners(geoms)
+    start, ring = _edges(geoms)
+    geom = ring_geom[ring]
+    length = np.hypot(*(xy[start + 1] - xy[start]).T)
+
+    result = _first_vertex(geoms)
+    if len(start) == 0:
+        return result
+
+    cum = np.cumsum(length)
+    total = np.bincount(geom, weights=length, minlength=len(geoms))
+    first_edge = np.searchsorted(geom, np.arange(len(geoms)), side="left")
+    last_edge = np.searchsorted(geom, np.arange(len(geoms)), side="right") - 1
+    lines = np.flatnonzero((last_edge >= first_edge) & (total > 0))
+
+    before = cum[first_edge[lines]] - length[first_edge[lines]]
+    target = before + total[lines] / 2.0
+    edge = np.searchsorted(cum, target, side="left").clip(first_edge[lines], last_edge[lines])
+    t = ((target - (cum[edge] - length[edge])) / np.where(length[edge] > 0, length[edge], 1.0)).clip(0.0, 1.0)
+    result[lines] = xy[start[edge]] + t[:, None] * (xy[start[edge] + 1] - xy[start[edge]])
+
+    return result
+
+
+def feature_points(geoms):
+    """(n, 2) one point per geometry: centroid of polygons, midpoint of lines, first point of points"""
+    result = _first_vertex(geoms)
+    polygons = np.isin(geoms.types, (POLYGON, MULTIPOLYGON))
+    lines = np.isin(geoms.types, (LINESTRING, MULTILINESTRING))
+    if polygons.any():
+        result[polygons] = polygon_centroids(geoms)[polygons]
+    if lines.any():
+        result[lines] = line_midpoints(geoms)[lines]
+
+    return result
+
+
+def areas(geoms):
+    """Area of every geometry, holes subtracted whatever the ring orientation, 0 for points and lines"""
+    xy = geoms.xy
+    origin = _first_vertex(geoms)
+    ring_geom, exterior = _owners(geoms)
+    start, ring = _edges(geoms)
+    a = xy[start] - origin[ring_geom[ring]]
+    b = xy[start + 1] - origin[ring_geom[ring]]
+    ring_area = np.abs(np.bincount(ring, weights=a[:, 0] * b[:, 1] - b[:, 0] * a[:, 1], minlength=len(ring_geom))) / 2.0
+
+    result = np.bincount(ring_geom, weights=ring_area * np.where(exterior, 1.0, -1.0), minlength=len(geoms))
+    result[~np.isin(geoms.types, (POLYGON, MULTIPOLYGON))] = 0.0
+
+    return result
+
+
+def lengths(geoms):
+    """Length of every geometry (perimeter of polygons), 0 for points"""
+    ring_geom, _ = _owners(geoms)
+    start, ring = _edges(geoms)
+    length = np.hypot(*(geoms.xy[start + 1] - geoms.xy[start]).T)
+
+    return np.bincount(ring_geom[ring], weights=length, minlength=len(geoms))
+
@@ -0,0 +1,44 @@
+"""
+Author : Lerry William
+
+Business-key pre-matching, rows with the same key and geometry in init and latest skip the spatial engine.
+
+Usage:
+    ```
+    init = key_frame(backend.read(init_fc, fields=key), key)
+    latest = key_frame(backend.read(latest_fc, fields=key), key)
+    latest_oids, init_oids = match_keys(init, latest, key)   # unchanged pairs
+    ```
+"""
+import numpy as np
+from .apis.base import OID, GEOMETRY, XY_RESOLUTION
+from .geometry import RaggedGeometry
+from .canonical import canonical_hashes
+
+GEOMETRY_HASH = "_geometry_hash"
+
+
+def key_frame(df, key, resolution=XY_RESOLUTION):
+    """OID, key fields and canonical geometry hash (`LXG.canonical`) of a `Backend.read` dataframe"""
+    out = df[[OID] + list(key)].copy()
+    out[GEOMETRY_HASH] = canonical_hashes(RaggedGeometry.from_wkb(df[GEOMETRY]), resolution)
+
+    return out
+
+
+def match_keys(init, latest, key):
+    """(latest OIDs, init OIDs) of the rows with equal key and geometry, missing or duplicate keys never match"""
+    key = list(key)
+
+    def unique(df):
+        df = df.dropna(subset=key)
+        return df[~df.duplicated(key, keep=False)]
+
+    pairs = unique(latest).merge(unique(init), on=key + [GEOMETRY_HASH], suffixes=("", "_init"))
+
+    return pairs[OID].to_numpy(dtype=np.int64), pairs[f"{OID}_init"].to_numpy(dtype=np.int64)
+
+
+def unmatched(oids, matched):
+    """Mask of `oids` not in `matched`"""
+    return ~np.isin(oids, matched)
@@ -0,0 +1,240 @@
+"""
+Author : Lerry William
+
+Multiprocess-safe logging, every process logs through one queue into the text, JSON-lines and arcpy logs.
+
+Usage:
+    ```
+    log = ReplicationLog(r"C:\LXG\logs").create()
+    log.info("Copy done", extra={"stage": "export", "layer": "KCH_LOT", "duration": 1.2, "rows": 5120})
+
+    with worker_pool(processes=4) as pool:   # workers log into the same files
+        ...
+    ```
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import logging.handlers
+import multiprocessing as mp
+from datetime import datetime
+
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
+FIELDS = ('stage', 'layer', 'duration', 'rows')
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listeners = {}
+_extra_handlers = []
+_active = None
+
+
+class JSONLinesFormatter(logging.Formatter):
+    """One JSON document per record, carrying stage, layer, duration and rows when given as `extra`"""
+    def format(self, record):
+        doc = {"time": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+               "logger": record.name,
+               "level": record.levelname,
+               "process": record.process,
+               "message": record.getMessage()}
+        for key in FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                doc[key] = value
+        if record.exc_info:
+            doc["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            doc["exception"] = record.exc_text
+
+        return json.dumps(doc, default=str)
+
+
+def _add_message(msg, levelno):
+    if arcpy is None:
+        print(msg, file=sys.stderr)
+    elif levelno >= logging.ERROR:
+        arcpy.AddError(msg)
+    elif levelno >= logging.WARNING:
+        arcpy.AddWarning(msg)
+    else:
+        arcpy.AddMessage(msg)
+
+
+class ArcpyHandler(logging.Handler):
+    """Forward records to geoprocessing messages (stderr when arcpy is not available)"""
+    def emit(self, record):
+        try:
+            _add_message(self.format(record), record.levelno)
+        except Exception:
+            self.handleError(record)
+
+
+class LXGLogging(logging.handlers.RotatingFileHandler):
+    """Rotating log file which also forwards INFO and above to arcpy messages"""
+    def emit(self, record):
+        if record.levelno >= logging.INFO:
+            try:
+                _add_message(record.getMessage(), record.levelno)
+            except Exception:
+                self.handleError(record)
+
+        super(LXGLogging, self).emit(record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # keep it cheap: merge args and drop the traceback object, the listener does the formatting
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+class LogListener:
+    """Single consumer of the log queue for one log file (text) and its JSON-lines twin.
+    Without a log file, warnings and errors still go to arcpy messages (stderr without arcpy)."""
+    def __init__(self, log_file=None, level=logging.DEBUG):
+        self.file = log_file
+        self.jsonl = None if log_file is None else os.path.splitext(log_file)[0] + ".jsonl"
+        self.level = level
+        self.queue = mp.Queue(-1)
+
+        handlers = []
+        if log_file is not None:
+            text_handler = logging.handlers.RotatingFileHandler(self.file, maxBytes=1024 * 1024 * 2, backupCount=10)
+            text_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+            text_handler.setLevel(level)
+            json_handler = logging.handlers.RotatingFileHandler(self.jsonl, maxBytes=1024 * 1024 * 2, backupCount=10)
+            json_handler.setFormatter(JSONLinesFormatter())
+            json_handler.setLevel(level)
+            arcpy_handler = ArcpyHandler(level=logging.INFO)
+            arcpy_handler.setFormatter(logging.Formatter("[%(levelname)s]\t%(message)s"))
+            handlers = [text_handler, json_handler, arcpy_handler]
+        else:
+            arcpy_handler = ArcpyHandler(level=logging.WARNING)
+            arcpy_handler.setFormatter(logging.Formatter("[%(levelname)s]\t%(message)s"))
+            handlers = [arcpy_handler]
+        self.own_handlers = handlers
+
+        self.listener = logging.handlers.QueueListener(self.queue, *(handlers + _extra_handlers),
+                                                       respect_handler_level=True)
+        self.listener.start()
+
+    def drain(self, timeout=2.0):
+        """Wait (up to timeout seconds) until queued records have been handled"""
+        deadline = time.time() + timeout
+        while time.time() < deadline and not self.queue.empty():
+            time.sleep(0.01)
+        # the last record may still be inside a handler
+        time.sleep(0.05)
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            for handler in self.own_handlers:
+                handler.close()
+            self.listener = None
+
+
+def setup_logging(name, log_file, level=logging.DEBUG):
+    """Attach `name` logger to the queue of `log_file`. Calling it again is a no-op for the same file,
+    and swaps the handler (never adds a second one) for a new file."""
+    global _active
+    logger = logging.getLogger(name)
+    listener = _listeners.get(name)
+
+    if listener is None or listener.file != log_file:
+        if listener is not None:
+            listener.stop()
+        listener = LogListener(log_file, level)
+        _listeners[name] = listener
+
+    # the package logger (eg. LXG.METRICS) follows the most recently set up log
+    for lg in (logger, logging.getLogger("LXG")):
+        for handler in list(lg.handlers):
+            if isinstance(handler, _QueueHandler) and handler.queue is not listener.queue:
+                lg.removeHandler(handler)
+        if not any(isinstance(h, _QueueHandler) for h in lg.handlers):
+            lg.addHandler(_QueueHandler(listener.queue))
+        lg.setLevel(level)
+        lg.propagate = False
+    _active = listener
+
+    return logger
+
+
+def register_handler(handler):
+    """Add a handler to every listener, current and future (records from all processes reach it)"""
+    _extra_handlers.append(handler)
+    for listener in _listeners.values():
+        if listener.listener is not None:
+            listener.listener.handlers = listener.listener.handlers + (handler,)
+
+
+def init_worker(queue, level=logging.DEBUG):
+    """Pool initializer: every record of the worker goes to the main process listener"""
+    for lg in [logging.getLogger()] + [v for v in logging.root.manager.loggerDict.values()
+                                       if isinstance(v, logging.Logger)]:
+        for handler in list(lg.handlers):
+            lg.removeHandler(handler)
+        if lg is not logging.getLogger():
+            lg.propagate = True
+
+    root = logging.getLogger()
+    root.addHandler(_QueueHandler(queue))
+    root.setLevel(level)
+
+
+def worker_pool(processes=4):
+    """multiprocessing.Pool whose workers log through the active listener.
+    When no log is set up, a file-less listener still collects the worker records for the extra handlers."""
+    global _active
+    if _active is None or _active.listener is None:
+        listener = _listeners.get(None)
+        if listener is None or listener.listener is None:
+            listener = LogListener(None)
+            _listeners[None] = listener
+        _active = listener
+
+    return mp.Pool(processes=processes, initializer=init_worker, initargs=(_active.queue, _active.level))
+
+
+def log_directory():
+    """Directory of the active log file, None if logging is not set up"""
+    if _active is None or _active.file is None:
+        return None
+
+    return os.path.dirname(os.path.abspath(_active.file))
+
+
+def drain(timeout=2.0):
+    """Wait for worker records still in the queue, eg. before exporting aggregated metrics"""
+    if _active is not None:
+        _active.drain(timeout)
+
+
+def event(logger, message, level=logging.INFO, **fields):
+    """Log a structured record, eg. event(log, "Append", stage="append", layer=fc, duration=1.2, rows=10)"""
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra=fields)
+
+
+def shutdown():
+    global _active
+    for listener in _listeners.values():
+        listener.stop()
+    _listeners.clear()
+    _active = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,175 @@
+"""
+Author : Lerry William
+
+Stage/layer timing of the workflows, pool workers included, exported as JSON and Prometheus text files.
+
+Usage:
+    ```
+    with span("append", layer="KCH_LOT") as s:
+        ...
+        s.rows = 120
+
+    @timed("detection")
+    def check_differences(self):
+        ...
+
+    export("append_new_features")   # ~/.LXG_WORKSPACE/metrics/append_new_features.prom + timestamped .json
+    ```
+"""
+import os
+import json
+import time
+import threading
+import logging
+import functools
+from datetime import datetime
+from .logger import register_handler, drain
+from . import profiling
+
+METRICS_DIR = os.path.join(os.path.expanduser('~'), ".LXG_WORKSPACE", "metrics")
+
+log = logging.getLogger("LXG.METRICS")
+# span records of the pool workers, enabled whatever the level of the log
+spans = logging.getLogger("LXG.METRICS.SPANS")
+spans.setLevel(logging.DEBUG)
+
+
+class MetricsRegistry:
+    """Per (stage, layer) aggregation of durations and row counts"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+
+    def observe(self, stage, layer=None, duration=0.0, rows=None):
+        key = (stage, layer or "")
+        with self._lock:
+            m = self.stages.get(key)
+            if m is None:
+                m = self.stages[key] = {"count": 0, "sum": 0.0, "min": float("inf"), "max": 0.0, "rows": 0}
+            m["count"] += 1
+            m["sum"] += duration
+            m["min"] = min(m["min"], duration)
+            m["max"] = max(m["max"], duration)
+            if rows is not None:
+                m["rows"] += int(rows)
+
+    def clear(self):
+        with self._lock:
+            self.stages = {}
+
+    def records(self):
+        with self._lock:
+            return [dict(stage=stage, layer=layer, **m) for (stage, layer), m in sorted(self.stages.items())]
+
+    def summary(self):
+        """Total seconds per stage"""
+        totals = {}
+        for rec in self.records():
+            totals[rec["stage"]] = totals.get(rec["stage"], 0.0) + rec["sum"]
+
+        return totals
+
+    def to_json(self, filename, run=None):
+        doc = {"run": run,
+               "time": datetime.now().isoformat(timespec='seconds'),
+               "metrics": self.records()}
+        with open(filename, "w") as f:
+            json.dump(doc, f, indent=2)
+
+        return filename
+
+    def to_prometheus(self, filename, run=None):
+        def labels(rec):
+            items = [("run", run), ("stage", rec["stage"]), ("layer", rec["layer"])]
+            return ",".join(f'{k}="{v}"' for k, v in items if v)
+
+        lines = ["# HELP lxg_stage_duration_seconds Time spent per workflow stage and layer",
+                 "# TYPE lxg_stage_duration_seconds summary"]
+        records = self.records()
+        for rec in records:
+            lines.append(f'lxg_stage_duration_seconds_sum{{{labels(rec)}}} {rec["sum"]:.6f}')
+            lines.append(f'lxg_stage_duration_seconds_count{{{labels(rec)}}} {rec["count"]}')
+        lines += ["# HELP lxg_stage_duration_seconds_max Slowest single run of a stage and layer",
+                  "# TYPE lxg_stage_duration_seconds_max gauge"]
+        lines += [f'lxg_stage_duration_seconds_max{{{labels(rec)}}} {rec["max"]:.6f}' for rec in records]
+        lines += ["# HELP lxg_stage_rows_total Rows handled per workflow stage and layer",
+                  "# TYPE lxg_stage_rows_total counter"]
+        lines += [f'lxg_stage_rows_total{{{labels(rec)}}} {rec["rows"]}' for rec in records]
+
+        # write then rename, the textfile collector must never read a half written file
+        temp = f"{filename}.{os.getpid()}.tmp"
+        with open(temp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp, filename)
+
+        return filename
+
+
+registry = MetricsRegistry()
+
+
+class _MetricsHandler(logging.Handler):
+    """Listener side: fold spans measured in other processes into the main registry"""
+    def emit(self, record):
+        if getattr(record, "metric", False) and record.process != os.getpid():
+            registry.observe(record.stage, getattr(record, "layer", None), record.duration, getattr(record, "rows", None))
+
+
+register_handler(_MetricsHandler())
+
+
+class span:
+    """Context manager timing one stage (optionally for one layer). Set `.rows` inside the block to count rows."""
+    def __init__(self, stage, layer=None, rows=None):
+        self.stage = stage
+        self.layer = layer
+        self.rows = rows
+        self.duration = None
+
+    def __enter__(self):
+        self.profiler = profiling.current()
+        if self.profiler is not None:
+            self.profiler.enter(self.stage)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.duration = time.perf_counter() - self.start
+        if self.profiler is not None:
+            self.profiler.exit()
+        registry.observe(self.stage, self.layer, self.duration, self.rows)
+        spans.debug(f"{self.stage} {self.layer or ''} {self.duration:.3f}s",
+                    extra={"stage": self.stage, "layer": self.layer, "duration": round(self.duration, 6),
+                           "rows": self.rows, "metric": True})
+        return False
+
+
+def timed(stage, layer=None):
+    """Decorator version of `span`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage, layer):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export(run, directory=None, clear=True):
+    """Write the aggregated metrics of a run (including pool workers) to <run>.prom and <run>-<time>.json.
+    With profiling enabled the merged profile report of the run is written as well."""
+    directory = os.environ.get("LXG_METRICS_DIR", METRICS_DIR) if directory is None else directory
+    os.makedirs(directory, exist_ok=True)
+    drain()
+
+    now = datetime.today().strftime("%Y%m%d%H%M%S")
+    json_file = registry.to_json(os.path.join(directory, f"{run}-{now}.json"), run)
+    prom_file = registry.to_prometheus(os.path.join(directory, f"{run}.prom"), run)
+    if clear:
+        registry.clear()
+
+    if profiling.enabled():
+        report_file = profiling.report(run)
+        log.info(f"Profile report: {report_file}")
+
+    return json_file, prom_file
@@ -1,19 +1,25 @@
 import os
 import re
 import sys
-import time
-import arcpy
 from tqdm import tqdm
-import tempfile
-import shutil
-import uuid
-import multiprocessing as mp
+import logging
+
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
+from .apis import get_backend, ConnectionManager
+from .logger import worker_pool
+from .metrics import span, export
+
+log = logging.getLogger("MIGRATION")
 
 
 class GDB2SDE:
     def __init__(self, geodatabase, sde_instance, sde_platform,
                  sde_username, sde_password, sde_database,
-                 wildcard_datasets="*", wildcard_featureclass="*"):
+                 wildcard_datasets="*", wildcard_featureclass="*", backend=None, processes=4, connections=None, frozen=None):
         self.gdb = geodatabase
         self.platform = sde_platform
         self.instance = sde_instance
@@ -22,18 +28,24 @@ class GDB2SDE:
         self.database = sde_database
         self.wildcard_ds = wildcard_datasets
         self.wildcard_fc = wildcard_featureclass
+        self.backend = get_backend(backend)
+        self.connections = ConnectionManager(backend=self.backend) if connections is None else connections
+        # workers beyond the session cap would only wait for a free slot
+        self.processes = max(1, min(processes, self.connections.max_sessions))
+        # `LXG.FrozenRegistry`, its layers already in SDE are left untouched
+        self.frozen = frozen
 
-        self.temp_dir = tempfile.mkdtemp()
-
-        self.UpgradeDatasets()
-
-        self.sde = self.temp_connection()
+        if self.backend.name == "arcpy":
+            with span("upgrade"):
+                self.UpgradeDatasets()
 
-        arcpy.env.workspace = self.gdb
+        with span("connection"):
+            self.sde = self.connections.get(self.platform, self.instance, self.usr, self.pwd, self.database)
 
         exist_ds = []
         nonexist_ds = []
-        dss = sorted(arcpy.ListDatasets(self.wildcard_ds, "ALL"))
+        with span("catalog"):
+            dss = self.backend.list_datasets(self.gdb, self.wildcard_ds, "ALL")
         pbar01 = tqdm(dss, position=0, colour='GREEN')
         for ds in pbar01:
             pbar01.set_description(ds)
@@ -41,19 +53,23 @@ class GDB2SDE:
                 src_data = os.path.join(self.gdb, ds)
                 out_data = os.path.join(self.sde,
                                         f"{self.database}.sde.{ds}" if self.platform == "POSTGRESQL" else f"SDE.{ds}")
-                if arcpy.Exists(out_data):
+                if self.backend.exists(out_data):
+                    if self.frozen is not None and self.frozen.is_frozen(ds):
+                        continue
                     exist_ds.append([src_data, out_data])
                 else:
                     nonexist_ds.append([src_data, out_data])
             except Exception as e:
-                arcpy.AddError(e)
+                self.backend.error(e)
 
         # change Alias
-        self.ChangeAlias()
+        if self.backend.name == "arcpy":
+            with span("alias"):
+                self.ChangeAlias()
 
         # run multiprocessing
         if len(exist_ds) > 0:
-            with mp.Pool(processes=4) as pool:
+            with worker_pool(processes=self.processes) as pool:
                 results = tqdm(pool.imap(self.truncate_append, exist_ds),
                                total=len(exist_ds),
                                desc="Append",
@@ -66,7 +82,7 @@ class GDB2SDE:
                 del results
 
         if len(nonexist_ds) > 0:
-            with mp.Pool(processes=4) as pool2:
+            with worker_pool(processes=self.processes) as pool2:
                 results = tqdm(pool2.imap(self.copy_datasets, nonexist_ds),
                                total=len(nonexist_ds),
                                desc="Copy",
@@ -78,103 +94,35 @@ class GDB2SDE:
 
                 del results
 
-        time.sleep(2.0)
-        try:
-            arcpy.Delete_management(self.temp_dir)
-            # shutil.rmtree(self.temp_dir)
-        except arcpy.ExecuteError as e:
-            arcpy.AddError(e)
-
-    def temp_connection(self):
-        # create connection parameters
-
-        if self.platform == "oracle":
-            platform = "ORACLE"
-        elif self.platform == "postgres":
-            platform = "POSTGRESQL"
-        else:
-            platform = self.platform
-
-        assert self.platform is not None or self.platform != ""
-
-        f_uid = uuid.uuid4()
-        conn = {"out_folder_path": self.temp_dir,
-                "out_name": f'temp_{str(f_uid.hex)}.sde',
-                "database_platform": platform,
-                "instance": self.instance,
-                "account_authentication": "DATABASE_AUTH",
-                "database": self.database if platform == "POSTGRESQL" else "",
-                "username": self.usr,
-                "password": self.pwd,
-                "save_user_pass": "SAVE_USERNAME"}
-
-        temp_sde = os.path.join(conn["out_folder_path"], conn["out_name"])
-
-        if arcpy.Exists(temp_sde):
-            arcpy.Delete_management(temp_sde)
-
-        arcpy.CreateDatabaseConnection_management(**conn)
-
-        return temp_sde
+        export("gdb2sde")
 
     def copy_datasets(self, dataset):
         try:
-            arcpy.Copy_management(dataset[0], dataset[1])
-        except arcpy.ExecuteError as e:
-            arcpy.AddError(e)
+            with self.connections.session(self.sde), span("copy", layer=os.path.basename(dataset[1])):
+                self.backend.copy(dataset[0], dataset[1])
+        except self.backend.Error as e:
+            log.error(f"Copy {dataset[0]} failed: {e}", extra={"stage": "copy", "layer": os.path.basename(dataset[1])})
 
     def truncate_append(self, dataset):
-        arcpy.env.workspace = dataset[1]
-        feats = sorted(arcpy.ListFeatureClasses("", "All", dataset[1]))
+        with self.connections.session(self.sde):
+            self._truncate_append(dataset)
+
+    def _truncate_append(self, dataset):
+        feats = self.backend.list_featureclasses(self.sde, "", "All", os.path.basename(dataset[1]))
         for fc in feats:
+            if self.frozen is not None and self.frozen.is_frozen(fc):
+                continue
             try:
-                fc_uid = uuid.uuid4()
-                arcpy.MakeTableView_management(os.path.join(dataset[1], fc), f"{fc}_tab_{str(fc_uid)}")
-                query = f"OBJECTID IS NOT NULL"
-                arcpy.SelectLayerByAttribute_management(f"{fc}_tab_{str(fc_uid)}", "NEW_SELECTION", query)
-                arcpy.DeleteRows_management(f"{fc}_tab_{str(fc_uid)}")
-                arcpy.SelectLayerByAttribute_management(f"{fc}_tab_{str(fc_uid)}", "CLEAR_SELECTION")
-                arcpy.Delete_management(f"{fc}_tab_{str(fc_uid)}")
-
-                del fc_uid
-            except arcpy.ExecuteError as e:
-                arcpy.AddError(e)
+                with span("truncate", layer=fc):
+                    self.backend.truncate(os.path.join(dataset[1], fc))
+            except self.backend.Error as e:
+                log.error(f"Truncate {fc} failed: {e}", extra={"stage": "truncate", "layer": fc})
 
             try:
-                fieldMappings = self.fieldmapping(os.path.join(dataset[0], fc),
-                                                  os.path.join(dataset[1], fc))
-                arcpy.Append_management(inputs=os.path.join(dataset[0], fc),
-                                        target=os.path.join(dataset[1], fc),
-                                        schema_type="NO_TEST",
-                                        field_mapping=fieldMappings
-                                        )
-                del fieldMappings
-            except arcpy.ExecuteError as e:
-                arcpy.AddError(e)
-
-    def fieldmapping(self, fc_source, fc_target):
-        fieldMappings = arcpy.FieldMappings()
-        field_tgt = arcpy.ListFields(fc_target)
-        namelist_tgt = []
-        exclude_list = ['OBJECT_ID',
-                        'OBJECTID',
-                        'OBJECT_ID1',
-                        'OBJECT_ID2',
-                        'SHAPE']
-
-        # Creating field maps for the two files
-        fieldMappings.addTable(fc_source)
-        fieldMappings.addTable(fc_target)
-
-        for fd in field_tgt:
-            if fd.name not in exclude_list and fd.type != "OID" and fd.editable is True:
-                namelist_tgt.append(fd.name)
-
-        for field in fieldMappings.fields:
-            if field.name not in namelist_tgt:
-                fieldMappings.removeFieldMap(fieldMappings.findFieldMapIndex(field.name))
-
-        return fieldMappings
+                with span("append", layer=fc):
+                    self.backend.append(os.path.join(dataset[0], fc), os.path.join(dataset[1], fc))
+            except self.backend.Error as e:
+                log.error(f"Append {fc} failed: {e}", extra={"stage": "append", "layer": fc})
 
     def UpgradeDatasets(self):
         if arcpy.Exists(self.gdb):
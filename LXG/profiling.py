@@ -0,0 +1,222 @@
+"""
+Author : Lerry William
+
+Opt-in profiling of workflow stages. When enabled, every outermost `LXG.metrics.span` is run under
+its own cProfile profiler (one per stage, accumulated over layers) and tracemalloc records its peak
+memory, in the main process and in every pool worker. Time spent in the main process outside any
+stage (loops, tqdm, ...) is collected as "(outside stages)". At the end of a workflow the profiles
+of all processes are merged into one report saved next to the active replication/migration log.
+
+Enable with the environment variable `LXG_PROFILE=1`, by calling `enable()`, or from the command line:
+    ```
+    python -m LXG.profiling nightly_replication.py --some-arg
+    ```
+"""
+import os
+import io
+import re
+import sys
+import json
+import glob
+import shutil
+import pstats
+import cProfile
+import tempfile
+import tracemalloc
+import multiprocessing as mp
+from datetime import datetime
+from . import logger
+
+ENV = "LXG_PROFILE"
+ENV_DIR = "LXG_PROFILE_DIR"
+PROFILE_DIR = os.path.join(os.path.expanduser('~'), ".LXG_WORKSPACE", "profiles")
+OUTSIDE = "(outside stages)"
+
+_state = None
+
+
+def _filename(stage):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', stage)
+
+
+def _is_main():
+    return mp.current_process().name == 'MainProcess'
+
+
+class _Profiler:
+    """Profilers of the current process, keyed by stage"""
+    def __init__(self, raw_dir):
+        self.raw_dir = raw_dir
+        self.pid = os.getpid()
+        self.main = _is_main()
+        self.stages = {}
+        self.peaks = {}
+        self.top = {}
+        self.depth = 0
+        self.current = None
+        os.makedirs(self.raw_dir, exist_ok=True)
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        self.base = None
+        if self.main:
+            self.base = cProfile.Profile()
+            self.base.enable()
+
+    def enter(self, stage):
+        self.depth += 1
+        if self.depth > 1:
+            # nested spans are profiled as part of the outermost stage
+            return
+        if self.base is not None:
+            self.base.disable()
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        self.current = stage
+        self.stages.setdefault(stage, cProfile.Profile()).enable()
+
+    def exit(self):
+        self.depth -= 1
+        if self.depth > 0:
+            return
+        stage = self.current
+        self.stages[stage].disable()
+
+        peak = tracemalloc.get_traced_memory()[1]
+        if peak > self.peaks.get(stage, -1):
+            self.peaks[stage] = peak
+            stats = tracemalloc.take_snapshot().statistics('lineno')[:5]
+            self.top[stage] = [str(s) for s in stats]
+
+        if not self.main:
+            # pool workers are terminated without atexit, so keep the files current
+            self.dump(stage)
+        if self.base is not None:
+            self.base.enable()
+
+    def dump(self, stage=None):
+        stages = self.stages if stage is None else {stage: self.stages[stage]}
+        for name, prof in stages.items():
+            prof.dump_stats(os.path.join(self.raw_dir, f"{_filename(name)}.{self.pid}.prof"))
+        if self.base is not None:
+            self.base.disable()
+            self.base.dump_stats(os.path.join(self.raw_dir, f"{_filename(OUTSIDE)}.{self.pid}.prof"))
+            self.base.enable()
+        with open(os.path.join(self.raw_dir, f"memory.{self.pid}.json"), "w") as f:
+            json.dump({"pid": self.pid, "peaks": self.peaks, "top": self.top,
+                       "names": {_filename(k): k for k in list(self.stages) + [OUTSIDE]}}, f)
+
+    def stop(self):
+        for prof in self.stages.values():
+            prof.disable()
+        if self.base is not None:
+            self.base.disable()
+
+
+def current():
+    """Profiler of this process, or None when profiling is off"""
+    global _state
+    if _state is not None and _state.pid == os.getpid():
+        return _state
+    if os.environ.get(ENV, "0") in ("", "0"):
+        return None
+
+    if _state is not None:
+        # forked worker: the parent profilers were copied with the process, switch them off
+        _state.stop()
+    raw_dir = os.environ.get(ENV_DIR) or os.path.join(tempfile.gettempdir(), f"lxg_profile_{os.getpid()}")
+    os.environ[ENV_DIR] = raw_dir
+    _state = _Profiler(raw_dir)
+
+    return _state
+
+
+def enabled():
+    return current() is not None
+
+
+def enable():
+    """Switch profiling on for this process and every pool worker started afterwards"""
+    os.environ[ENV] = "1"
+
+    return current()
+
+
+def report(run, directory=None, top=25):
+    """Merge stage profiles of all processes into one text report (plus one merged .prof per stage).
+    Saved next to the active log file, or in ~/.LXG_WORKSPACE/profiles."""
+    global _state
+    profiler = current()
+    if profiler is None:
+        return None
+    profiler.dump()
+
+    if directory is None:
+        directory = logger.log_directory() or PROFILE_DIR
+    now = datetime.today().strftime("%Y%m%d%H%M%S")
+    out_dir = os.path.join(directory, f"profile-{run}-{now}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    peaks, tops, names = {}, {}, {}
+    for mem_file in glob.glob(os.path.join(profiler.raw_dir, "memory.*.json")):
+        with open(mem_file) as f:
+            doc = json.load(f)
+        names.update(doc["names"])
+        for stage, peak in doc["peaks"].items():
+            if peak > peaks.get(stage, (-1, None))[0]:
+                peaks[stage] = (peak, doc["pid"])
+                tops[stage] = doc["top"].get(stage, [])
+
+    files = {}
+    for prof_file in glob.glob(os.path.join(profiler.raw_dir, "*.prof")):
+        stage = os.path.basename(prof_file).rsplit(".", 2)[0]
+        files.setdefault(stage, []).append(prof_file)
+
+    out = io.StringIO()
+    out.write(f"LXG profile report: {run} ({now})\n\n")
+    out.write(f"{'Stage':<30}{'Peak memory (MB)':>18}{'PID':>10}\n")
+    for stage, (peak, pid) in sorted(peaks.items(), key=lambda x: -x[1][0]):
+        out.write(f"{stage:<30}{peak / 1024 ** 2:>18.1f}{pid:>10}\n")
+
+    for key in sorted(files):
+        stats = pstats.Stats(*files[key], stream=out)
+        stage = names.get(key, key)
+        stats.dump_stats(os.path.join(out_dir, f"{key}.prof"))
+        out.write(f"\n{'=' * 100}\nStage: {stage} - {len(files[key])} process(es), {stats.total_tt:.3f}s\n")
+        for line in tops.get(stage, []):
+            out.write(f"    {line}\n")
+        stats.sort_stats("cumulative").print_stats(top)
+
+    report_file = f"{out_dir}.txt"
+    with open(report_file, "w") as f:
+        f.write(out.getvalue())
+
+    # the next run starts from scratch, at its first `current()`
+    profiler.stop()
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    shutil.rmtree(profiler.raw_dir, ignore_errors=True)
+    _state = None
+    os.environ.pop(ENV_DIR, None)
+
+    return report_file
+
+
+def main(argv=None):
+    import runpy
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        sys.exit("Usage: python -m LXG.profiling script.py [args ...]")
+
+    enable()
+    sys.argv = argv
+    try:
+        runpy.run_path(argv[0], run_name="__main__")
+    finally:
+        report_file = report(os.path.splitext(os.path.basename(argv[0]))[0])
+        print(f"[INFO]\tProfile report: {report_file}")
+
+
+if __name__ == "__main__":
+    main()
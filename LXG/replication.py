@@ -2,8 +2,9 @@
 Author : Lerry William
 """
 import sys
-import arcpy
 import os
+import json
+import hashlib
 from tqdm import tqdm
 import multiprocessing as mp
 import numpy as np
@@ -15,7 +16,22 @@ from xhtml2pdf import pisa
 import time
 import uuid
 from datetime import date, timedelta
+
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
 from .utils import ToShapefile, delete_workdir
+from .apis import get_backend, basename, ConnectionManager, oid_ranges, where_ranges
+from .apis.base import OID, GEOMETRY, SKIP_TYPES, xy_resolution
+from .geometry import RaggedGeometry, polygon_centroids, line_midpoints, feature_points
+from .keyindex import key_frame, match_keys, unmatched
+from .spatial import PolygonIndex, new_points
+from .verification.verification import attribute_fields, content_hashes
+from .snapshot import Snapshot, SnapshotBackend
+from .logger import worker_pool
+from .metrics import span, timed, registry, export
 
 
 def process(seconds):
@@ -64,13 +80,44 @@ class BatchImportXML:
 
 
 class AppendNewFeatures:
+    """Detect features added in the latest geodatabase and append them into the initial geodatabase.
+
+    Args:
+        init_geodatabase: initial geodatabase, receives the new features
+        latest_geodatabase: latest geodatabase
+        division: LASIS divisional abbreviation eg. KCH, BTU, LBG ...
+        datasets_wildcard (optional): Query for interested dataset layer(s)
+        feature_wildcard (optional): Query for interested featureclass layer(s)
+        report (optional): Save the count of new features per featureclass as csv
+        report_output_directory (optional): Directory of the report
+        backend (optional): "arcpy", "ogr" or a `LXG.apis.Backend`, default arcpy when available
+        business_key (optional): fields identifying a feature, eg. ["GENAMAP_TAG"]. In the layers having
+            them all, features with the same key and geometry in both geodatabases are matched first,
+            only the others go through the spatial comparison
+        frozen (optional): `LXG.FrozenRegistry`, its layers are not compared
+
+    Usage:
+        ```
+        AppendNewFeatures(r"/data/KCH_19C.gdb", r"/data/KCH_LATEST.gdb", "KCH", backend="ogr")
+        ```
+    """
+    # centroids of unchanged features are within this distance (meters) in both geodatabases
+    tolerance = 0.5
+    # init polygons with their centre this far (meters) inside a new polygon are replaced by it
+    shrink = 0.2
+    # terms per where clause when reading new polygons and deleting replaced ones
+    delete_batch_size = 1000
+
     def __init__(self, init_geodatabase,
                  latest_geodatabase,
                  division,
                  datasets_wildcard=None,
                  feature_wildcard=None,
                  report=False,
-                 report_output_directory=None):
+                 report_output_directory=None,
+                 backend=None,
+                 business_key=None,
+                 frozen=None):
         self.gdb1 = init_geodatabase
         self.gdb2 = latest_geodatabase
         self.div = division
@@ -78,10 +125,18 @@ class AppendNewFeatures:
         self.fc_wildcard = f"*" if feature_wildcard is None or feature_wildcard == "" else feature_wildcard
         self.create_report = report
         self.report_out_dir = report_output_directory
+        self.backend = get_backend(backend)
         self.processor_num = 4 if mp.cpu_count() >= 4 else (2 if mp.cpu_count() == 2 else 1)
         self.new_ds_list = list()
+        # {(gdb1 | gdb2, featureclass): (oids, xy)} centroids / midpoints, and OIDs of the new features
+        self.points = {}
+        self.new_features = {}
+        # {(gdb1 | gdb2, featureclass): (key fields, key frame)} of the layers carrying the business key
+        self.business_key = list(business_key or [])
+        self.keys = {}
+        self.frozen = frozen
         start0 = time.time()
-        arcpy.AddMessage(f'[INFO]\tProcessing start at {time.strftime("%H:%M:%S", time.localtime())}')
+        self.backend.message(f'[INFO]\tProcessing start at {time.strftime("%H:%M:%S", time.localtime())}')
 
         delete_workdir()
 
@@ -91,21 +146,21 @@ class AppendNewFeatures:
 
         os.makedirs(output_lasis)
 
-        if arcpy.Exists(self.gdb1) or arcpy.Exists(self.gdb2):
+        if self.backend.exists(self.gdb1) or self.backend.exists(self.gdb2):
             pass
         else:
             sys.exit("Invalid init_geodatabase or latest_geodatabase input. System exit...")
 
         try:
-            self.memory = "in_memory"
             self.prepare_features(self.gdb1)
             self.prepare_features(self.gdb2)
 
             check_list = self.check_differences()
 
             self.append_latest(check_list)
-            arcpy.AddMessage(f'[INFO]\tConverting affected layers to shapefile...')
-            ToShapefile(self.gdb1, output_lasis, check_list).run()
+            self.backend.message(f'[INFO]\tConverting affected layers to shapefile...')
+            with span("export"):
+                self.to_shapefile(check_list, output_lasis)
 
             if self.create_report:
                 if self.report_out_dir is not None:
@@ -119,331 +174,140 @@ class AppendNewFeatures:
             else:
                 pass
 
-            arcpy.Compact_management(self.gdb1)
-            arcpy.Compact_management(self.gdb2)
+            with span("compaction"):
+                self.backend.compact(self.gdb1)
+                self.backend.compact(self.gdb2)
 
             stop0 = time.time()
-            arcpy.AddMessage(f'[INFO]\tProcessing Done at {time.strftime("%H:%M:%S", time.localtime())}'
-                             f'\nTotal time {process(stop0 - start0)}s ...')
+            self.backend.message(f'[INFO]\tProcessing Done at {time.strftime("%H:%M:%S", time.localtime())}'
+                                 f'\nTotal time {process(stop0 - start0)}s ...')
+            for stage, seconds in registry.summary().items():
+                self.backend.message(f'[INFO]\t\t{stage:<12} {process(seconds)}')
+            export("append_new_features")
 
-            arcpy.ClearWorkspaceCache_management()
-            arcpy.Delete_management(self.memory)
-        except arcpy.ExecuteError as e:
-            arcpy.Delete_management(self.memory)
-            arcpy.AddError(e)
+            self.backend.clear_scratch()
+        except self.backend.Error as e:
+            self.backend.clear_scratch()
+            self.backend.error(e)
 
     def prepare_features(self, geodatabase):
-        fc_class_name = None
-        if geodatabase == self.gdb1:
-            fc_class_name = 'gdb1'
-        elif geodatabase == self.gdb2:
-            fc_class_name = 'gdb2'
-        else:
-            pass
-
-        arcpy.env.workspace = geodatabase
-        dss = sorted(arcpy.ListDatasets(self.ds_wildcard, "Feature"))
+        with span("catalog"):
+            dss = self.backend.list_datasets(geodatabase, self.ds_wildcard)
         pbar01 = tqdm(dss, desc=f'{geodatabase}', position=0, colour='GREEN')
         for ds in pbar01:
-            # Polygon
-            fc_poly = sorted(arcpy.ListFeatureClasses(self.fc_wildcard, "Polygon", ds))
-            if len(fc_poly) > 0:
-                pbar03 = tqdm(fc_poly, desc="Polygon", position=1, colour='Yellow', leave=False)
-                for poly in pbar03:
-                    self._polys([os.path.join(geodatabase, ds, poly),
-                                 geodatabase,
-                                 os.path.join(self.memory, f'{fc_class_name}_{poly}_pts'),
-                                 os.path.join(self.memory, f'{fc_class_name}_{poly}_buf')
-                                 ])
-
-            # Polyline
-            fc_lines = sorted(arcpy.ListFeatureClasses(self.fc_wildcard, "Polyline", ds))
-            if len(fc_lines) > 0:
-                pbar03 = tqdm(fc_lines, desc="Polyline", position=1, colour='Yellow', leave=False)
-                for line in pbar03:
-                    # pbar03.set_description(line)
-                    input_line = os.path.join(geodatabase, ds, line)
-                    pts_feat_line = os.path.join(self.memory, f'{fc_class_name}_{line}_pts')
-                    if arcpy.Exists(pts_feat_line):
-                        pass
-                    else:
-                        arcpy.GeneratePointsAlongLines_management(Input_Features=input_line,
-                                                                  Output_Feature_Class=pts_feat_line,
-                                                                  Point_Placement="PERCENTAGE",
-                                                                  Distance="",
-                                                                  Percentage=50,
-                                                                  Include_End_Points="")
-                    try:
-                        if geodatabase == self.gdb1:
-                            # Execute the Buffer tool of initial geodatabase
-                            arcpy.Buffer_analysis(pts_feat_line,
-                                                  os.path.join(self.memory, f'{fc_class_name}_{line}_buf'),
-                                                  "0.5 meters")
-                            arcpy.Delete_management(pts_feat_line)
-                    except arcpy.ExecuteError as e:
-                        arcpy.AddError(e)
-
-                    del pts_feat_line
-
-            # Points
-            fc_points = sorted(arcpy.ListFeatureClasses(self.fc_wildcard, "Point", ds))
-            if len(fc_points) > 0:
-                fc_points_list = [[os.path.join(geodatabase, ds, pts),
-                                   geodatabase,
-                                   os.path.join(self.memory, f'{fc_class_name}_{pts}_pts'),
-                                   os.path.join(self.memory, f'{fc_class_name}_{pts}_buf')] for pts in fc_points]
-                with mp.Pool(processes=self.processor_num) as pool3:
-                    results = tqdm(pool3.imap(self._points, fc_points_list),
-                                   total=len(fc_points_list),
-                                   desc="Points",
-                                   position=1,
-                                   colour='YELLOW', leave=False)
-                    tuple(results)
-                    pool3.close()
-                    pool3.join()
-
-                    del results
-
-        del fc_class_name
+            for shape_type, kernel in (("Polygon", polygon_centroids), ("Polyline", line_midpoints), ("Point", None)):
+                fcs = self.backend.list_featureclasses(geodatabase, self.fc_wildcard, shape_type, ds)
+                pbar03 = tqdm(fcs, desc=shape_type, position=1, colour='Yellow', leave=False)
+                for fc in pbar03:
+                    if self.frozen is not None and self.frozen.is_frozen(fc):
+                        continue
+                    self._prepare([os.path.join(geodatabase, ds, fc), geodatabase], kernel)
 
         return None
 
-    def _polys(self, fc_list):
-        geodatabase = fc_list[1]
-        pts_feat_poly = fc_list[2]
-        buf_feat_poly = fc_list[3]
-
-        try:
-            arcpy.FeatureToPoint_management(fc_list[0], pts_feat_poly, "CENTROID")
-            if geodatabase == self.gdb1:
-                # Execute the Buffer tool if initial geodatabase
-                arcpy.Buffer_analysis(pts_feat_poly,
-                                      buf_feat_poly,
-                                      "0.5 meters")
-                # arcpy.Delete_management(pts_feat_poly)
-        except arcpy.ExecuteError as e:
-            arcpy.AddError(e)
-
-    def _lines(self, fc_list):
-        input_line = fc_list[0]
-        geodatabase = fc_list[1]
-        pts_feat_line = fc_list[2]
-        buf_feat_line = fc_list[3]
+    def key_fields(self, featureclass):
+        """Business key fields (as named in the featureclass), [] when it does not carry them all"""
+        if not self.business_key:
+            return []
+        names = {name.upper(): name for name, _, _ in self.backend.describe(featureclass)["fields"]}
 
-        try:
-            arcpy.GeneratePointsAlongLines_management(Input_Features=input_line,
-                                                      Output_Feature_Class=pts_feat_line,
-                                                      Point_Placement="PERCENTAGE",
-                                                      Distance="",
-                                                      Percentage=50,
-                                                      Include_End_Points="")
-            if geodatabase == self.gdb1:
-                # Execute the Buffer tool if initial geodatabase
-                arcpy.Buffer_analysis(pts_feat_line,
-                                      buf_feat_line,
-                                      "0.5 meters")
-                # arcpy.Delete_management(pts_feat_line)
-        except arcpy.ExecuteError as e:
-            arcpy.AddError(e)
-
-    def _points(self, fc_list):
-        geodatabase = fc_list[1]
-        pts_feat_pts = fc_list[2]
-        buf_feat_pts = fc_list[3]
+        return [names[f.upper()] for f in self.business_key] if all(f.upper() in names for f in self.business_key) \
+            else []
 
+    def _prepare(self, fc_list, kernel=None):
+        """Points (centroids, midpoints) of a [featureclass, geodatabase] task, computed by `kernel`"""
         try:
-            arcpy.CopyFeatures_management(fc_list[0], pts_feat_pts)
-            if geodatabase == self.gdb1:
-                # Execute the Buffer tool if initial geodatabase
-                arcpy.Buffer_analysis(fc_list[0],
-                                      buf_feat_pts,
-                                      "0.5 meters")
-                # arcpy.Delete_management(pts_feat_pts)
-        except arcpy.ExecuteError as e:
-            arcpy.AddError(e)
-
-    def intersect(self, in_layer, select_features):
-        _, _, selected_count = arcpy.SelectLayerByLocation_management(
-            in_layer=in_layer,
-            overlap_type="INTERSECT",
-            select_features=select_features,
-            selection_type="NEW_SELECTION",
-            invert_spatial_relationship="INVERT")
-
-        arcpy.SelectLayerByAttribute_management(select_features, "CLEAR_SELECTION")
-
-        # int(arcpy.GetCount_management(fc_pts)[0])
-        selected_layer, _, _ = arcpy.SelectLayerByLocation_management(
-            in_layer=in_layer,
-            overlap_type="INTERSECT",
-            select_features=select_features,
-            selection_type="NEW_SELECTION",
-            invert_spatial_relationship="NOT_INVERT")
-
-        arcpy.DeleteRows_management(selected_layer)
-
-        arcpy.SelectLayerByAttribute_management(in_layer, "CLEAR_SELECTION")
-
-        return int(selected_count)
+            with span("centroid", layer=os.path.basename(fc_list[0])) as s:
+                key = self.point_key(fc_list)
+                fields = self.key_fields(fc_list[0])
+                if kernel is None and not fields:
+                    self.points[key] = self.backend.centroids(fc_list[0])
+                else:
+                    df = self.backend.read(fc_list[0], fields=fields)
+                    xy = (kernel or feature_points)(RaggedGeometry.from_wkb(df[GEOMETRY]))
+                    valid = ~np.isnan(xy[:, 0])
+                    self.points[key] = df[OID].to_numpy(dtype=np.int64)[valid], xy[valid]
+                    if fields:
+                        self.keys[key] = fields, key_frame(df, fields,
+                                                           xy_resolution(self.backend.describe(fc_list[0])))
+                s.rows = len(self.points[key][0])
+        except self.backend.Error as e:
+            self.backend.error(e)
+
+    def point_key(self, fc_list):
+        """(gdb1 | gdb2, featureclass) of a [featureclass, geodatabase] task"""
+        return 'gdb1' if fc_list[1] == self.gdb1 else 'gdb2', os.path.basename(fc_list[0])
+
+    def key_match(self, fc, oids, xy, old_oids, old_xy):
+        """Drop the features with equal business key and geometry in both geodatabases"""
+        if ('gdb1', fc) not in self.keys or ('gdb2', fc) not in self.keys:
+            return oids, xy, old_xy
+        fields, old_keys = self.keys[('gdb1', fc)]
+        with span("keymatch", layer=fc) as s:
+            latest_oids, init_oids = match_keys(old_keys, self.keys[('gdb2', fc)][1], fields)
+            s.rows = len(latest_oids)
+        rest = unmatched(oids, latest_oids)
+
+        return oids[rest], xy[rest], old_xy[unmatched(old_oids, init_oids)]
 
     def check_differences(self):
-        arcpy.env.workspace = self.gdb2
         new_features_list = []
-        dss = sorted(arcpy.ListDatasets(self.ds_wildcard, "Feature"))
+        with span("catalog"):
+            dss = self.backend.list_datasets(self.gdb2, self.ds_wildcard)
         pbar01 = tqdm(dss, desc='Detect changes', position=0, colour='GREEN')
         for ds in pbar01:
-            fcs = sorted(arcpy.ListFeatureClasses(self.fc_wildcard, "Polygon", ds))
-            pbar02 = tqdm(fcs, position=1, colour='Yellow', leave=False)
-            for fc in pbar02:
-                pbar02.set_description(fc)
-                fc_pts = os.path.join(self.memory, f'gdb2_{fc}_pts')
-                old_fc_buf = os.path.join(self.memory, f'gdb1_{fc}_buf')
-                try:
-                    if arcpy.Exists(fc_pts):
-                        if arcpy.Exists(old_fc_buf):
-                            get_count = self.intersect(fc_pts, old_fc_buf)
-                            if get_count > 0:
-                                new_features_list.append((fc, get_count))
-                except arcpy.ExecuteError as e:
-                    arcpy.AddError(e)
-
-            fcs = sorted(arcpy.ListFeatureClasses(self.fc_wildcard, "Polyline", ds))
-            pbar03 = tqdm(fcs, position=1, colour='Yellow', leave=False)
-            for fc in pbar03:
-                pbar03.set_description(fc)
-                fc_pts = os.path.join(self.memory, f'gdb2_{fc}_pts')
-                old_fc_buf = os.path.join(self.memory, f'gdb1_{fc}_buf')
-                try:
-                    if arcpy.Exists(fc_pts):
-                        if arcpy.Exists(old_fc_buf):
-                            get_count = self.intersect(fc_pts, old_fc_buf)
-                            if get_count > 0:
-                                new_features_list.append((fc, get_count))
-                except arcpy.ExecuteError as e:
-                    arcpy.AddError(e)
-
-            fcs = sorted(arcpy.ListFeatureClasses(self.fc_wildcard, "Point", ds))
-            pbar04 = tqdm(fcs, position=1, colour='Yellow', leave=False)
-            for fc in pbar04:
-                pbar04.set_description(fc)
-                fc_pts = os.path.join(self.memory, f'gdb2_{fc}_pts')
-                old_fc_buf = os.path.join(self.memory, f'gdb1_{fc}_buf')
-                try:
-                    if arcpy.Exists(fc_pts):
-                        if arcpy.Exists(old_fc_buf):
-                            get_count = self.intersect(fc_pts, old_fc_buf)
-                            if get_count > 0:
-                                new_features_list.append((fc, get_count))
-                except arcpy.ExecuteError as e:
-                    arcpy.AddError(e)
+            for shape_type in ("Polygon", "Polyline", "Point"):
+                fcs = self.backend.list_featureclasses(self.gdb2, self.fc_wildcard, shape_type, ds)
+                pbar02 = tqdm(fcs, position=1, colour='Yellow', leave=False)
+                for fc in pbar02:
+                    pbar02.set_description(fc)
+                    if ('gdb2', fc) not in self.points or ('gdb1', fc) not in self.points:
+                        continue
+                    # features of latest without an init feature point within tolerance
+                    oids, xy, old_xy = self.key_match(fc, *self.points[('gdb2', fc)], *self.points[('gdb1', fc)])
+                    with span("detection", layer=fc) as s:
+                        self.new_features[fc], _ = new_points(oids, xy, old_xy, self.tolerance)
+                        get_count = s.rows = len(self.new_features[fc])
+                    if get_count > 0:
+                        new_features_list.append((fc, get_count))
 
         return new_features_list
 
-    def field_mappings(self, source_feature, target_feature, point_feat_dir):
-        field_src = arcpy.ListFields(source_feature)
-        field_tgt = arcpy.ListFields(target_feature)
-        namelist_tgt = []
-        namelist_src = []
-        exclude_list = ['OBJECT_ID', 'OBJECTID', 'OBJECT_ID1', 'OBJECT_ID2', 'SHAPE']
-
-        for fd in field_tgt:
-            if fd.name not in exclude_list:
-                namelist_tgt.append(fd.name)
-
-        for fd2 in field_src:
-            if fd2.name in namelist_tgt:
-                namelist_src.append((fd2.name, fd2.aliasName, fd2.type, fd2.length))
-
-        fd_mapping = ""
-        for name, alias, _type, _len in namelist_src:
-            fd_mapping += f'{name} "{alias}" true true false {_len} {_type} 0 0,First,#,{point_feat_dir},{name},0,{_len};'
-
-        return fd_mapping
-
-    def fieldmapping(self, fc_source, fc_target):
-        fieldMappings = arcpy.FieldMappings()
-        field_tgt = arcpy.ListFields(fc_target)
-        namelist_tgt = []
-        exclude_list = ['OBJECT_ID',
-                        'OBJECTID',
-                        'OBJECT_ID1',
-                        'OBJECT_ID2',
-                        'SHAPE']
-
-        # Creating field maps for the two files
-        fieldMappings.addTable(fc_source)
-        fieldMappings.addTable(fc_target)
-
-        for fd in field_tgt:
-            if fd.name not in exclude_list and fd.type != "OID" and fd.editable is True:
-                namelist_tgt.append(fd.name)
-
-        for field in fieldMappings.fields:
-            if field.name not in namelist_tgt:
-                fieldMappings.removeFieldMap(fieldMappings.findFieldMapIndex(field.name))
-
-        return fieldMappings
-
     def append_latest(self, featureclass_list):
         featureclass_list = np.array(featureclass_list)
-        arcpy.env.workspace = self.gdb2
+        if len(featureclass_list) == 0:
+            return
 
-        dss = sorted(arcpy.ListDatasets(self.ds_wildcard, "ALL"))
+        with span("catalog"):
+            dss = self.backend.list_datasets(self.gdb2, self.ds_wildcard)
         pbar01 = tqdm(dss, desc='Append', position=0, colour='GREEN')
         for ds in pbar01:
-            fcs = sorted(arcpy.ListFeatureClasses(self.fc_wildcard, "Polygon", ds))
+            fcs = self.backend.list_featureclasses(self.gdb2, self.fc_wildcard, "Polygon", ds)
             if len(fcs) > 0:
                 try:
                     fc_list = [[os.path.join(self.gdb1, ds, fc),
-                                os.path.join(self.gdb2, ds, fc),
-                                self.memory] for fc in fcs if fc in featureclass_list[:, 0]]
+                                os.path.join(self.gdb2, ds, fc)] for fc in fcs if fc in featureclass_list[:, 0]]
                     for fc in fc_list:
                         self.fast_poly_append(fc)
-                    # with mp.Pool(processes=self.processor_num) as pool1:
-                    #     results = tqdm(pool1.imap(self.fast_poly_append, fc_list),
-                    #                    total=len(fc_list),
-                    #                    desc='Append Polygons',
-                    #                    colour='Yellow',
-                    #                    position=1,
-                    #                    leave=False)
-                    #     tuple(results)
-                    #     pool1.close()
-                    #     pool1.join()
-                    #
-                    #     del results
                 except Exception as e:
-                    arcpy.AddError(e)
+                    self.backend.error(e)
 
             del fcs
 
-            fcs = sorted(arcpy.ListFeatureClasses(self.fc_wildcard, "Polyline", ds))
+            fcs = self.backend.list_featureclasses(self.gdb2, self.fc_wildcard, "Polyline", ds)
             if len(fcs) > 0:
                 fc_list = [[os.path.join(self.gdb1, ds, fc),
-                            os.path.join(self.gdb2, ds, fc),
-                            self.memory] for fc in fcs if fc in featureclass_list[:, 0]]
+                            os.path.join(self.gdb2, ds, fc)] for fc in fcs if fc in featureclass_list[:, 0]]
                 for fc in fc_list:
                     self.fast_append(fc)
-                # with mp.Pool(processes=self.processor_num) as pool2:
-                #     results = tqdm(pool2.imap(self.fast_append, fc_list),
-                #                    total=len(fc_list),
-                #                    desc='Append Polylines',
-                #                    colour='Yellow',
-                #                    position=1,
-                #                    leave=False)
-                #     tuple(results)
-                #     pool2.close()
-                #     pool2.join()
-                #
-                #     del results
 
             del fcs
 
-            fcs = sorted(arcpy.ListFeatureClasses(self.fc_wildcard, "Point", ds))
+            fcs = self.backend.list_featureclasses(self.gdb2, self.fc_wildcard, "Point", ds)
             if len(fcs) > 0:
                 fc_list = [[os.path.join(self.gdb1, ds, fc),
-                            os.path.join(self.gdb2, ds, fc),
-                            self.memory] for fc in fcs if fc in featureclass_list[:, 0]]
-                with mp.Pool(processes=self.processor_num) as pool3:
+                            os.path.join(self.gdb2, ds, fc)] for fc in fcs if fc in featureclass_list[:, 0]]
+                with worker_pool(processes=self.processor_num) as pool3:
                     results = tqdm(pool3.imap(self.fast_append, fc_list),
                                    total=len(fc_list),
                                    desc='Append Points',
@@ -458,81 +322,71 @@ class AppendNewFeatures:
 
             del fcs
 
-    def fast_append(self, fc):
-        _fc = os.path.basename(fc[1])
-
-        fc_pts = os.path.join(fc[2], f'gdb2_{_fc}_pts')
-
-        # Select the points that are touching the buffer using the Select Layer By Location tool
-        selected_layer, _, _ = arcpy.SelectLayerByLocation_management(fc[1], "INTERSECT", fc_pts)
-
-        _params = self.fieldmapping(selected_layer, fc[1])
+    def new_oids(self, fc):
+        """OIDs of the new features of a latest featureclass"""
+        return self.new_features.get(os.path.basename(fc), np.empty(0, dtype=np.int64))
 
+    @timed("append")
+    def fast_append(self, fc):
         try:
-            # Append selected points to a old version of feature class
-            arcpy.Append_management(selected_layer, fc[0], "NO_TEST", field_mapping=_params)
-        except arcpy.ExecuteError as e:
-            arcpy.AddError(e)
-
-        arcpy.SelectLayerByAttribute_management(selected_layer, "CLEAR_SELECTION")
+            # Append the new features to the old version of feature class
+            self.backend.append(fc[1], fc[0], oids=self.new_oids(fc[1]))
+        except self.backend.Error as e:
+            self.backend.error(e)
 
+    @timed("append")
     def fast_poly_append(self, fc):
-        _fc = os.path.basename(fc[1])
-
-        fc_pts = os.path.join(fc[2], f'gdb2_{_fc}_pts')
-
-        arcpy.SelectLayerByAttribute_management(fc[0], "CLEAR_SELECTION")
-        arcpy.SelectLayerByAttribute_management(fc[1], "CLEAR_SELECTION")
-
-        selected_layer01, _, _ = arcpy.SelectLayerByLocation_management(fc[1],
-                                                                        "INTERSECT",
-                                                                        fc_pts,
-                                                                        None,
-                                                                        "NEW_SELECTION",
-                                                                        "NOT_INVERT")
+        new_oids = self.new_oids(fc[1])
         # second round to avoid duplicate at the same place
-        selected_layer02, _, _ = arcpy.SelectLayerByLocation_management(fc[0],
-                                                                        "HAVE_THEIR_CENTER_IN",
-                                                                        selected_layer01,
-                                                                        "-0.2 Meters",
-                                                                        "NEW_SELECTION",
-                                                                        "NOT_INVERT")
-        # delete selected layer for old data
-        oid_nums = [int(fid) for fid in arcpy.Describe(selected_layer02).FIDSet.split(";") if fid != '']
-        oid_fieldname = arcpy.Describe(selected_layer02).OIDFieldName
-        # edit.startOperation()
-        if len(oid_nums) > 0:
+        old_oids = self.replaced(fc[0], fc[1], new_oids)
+        # delete selected layer for old data, in batches of OID ranges
+        if len(old_oids) > 0:
             try:
-                # Start an edit operation
-                query = f"{oid_fieldname} IN ({', '.join(str(x) for x in oid_nums)})"
-                with arcpy.da.UpdateCursor(fc[0], [f"{oid_fieldname}"], where_clause=query) as rows:
-                    for row in rows:
-                        rows.deleteRow()
+                self.backend.delete_oids(fc[0], old_oids, self.delete_batch_size)
             except Exception as e:
-                arcpy.AddError(e)
-            except arcpy.ExecuteError as e:
-                arcpy.AddError(e)
-        else:
-            pass
-
-        _params = self.field_mappings(source_feature=selected_layer01,
-                                      target_feature=fc[1],
-                                      point_feat_dir=fc_pts)
+                self.backend.error(e)
 
         try:
-            # Append selected points to a old version of feature class
-            arcpy.Append_management(selected_layer01,
-                                    fc[0],
-                                    "NO_TEST",
-                                    _params
-                                    )
-        except arcpy.ExecuteError as e:
-            arcpy.AddError(e)
-
-        del _params
-
-        arcpy.SelectLayerByAttribute_management(selected_layer01, "CLEAR_SELECTION")
-        arcpy.SelectLayerByAttribute_management(selected_layer02, "CLEAR_SELECTION")
+            # Append selected polygons to a old version of feature class
+            self.backend.append(fc[1], fc[0], oids=new_oids)
+        except self.backend.Error as e:
+            self.backend.error(e)
+
+    def replaced(self, init_featureclass, latest_featureclass, new_oids):
+        """OIDs of the init polygons having their centre `shrink` meters inside one of the new polygons"""
+        if len(new_oids) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        with span("replace", layer=os.path.basename(init_featureclass)) as s:
+            oid_field = self.backend.describe(latest_featureclass)["oid_field"]
+            wkbs = [wkb for where in where_ranges(oid_field, oid_ranges(new_oids), self.delete_batch_size)
+                    for _, wkb in self.backend.search(latest_featureclass, ["OID@", "SHAPE@WKB"], where)]
+            polygons = PolygonIndex(RaggedGeometry.from_wkb(wkbs), shrink=self.shrink)
+            oids, xy = self.backend.centroids(init_featureclass)
+            oids = oids[polygons.locate(xy) >= 0]
+            s.rows = len(oids)
+
+        return oids
+
+    def __getstate__(self):
+        # pool workers (point layers) do not need the in-memory points
+        state = self.__dict__.copy()
+        state["points"] = {}
+        return state
+
+    def to_shapefile(self, featureclass_list, output_directory):
+        if self.backend.name == "arcpy":
+            ToShapefile(self.gdb1, output_directory, featureclass_list).run()
+            return
+
+        names = [name for name, _ in featureclass_list]
+        for ds in self.backend.list_datasets(self.gdb1, self.ds_wildcard):
+            for fc in self.backend.list_featureclasses(self.gdb1, self.fc_wildcard, "All", ds):
+                if fc in names:
+                    try:
+                        self.backend.copy(os.path.join(self.gdb1, ds, fc), os.path.join(output_directory, f"{fc}.shp"))
+                    except self.backend.Error as e:
+                        self.backend.error(e)
 
     def report(self, featureclass_list):
         """
@@ -554,13 +408,48 @@ class AppendNewFeatures:
         return f'{cls}(init_geodatabase={self.gdb1}, ' \
                f'latest_geodatabase={self.gdb2},' \
                f'report={self.create_report},' \
-               f'report_output_directory={self.report_out_dir})\n' \
+               f'report_output_directory={self.report_out_dir},' \
+               f'backend={self.backend.name})\n' \
                f'Processor number : {self.processor_num}\n'
 
 
 class ReplicateSDE2GDB:
+    """Copy the datasets of an SDE database into a file geodatabase.
+
+    Args:
+        sde_instance: Oracle instance of the SDE database, or a `LXG.Snapshot` of it (incremental mode)
+        sde_username: SDE user
+        sde_password: password of the SDE user
+        output_directory: folder of the file geodatabase
+        file_gdb: name of the file geodatabase
+        wildcard_datasets (optional): datasets to copy, default all
+        wildcard_featureclass (optional): not used
+        backend (optional): "arcpy", "ogr" or a `LXG.apis.Backend`, default arcpy when available
+        connections (optional): `LXG.apis.ConnectionManager`, default a new one
+        incremental (optional): keep the file geodatabase of the last run and only merge what changed
+            since, instead of a new copy
+        update_field (optional): date field of the last edit of a row, default LAST_UPDATE
+        frozen (optional): `LXG.FrozenRegistry`, its datasets and featureclasses already in the file
+            geodatabase are kept as they are, the file geodatabase is then not recreated
+
+    In incremental mode, the high-water mark (latest `update_field`) of every featureclass is kept in
+    <output_directory>/<file_gdb>_state. Rows edited since the mark and new OIDs are pulled by where
+    clauses and replace their local copy, OIDs gone from SDE are deleted. A dataset is copied again
+    when the schema of one of its featureclasses changed, a featureclass without `update_field` is
+    copied again on every run.
+
+    From a `LXG.Snapshot`, the changes are read from the snapshot instead of SDE and inserted; the datasets
+    needing a full copy are reported, they have to be replicated from SDE once.
+
+    Usage:
+        ```
+        ReplicateSDE2GDB("10.0.0.5/sde", "sde", password, r"D:\\LXG", "KCH_CMS.gdb", "*DCDB*",
+                         incremental=True)
+        ```
+    """
     def __init__(self, sde_instance, sde_username, sde_password,
-                 output_directory, file_gdb, wildcard_datasets=None, wildcard_featureclass=None):
+                 output_directory, file_gdb, wildcard_datasets=None, wildcard_featureclass=None, backend=None,
+                 connections=None, incremental=False, update_field="LAST_UPDATE", frozen=None):
         self.instance = sde_instance
         self.usr = sde_username
         self.pwd = sde_password
@@ -568,62 +457,241 @@ class ReplicateSDE2GDB:
         self.gdb = file_gdb
         self.wildcard_ds = wildcard_datasets
         self.wildcard_fc = wildcard_featureclass
-        self.temp_dir = tempfile.mkdtemp()
+        self.backend = get_backend(backend)
+        self.connections = ConnectionManager(backend=self.backend) if connections is None else connections
+        self.incremental = incremental
+        self.update_field = update_field
+        self.frozen = frozen
+        self.state_dir = os.path.join(self.out_dir, f"{os.path.splitext(self.gdb)[0]}_state")
+        # {dataset/featureclass: (added, changed, deleted)} of the incremental merges
+        self.changes = {}
 
         if self.wildcard_ds is None:
             self.wildcard_ds = ""
         if self.wildcard_fc is None:
             self.wildcard_fc = ""
 
-        sde = self.temp_connection()
-
-        db_out = os.path.join(self.out_dir, self.gdb)
-        if arcpy.Exists(db_out):
-            arcpy.Delete_management(db_out)
-            arcpy.CreateFileGDB_management(self.out_dir, self.gdb, "9.3")
+        if isinstance(self.instance, Snapshot):
+            # nothing to connect to, the snapshot folder is the source workspace
+            self.source_backend, sde = SnapshotBackend(), self.instance.path
         else:
-            arcpy.CreateFileGDB_management(self.out_dir, self.gdb, "9.3")
+            self.source_backend = self.backend
+            with span("connection"):
+                sde = self.connections.get('ORACLE', self.instance, self.usr, self.pwd)
 
-        arcpy.env.workspace = sde
-
-        dss = sorted(arcpy.ListDatasets(self.wildcard_ds, "ALL"))
+        db_out = os.path.join(self.out_dir, self.gdb)
+        state = self.load_state() if self.incremental else {}
+        if not (state and self.backend.exists(db_out)):
+            state = {}
+            if self.frozen is None or not self.backend.exists(db_out):
+                db_out = self.backend.create_workspace(db_out)
+
+        with span("catalog"):
+            dss = self.source_backend.list_datasets(sde, self.wildcard_ds, "ALL")
         pbar01 = tqdm(dss, position=0, colour='GREEN')
         for ds in pbar01:
             pbar01.set_description(ds)
             dsname = '%s' % self.newname('SDE.', ds)
-            # copy everything in dataset
             try:
                 out_data = os.path.join(db_out, dsname)
-                arcpy.Copy_management(ds, out_data)
+                if self.frozen is not None and self.frozen.is_frozen(ds) and self.backend.exists(out_data):
+                    continue
+                with self.connections.session(sde):
+                    if not (self.incremental and self.merge_dataset(sde, ds, db_out, dsname, state)):
+                        if self.source_backend is not self.backend:
+                            raise RuntimeError(f"{dsname} needs a full copy, replicate it from SDE first")
+                        # copy everything in dataset
+                        marks = self.marks(sde, ds) if self.incremental else {}
+                        with span("export", layer=dsname):
+                            self.backend.delete(out_data)
+                            self.backend.copy(os.path.join(sde, ds), out_data)
+                        for fc, mark in marks.items():
+                            self.copied(os.path.join(sde, ds, fc), os.path.join(out_data, basename(fc)),
+                                        f"{dsname}/{basename(fc)}", mark, state)
+                if self.incremental:
+                    self.save_state(state)
             except Exception as e:
-                arcpy.AddError(e)
-
-        shutil.rmtree(self.temp_dir)
-
-    def temp_connection(self):
-        # create connection parameters
-        conn = {"out_folder_path": self.temp_dir,
-                "out_name": 'temp.sde',
-                "database_platform": 'ORACLE',
-                "instance": self.instance,
-                "account_authentication": "DATABASE_AUTH",
-                "database": "",
-                "username": self.usr,
-                "password": self.pwd,
-                "save_user_pass": "SAVE_USERNAME"}
-
-        temp_sde = os.path.join(conn["out_folder_path"], conn["out_name"])
+                self.backend.error(e)
 
-        if arcpy.Exists(temp_sde):
-            arcpy.Delete_management(temp_sde)
-
-        arcpy.CreateDatabaseConnection_management(**conn)
-
-        return temp_sde
+        export("replicate_sde2gdb")
 
     @staticmethod
     def newname(target_string, old_name):
         new_name = old_name.replace(target_string, "", 1)
         return new_name
 
+    # state of the incremental mode
+    @property
+    def state_file(self):
+        return os.path.join(self.state_dir, "state.json")
 
+    def load_state(self):
+        """{dataset/featureclass: {"schema", "mark"}}, {} without previous run"""
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self, state):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, self.state_file)
+
+    def oid_map_file(self, key):
+        return os.path.join(self.state_dir, f"{key.replace('/', '.')}.npz")
+
+    def load_oid_map(self, key):
+        """(source OIDs, local OIDs) of the rows of a featureclass"""
+        with np.load(self.oid_map_file(key)) as f:
+            return f["source"], f["local"]
+
+    def save_oid_map(self, key, source, local):
+        os.makedirs(self.state_dir, exist_ok=True)
+        np.savez(self.oid_map_file(key), source=source, local=local)
+
+    # helpers
+    def schema(self, featureclass):
+        """Hash of the fields, shape type and spatial reference of a featureclass"""
+        desc = self.source_backend.describe(featureclass)
+        raw = json.dumps([desc["shape_type"], desc["spatial_reference"],
+                          [(name, ftype) for name, ftype, _ in desc["fields"]]])
+
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def field(self, featureclass):
+        """Name of `update_field` in the featureclass, None when it has none"""
+        names = {name.upper(): name for name, _, _ in self.source_backend.describe(featureclass)["fields"]}
+        return names.get(self.update_field.upper())
+
+    def oids(self, featureclass, where=None, backend=None):
+        backend = self.backend if backend is None else backend
+        return np.fromiter((oid for oid, in backend.search(featureclass, ["OID@"], where)), dtype=np.int64)
+
+    def last_update(self, featureclass, where=None):
+        """(OIDs, latest `update_field` as text) of the rows matching `where`"""
+        field = self.field(featureclass)
+        rows = [(oid, value) for oid, value in self.source_backend.search(featureclass, ["OID@", field], where)]
+        values = [value for _, value in rows if value is not None]
+        mark = max(values).strftime("%Y-%m-%d %H:%M:%S") if values else None
+
+        return np.array([oid for oid, _ in rows], dtype=np.int64), mark
+
+    def since(self, featureclass, mark):
+        """Where clause of the rows edited at or after `mark`"""
+        field = self.field(featureclass)
+        return f"{field} IS NOT NULL" if mark is None else f"{field} >= TIMESTAMP '{mark}'"
+
+    def marks(self, sde, ds):
+        """High-water marks of the featureclasses of an SDE dataset, taken before copying it"""
+        return {fc: self.last_update(os.path.join(sde, ds, fc))[1] if self.field(os.path.join(sde, ds, fc)) else None
+                for fc in self.source_backend.list_featureclasses(sde, "*", "All", ds)}
+
+    def copied(self, source, target, key, mark, state):
+        """Record a featureclass copied in full. Copy keeps the OIDs, the local OIDs are the SDE ones."""
+        local = self.oids(target)
+        self.save_oid_map(key, local, local)
+        state[key] = {"schema": self.schema(source), "mark": mark}
+
+    def pull_rows(self, source, target, where=None):
+        """Append the rows of source matching `where` into target, inserted when source is a snapshot"""
+        if self.source_backend is self.backend:
+            return self.backend.append(source, target, where=where)
+        names = {name.upper(): name for name, ftype, editable in self.backend.describe(target)["fields"]
+                 if editable and ftype not in SKIP_TYPES}
+        fields = [f for f in attribute_fields(self.source_backend, source).values() if f.upper() in names]
+        self.backend.insert(target, [names[f.upper()] for f in fields] + ["SHAPE@WKB"],
+                            self.source_backend.search(source, fields + ["SHAPE@WKB"], where))
+
+    def reload(self, source, target, key, state):
+        """Replace every local row of a featureclass by the snapshot ones, the local OIDs are new"""
+        with span("export", layer=key):
+            self.backend.truncate(target)
+            self.pull_rows(source, target)
+        pulled, local = self.pair(source, target, self.oids(source, backend=self.source_backend),
+                                  self.oids(target), key)
+        order = np.argsort(pulled)
+        self.save_oid_map(key, pulled[order], local[order])
+        state[key] = {"schema": self.schema(source), "mark": None}
+
+    def pair(self, source, target, pulled, appended, key):
+        """(source OIDs, local OIDs) of the rows just appended, matched on their content hash"""
+        if len(pulled) == 0 and len(appended) == 0:
+            return pulled, appended
+        fields = list(attribute_fields(self.source_backend, source).values())
+        desc = self.source_backend.describe(source)
+        src = content_hashes(self.source_backend, source, fields, xy_resolution(desc),
+                             where_ranges(desc["oid_field"], oid_ranges(pulled)))
+        local = content_hashes(self.backend, target, fields, xy_resolution(desc),
+                               where_ranges(self.backend.describe(target)["oid_field"], oid_ranges(appended)))
+        src, local = src.sort_values(kind="stable"), local.sort_values(kind="stable")
+        if len(src) != len(local) or not np.array_equal(src.values, local.values):
+            raise RuntimeError(f"{key}: the {len(local)} rows appended do not match the {len(src)} pulled, "
+                               f"delete {self.state_dir} for a full copy")
+
+        return src.index.to_numpy(np.int64), local.index.to_numpy(np.int64)
+
+    # incremental merge
+    def merge_dataset(self, sde, ds, db_out, dsname, state):
+        """Merge the changes of an SDE dataset into the local one, False when it needs a full copy"""
+        out_data = os.path.join(db_out, dsname)
+        if not self.backend.exists(out_data):
+            return False
+        fcs = self.source_backend.list_featureclasses(sde, "*", "All", ds)
+        local = self.backend.list_featureclasses(db_out, "*", "All", dsname)
+        if not fcs or sorted(basename(fc) for fc in fcs) != sorted(local):
+            return False
+        for fc in fcs:
+            key = f"{dsname}/{basename(fc)}"
+            if key not in state or not os.path.isfile(self.oid_map_file(key)) or \
+                    state[key]["schema"] != self.schema(os.path.join(sde, ds, fc)):
+                return False
+
+        for fc in fcs:
+            if self.frozen is not None and self.frozen.is_frozen(fc):
+                continue
+            self.merge_featureclass(os.path.join(sde, ds, fc), os.path.join(out_data, basename(fc)),
+                                    f"{dsname}/{basename(fc)}", state)
+
+        return True
+
+    def merge_featureclass(self, source, target, key, state):
+        """Replace the local rows edited since the mark, add the new OIDs and delete the OIDs gone from SDE"""
+        if self.field(source) is None:
+            if self.source_backend is not self.backend:
+                return self.reload(source, target, key, state)
+            with span("export", layer=key):
+                self.backend.delete(target)
+                self.backend.copy(source, target)
+            return self.copied(source, target, key, None, state)
+
+        with span("incremental", layer=key) as s:
+            mark = state[key]["mark"]
+            src_oids, local_oids = self.load_oid_map(key)
+            changed, new_mark = self.last_update(source, self.since(source, mark))
+            current = self.oids(source, backend=self.source_backend)
+            added = np.setdiff1d(current, src_oids)
+            deleted = ~np.isin(src_oids, current)
+
+            pull = np.union1d(added, changed)
+            stale = np.isin(src_oids, pull) | deleted
+            self.backend.delete_oids(target, local_oids[stale])
+            src_oids, local_oids = src_oids[~stale], local_oids[~stale]
+
+            before = self.oids(target)
+            oid_field = self.source_backend.describe(source)["oid_field"]
+            for where in where_ranges(oid_field, oid_ranges(pull)):
+                self.pull_rows(source, target, where)
+            appended = np.setdiff1d(self.oids(target), before)
+            pulled, appended = self.pair(source, target, pull, appended, key)
+
+            order = np.argsort(np.r_[src_oids, pulled], kind="stable")
+            self.save_oid_map(key, np.r_[src_oids, pulled][order], np.r_[local_oids, appended][order])
+            state[key]["mark"] = new_mark or mark
+            s.rows = len(pull) + int(deleted.sum())
+
+        self.changes[key] = (len(added), len(pull) - len(added), int(deleted.sum()))
+        self.backend.message(f"[INFO]\t{key}: {len(added)} added, {len(pull) - len(added)} changed, "
+                             f"{int(deleted.sum())} deleted")
@@ -0,0 +1,398 @@
+"""
+Author : Lerry William
+
+Columnar snapshots (Arrow IPC or GeoParquet) of geodatabase states, with a manifest and row hashes per featureclass.
+
+Usage:
+    ```
+    store = SnapshotStore(r"D:\\LXG\\snapshots", retention=5)
+    old = store.latest("KCH")
+    new = store.snapshot("KCH", r"C:\\LXG\\replica\\KCH_TOL.gdb")
+    diff = store.diff(old, new, "KPG_EXT_KCH")   # {"added": oids, "deleted": oids, "changed": oids}
+    ```
+"""
+import os
+import re
+import json
+import shutil
+import fnmatch
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pa = None
+
+from .apis import get_backend, basename
+from .apis.base import Backend, SKIP_TYPES, OID, GEOMETRY
+from .geometry import RaggedGeometry, feature_points
+from .metrics import span
+
+FORMATS = {"arrow": ".arrow", "parquet": ".parquet"}
+HASH = "_hash"
+# field types of arcpy and OGR, hashed as float64 / int64 ns, and the hashed text of nulls
+NUMERIC_TYPES = ("OID", "SMALLINTEGER", "INTEGER", "BIGINTEGER", "INTEGER64", "SINGLE", "DOUBLE", "REAL")
+DATE_TYPES = ("DATE", "DATEONLY", "DATETIME", "TIMESTAMPOFFSET")
+NULL = "\x00NULL"
+# terms of the where clauses built by LXG: OID ranges, IN lists, IS NOT NULL and TIMESTAMP marks
+TERM = re.compile(r"^\s*(\w+)\s+(?:BETWEEN\s+(-?\d+)\s+AND\s+(-?\d+)|IN\s*\((.*)\)|(IS NOT NULL)|"
+                  r">=\s*TIMESTAMP\s+'([^']*)')\s*$", re.IGNORECASE | re.DOTALL)
+VALUE = re.compile(r"'((?:[^']|'')*)'|(-?[\d.]+)")
+OR = re.compile(r"\s+OR\s+(?=(?:[^']*'[^']*')*[^']*$)", re.IGNORECASE)
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Snapshots need pyarrow, pip install pyarrow")
+
+
+def canonical_columns(df, types):
+    """Attribute columns cast by field type (`Backend.describe`) for hashing, nulls as one sentinel"""
+    df = df.copy()
+    for column, ftype in types.items():
+        if column not in df.columns:
+            continue
+        ftype = str(ftype).upper()
+        if ftype in NUMERIC_TYPES or (ftype not in DATE_TYPES and pd.api.types.is_numeric_dtype(df[column])):
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(np.float64)
+        elif ftype in DATE_TYPES:
+            df[column] = pd.to_datetime(df[column], errors="coerce").values.astype("datetime64[ns]").astype(np.int64)
+        else:
+            df[column] = [NULL if pd.isna(v) else str(v) for v in df[column]]
+
+    return df
+
+
+def row_hashes(df, types=None):
+    """uint64 hash of every row (attributes and geometry, not the OID), attributes cast by `canonical_columns`
+    when their field `types` are given"""
+    df = df.drop(columns=[OID, HASH], errors="ignore")
+    return pd.util.hash_pandas_object(df if types is None else canonical_columns(df, types), index=False).values
+
+
+def field_types(desc):
+    """{field: type} of a `Backend.describe`, None without one"""
+    return None if desc is None else {name: ftype for name, ftype, _ in desc["fields"]}
+
+
+def layer_hash(hashes):
+    """Order independent hash of a layer, sum of the row hashes"""
+    return f"{int(np.asarray(hashes, dtype=np.uint64).sum(dtype=np.uint64)):016x}"
+
+
+class Snapshot:
+    """One saved geodatabase state, see `SnapshotStore`"""
+    def __init__(self, path):
+        self.path = path
+        with open(self.manifest_file) as f:
+            self.manifest = json.load(f)
+
+    @property
+    def manifest_file(self):
+        return os.path.join(self.path, "manifest.json")
+
+    @property
+    def name(self):
+        return self.manifest["name"]
+
+    @property
+    def created(self):
+        return self.manifest["created"]
+
+    @property
+    def complete(self):
+        return self.manifest.get("complete", False)
+
+    def layers(self):
+        return sorted(self.manifest["layers"])
+
+    def read(self, layer, columns=None):
+        """pyarrow.Table of a featureclass, memory mapped for Arrow IPC snapshots"""
+        _require_pyarrow()
+        path = os.path.join(self.path, self.manifest["layers"][layer]["file"])
+        if path.endswith(".parquet"):
+            return pa.parquet.read_table(path, columns=columns, memory_map=True)
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+        return table if columns is None else table.select(columns)
+
+    def to_pandas(self, layer, columns=None):
+        return self.read(layer, columns).to_pandas()
+
+    def hashes(self, layer):
+        """Series of row hashes indexed by OID"""
+        table = self.read(layer, [OID, HASH])
+        return pd.Series(table.column(HASH).to_numpy(), index=table.column(OID).to_numpy())
+
+    def geometry(self, layer):
+        """RaggedGeometry of a featureclass"""
+        return RaggedGeometry.from_wkb(self.read(layer, [GEOMETRY]).column(GEOMETRY).to_pylist())
+
+    def inventory(self):
+        """dataframe of FeatureClasses and Count, the input of `LXG.CheckDifferences`"""
+        return pd.DataFrame([(layer, meta["count"]) for layer, meta in sorted(self.manifest["layers"].items())],
+                            columns=["FeatureClasses", "Count"])
+
+    def verify(self, layer=None):
+        """Layers whose file does not match the manifest (count or hash), [] when all good"""
+        bad = []
+        for name in ([layer] if layer is not None else self.layers()):
+            meta = self.manifest["layers"][name]
+            try:
+                df = self.to_pandas(name)
+                if len(df) != meta["count"] or layer_hash(row_hashes(df, field_types(meta.get("describe")))) != \
+                        meta["hash"]:
+                    bad.append(name)
+            except (OSError, pa.ArrowException):
+                bad.append(name)
+
+        return bad
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.path}, layers={len(self.manifest['layers'])}, " \
+               f"complete={self.complete})"
+
+
+def _where(df, where, oid_field):
+    """Boolean mask of the rows of `df` matching a where clause built by LXG"""
+    mask = np.zeros(len(df), dtype=bool)
+    for term in OR.split(where):
+        if term.strip() == "1 = 0":
+            continue
+        match = TERM.match(term)
+        if match is None:
+            raise ValueError(f"Unsupported where clause on a snapshot: {term}")
+        name, start, stop, values, not_null, mark = match.groups()
+        columns = {c.upper(): c for c in df.columns if c != OID}
+        column = df[OID] if name.upper() == oid_field.upper() else df[columns[name.upper()]]
+        if start is not None:
+            mask |= column.between(int(start), int(stop)).values
+        elif values is not None:
+            values = [text.replace("''", "'") if number is None else float(number) if "." in number else int(number)
+                      for text, number in (m.groups() for m in VALUE.finditer(values))]
+            mask |= column.isin(values).values
+        elif not_null is not None:
+            mask |= column.notna().values
+        else:
+            mask |= (column >= pd.Timestamp(mark)).fillna(False).values
+
+    return mask
+
+
+class SnapshotBackend(Backend):
+    """Read-only backend of the `Snapshot` folders, understands the where clauses LXG builds"""
+    name = "snapshot"
+
+    @staticmethod
+    def resolve(path):
+        """(Snapshot, featureclass or dataset name, None for the snapshot itself)"""
+        head, name = path, None
+        for _ in range(3):
+            if os.path.isfile(os.path.join(head, "manifest.json")):
+                return Snapshot(head), name
+            head, name = os.path.dirname(head), basename(path)
+        raise RuntimeError(f"{path} is not in a snapshot")
+
+    def layer(self, featureclass):
+        snap, name = self.resolve(featureclass)
+        if name not in snap.manifest["layers"]:
+            raise RuntimeError(f"{featureclass} does not exist")
+        return snap, name
+
+    def exists(self, path):
+        try:
+            snap, name = self.resolve(path)
+        except RuntimeError:
+            return False
+        return name is None or name in snap.manifest["layers"] or \
+            any(meta["dataset"] == name for meta in snap.manifest["layers"].values())
+
+    def list_datasets(self, workspace, wildcard="*", dataset_type="Feature"):
+        snap, _ = self.resolve(workspace)
+        return sorted({meta["dataset"] for meta in snap.manifest["layers"].values() if meta["dataset"] and
+                       fnmatch.fnmatch(meta["dataset"].upper(), (wildcard or "*").upper())})
+
+    def list_featureclasses(self, workspace, wildcard="*", shape_type="All", dataset=None):
+        snap, _ = self.resolve(workspace)
+        dataset = basename(dataset) if dataset else None
+        return sorted(name for name, meta in snap.manifest["layers"].items()
+                      if meta["dataset"] == dataset and fnmatch.fnmatch(name.upper(), (wildcard or "*").upper())
+                      and shape_type in (None, "", "All", meta["shape_type"]))
+
+    def describe(self, featureclass):
+        snap, name = self.layer(featureclass)
+        meta = snap.manifest["layers"][name]
+        if "describe" in meta:
+            return meta["describe"]
+        # snapshots written before the full description was kept
+        return {"shape_type": meta["shape_type"], "oid_field": OID, "spatial_reference": meta["spatial_reference"],
+                "fields": [(OID, "OID", False)] + [(f, "Unknown", True) for f in meta["fields"]]}
+
+    def count(self, featureclass, where=None):
+        snap, name = self.layer(featureclass)
+        if where is None:
+            return snap.manifest["layers"][name]["count"]
+        return int(_where(snap.to_pandas(name), where, self.describe(featureclass)["oid_field"]).sum())
+
+    def read_batches(self, featureclass, fields=None, where=None, batch_size=65536):
+        snap, name = self.layer(featureclass)
+        fields = snap.manifest["layers"][name]["fields"] if fields is None else list(fields)
+        df = snap.to_pandas(name, [OID] + fields + [GEOMETRY])
+        if where is not None:
+            df = df[_where(df, where, self.describe(featureclass)["oid_field"])].reset_index(drop=True)
+        for i in range(0, len(df), batch_size):
+            yield df.iloc[i:i + batch_size].reset_index(drop=True)
+
+    def search(self, featureclass, fields, where=None):
+        columns = [f for f in fields if f not in ("OID@", "SHAPE@WKB", "SHAPE@XY")]
+        for df in self.read_batches(featureclass, columns, where):
+            values = {OID: df[OID].tolist(), GEOMETRY: df[GEOMETRY].tolist()}
+            if "SHAPE@XY" in fields:
+                xy = feature_points(RaggedGeometry.from_wkb(values[GEOMETRY]))
+                values["SHAPE@XY"] = [None if wkb is None else (float(x), float(y))
+                                      for wkb, (x, y) in zip(values[GEOMETRY], xy)]
+            for column in columns:
+                values[column] = df[column].astype(object).where(df[column].notna(), None).tolist()
+            keys = [{"OID@": OID, "SHAPE@WKB": GEOMETRY}.get(f, f) for f in fields]
+            yield from zip(*(values[k] for k in keys))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+class SnapshotStore:
+    """Directory of snapshots, by source name.
+
+    Args:
+        root: directory of the store
+        retention (optional): complete snapshots kept per name, default keep everything
+        format (optional): "arrow" (Arrow IPC, memory mapped reads) or "parquet" (GeoParquet)
+        backend (optional): "arcpy", "ogr" or a `LXG.apis.Backend`, default arcpy when available
+    """
+    def __init__(self, root, retention=None, format="arrow", backend=None):
+        _require_pyarrow()
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format}, use {' or '.join(FORMATS)}")
+        self.root = root
+        self.retention = retention
+        self.format = format
+        self.backend = get_backend(backend)
+
+    def snapshots(self, name, complete=True):
+        """Snapshots of a name, oldest first"""
+        folder = os.path.join(self.root, name)
+        if not os.path.isdir(folder):
+            return []
+        snaps = [Snapshot(os.path.join(folder, d)) for d in sorted(os.listdir(folder))
+                 if os.path.isfile(os.path.join(folder, d, "manifest.json"))]
+
+        return [s for s in snaps if s.complete or not complete]
+
+    def latest(self, name):
+        """Newest complete snapshot of a name, None if there is none"""
+        snaps = self.snapshots(name)
+        return snaps[-1] if snaps else None
+
+    def snapshot(self, name, geodatabase, datasets_wildcard="*", featureclass_wildcard="*", resume=True):
+        """Save every featureclass of a geodatabase, returns the Snapshot"""
+        pending = [s for s in self.snapshots(name, complete=False) if not s.complete]
+        if resume and pending:
+            path = pending[-1].path
+            manifest = pending[-1].manifest
+        else:
+            created = datetime.now().strftime("%Y%m%d%H%M%S")
+            path = os.path.join(self.root, name, created)
+            manifest = {"name": name, "source": geodatabase, "created": created, "format": self.format,
+                        "complete": False, "layers": {}}
+        os.makedirs(path, exist_ok=True)
+
+        for ds in self.backend.list_datasets(geodatabase, datasets_wildcard):
+            for fc in self.backend.list_featureclasses(geodatabase, featureclass_wildcard, "All", ds):
+                layer = basename(fc)
+                if layer in manifest["layers"]:
+                    continue
+                with span("snapshot", layer=layer) as s:
+                    manifest["layers"][layer] = self.write_layer(path, os.path.join(geodatabase, ds, fc), ds)
+                    s.rows = manifest["layers"][layer]["count"]
+                self._save(path, manifest)
+
+        manifest["complete"] = True
+        self._save(path, manifest)
+        self.prune(name)
+
+        return Snapshot(path)
+
+    def write_layer(self, path, featureclass, dataset=None):
+        """Write one featureclass into a snapshot folder, returns its manifest entry"""
+        desc = self.backend.describe(featureclass)
+        fields = [name for name, ftype, _ in desc["fields"]
+                  if ftype not in SKIP_TYPES and name.upper() not in ("SHAPE", "SHAPE_LENGTH", "SHAPE_AREA")]
+        df = self.backend.read(featureclass, fields)
+        df[HASH] = row_hashes(df, field_types(desc))
+
+        xy = RaggedGeometry.from_wkb(df[GEOMETRY]).xy
+        extent = [float(v) for v in (*xy.min(axis=0), *xy.max(axis=0))] if len(xy) else None
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        filename = f"{basename(featureclass)}{FORMATS[self.format]}"
+        if self.format == "parquet":
+            geo = {"version": "1.0.0", "primary_column": GEOMETRY,
+                   "columns": {GEOMETRY: {"encoding": "WKB", "geometry_types": [], "bbox": extent,
+                                          "crs": None}}}
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"geo": json.dumps(geo)})
+            pa.parquet.write_table(table, os.path.join(path, filename))
+        else:
+            with pa.OSFile(os.path.join(path, filename), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+
+        return {"file": filename, "dataset": basename(dataset) if dataset else None,
+                "shape_type": desc["shape_type"], "spatial_reference": desc["spatial_reference"],
+                "count": len(df), "extent": extent, "hash": layer_hash(df[HASH].values),
+                "fields": fields, "describe": desc}
+
+    @staticmethod
+    def _save(path, manifest):
+        tmp = os.path.join(path, "manifest.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, os.path.join(path, "manifest.json"))
+
+    def prune(self, name):
+        """Delete the oldest complete snapshots beyond `retention`, returns the deleted paths"""
+        if self.retention is None:
+            return []
+        snaps = self.snapshots(name)
+        old = snaps[:max(0, len(snaps) - self.retention)]
+        for snap in old:
+            shutil.rmtree(snap.path)
+
+        return [snap.path for snap in old]
+
+    @staticmethod
+    def changed_layers(old, new):
+        """Layers added, deleted or with another hash between two snapshots"""
+        layers = set(old.manifest["layers"]) | set(new.manifest["layers"])
+        return sorted(layer for layer in layers
+                      if old.manifest["layers"].get(layer, {}).get("hash") !=
+                      new.manifest["layers"].get(layer, {}).get("hash"))
+
+    @staticmethod
+    def diff(old, new, layer):
+        """OIDs added, deleted and changed (attributes or geometry) in a featureclass between two snapshots"""
+        empty = pd.Series([], dtype=np.uint64)
+        before = old.hashes(layer) if old is not None and layer in old.manifest["layers"] else empty
+        after = new.hashes(layer) if layer in new.manifest["layers"] else empty
+        common = after.index.intersection(before.index)
+
+        return {"added": after.index.difference(before.index).to_numpy(),
+                "deleted": before.index.difference(after.index).to_numpy(),
+                "changed": common[after.loc[common].values != before.loc[common].values].to_numpy()}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(root={self.root}, retention={self.retention}, format={self.format}, " \
+               f"backend={self.backend.name})"
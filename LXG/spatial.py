@@ -0,0 +1,277 @@
+"""
+Author : Lerry William
+
+In-memory spatial engines (grid hash, STR-tree, point in polygon) on NumPy coordinate arrays.
+
+Usage:
+    ```
+    old = GridHash(old_xy, tolerance=0.02)
+    idx = old.match(new_xy)          # index of an old point within 0.02 m, -1 if none
+    new_oids = oids[idx < 0]
+
+    polygons = PolygonIndex(RaggedGeometry.from_wkb(wkbs), shrink=0.2)
+    inside = polygons.locate(centroids) >= 0
+    ```
+"""
+import numpy as np
+import pandas as pd
+
+NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+# both cell indices are packed into one int64 key
+_SHIFT = np.int64(1 << 32)
+
+
+def snap_to_grid(xy, cell, origin=(0.0, 0.0)):
+    """Integer (ix, iy) cell of each point"""
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    return np.floor((xy - np.asarray(origin)) / cell).astype(np.int64)
+
+
+class GridHash:
+    """Hash table of points snapped to a `tolerance` grid.
+
+    Args:
+        xy: (n, 2) coordinates of the reference points (eg. centroids of the initial layer)
+        tolerance: match distance in coordinate units (meters)
+    """
+    def __init__(self, xy, tolerance):
+        if tolerance <= 0:
+            raise ValueError("tolerance must be positive")
+        self.xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        self.tolerance = float(tolerance)
+        finite = np.isfinite(self.xy).all(axis=1)
+        # grid origin just below the data keeps cell indices small and positive
+        self.origin = self.xy[finite].min(axis=0) - 2 * self.tolerance if finite.any() else np.zeros(2)
+
+        cells = snap_to_grid(self.xy[finite], self.tolerance, self.origin)
+        keys = self._keys(cells)
+        valid = np.flatnonzero(finite)
+        order = np.argsort(keys, kind="stable")
+        self.order = valid[order]
+        unique, self.starts, self.counts = np.unique(keys[order], return_index=True, return_counts=True)
+        self.index = pd.Index(unique)
+
+    def __len__(self):
+        return len(self.xy)
+
+    @staticmethod
+    def _keys(cells):
+        if len(cells) and (cells.min() < 0 or cells.max() >= (1 << 31)):
+            raise ValueError("coordinates span too many grid cells, use a larger tolerance")
+        return cells[:, 0] * _SHIFT + cells[:, 1]
+
+    def match(self, xy):
+        """Index (into the reference points) of a point within tolerance of each query point, -1 when none"""
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        result = np.full(len(xy), -1, dtype=np.int64)
+        if len(self.index) == 0 or len(xy) == 0:
+            return result
+
+        cells = snap_to_grid(xy, self.tolerance, self.origin)
+        # query points outside the reference extent cannot match
+        inside = np.isfinite(xy).all(axis=1) & (cells >= 1).all(axis=1) & (cells < (1 << 31) - 1).all(axis=1)
+        query = np.flatnonzero(inside)
+        cells = cells[inside]
+        tol2 = self.tolerance ** 2
+
+        for dx, dy in NEIGHBOURS:
+            todo = result[query] < 0
+            if not todo.any():
+                break
+            q, c = query[todo], cells[todo]
+            slot = self.index.get_indexer((c[:, 0] + dx) * _SHIFT + (c[:, 1] + dy))
+            hit = slot >= 0
+            if not hit.any():
+                continue
+            q, slot = q[hit], slot[hit]
+
+            # candidate pairs: every reference point of the hit cells
+            counts = self.counts[slot]
+            pairs_q = np.repeat(q, counts)
+            first = np.repeat(self.starts[slot], counts)
+            within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            pairs_ref = self.order[first + within]
+
+            d2 = ((xy[pairs_q] - self.xy[pairs_ref]) ** 2).sum(axis=1)
+            ok = d2 <= tol2
+            # first reference point within tolerance wins
+            q_ok, ref_ok = pairs_q[ok], pairs_ref[ok]
+            q_ok, first_ok = np.unique(q_ok, return_index=True)
+            result[q_ok] = ref_ok[first_ok]
+
+        return result
+
+    def contains(self, xy):
+        """True where a reference point is within tolerance"""
+        return self.match(xy) >= 0
+
+
+def new_points(new_oids, new_xy, old_xy, tolerance):
+    """OIDs and coordinates of the `new_xy` points without an `old_xy` point within tolerance"""
+    new_oids = np.asarray(new_oids, dtype=np.int64)
+    new_xy = np.asarray(new_xy, dtype=np.float64).reshape(-1, 2)
+    unmatched = GridHash(old_xy, tolerance).match(new_xy) < 0
+
+    return new_oids[unmatched], new_xy[unmatched]
+
+
+def point_keys(ids, xy, resolution):
+    """(id, ix, iy) keys of points snapped to `resolution`, as a pandas MultiIndex for hash lookups"""
+    cells = snap_to_grid(xy, resolution)
+    return pd.MultiIndex.from_arrays([np.asarray(ids, dtype=np.int64), cells[:, 0], cells[:, 1]],
+                                     names=["id", "ix", "iy"])
+
+
+class STRTree:
+    """Static R-tree of bounding boxes, leaves packed Sort-Tile-Recursive.
+
+    Args:
+        bounds: (n, 4) xmin, ymin, xmax, ymax, rows with NaN are left out
+        node_capacity: boxes per node
+    """
+    def __init__(self, bounds, node_capacity=16):
+        bounds = np.asarray(bounds, dtype=np.float64).reshape(-1, 4)
+        self.capacity = int(node_capacity)
+        items = np.flatnonzero(np.isfinite(bounds).all(axis=1))
+
+        # leaves: vertical slices by x centre, sorted by y centre inside a slice
+        cx = (bounds[items, 0] + bounds[items, 2]) / 2
+        cy = (bounds[items, 1] + bounds[items, 3]) / 2
+        leaves = -(-len(items) // self.capacity)
+        per_slice = self.capacity * max(1, int(np.ceil(np.sqrt(leaves))))
+        slices = np.empty(len(items), dtype=np.int64)
+        slices[np.argsort(cx, kind="stable")] = np.arange(len(items)) // per_slice
+        self.items = items[np.lexsort((cy, slices))]
+
+        # levels[0] are the item boxes, levels[k] the boxes of groups of `capacity` boxes of level k - 1
+        self.levels = [bounds[self.items]]
+        while len(self.levels[-1]) > self.capacity:
+            boxes = self.levels[-1]
+            starts = np.arange(0, len(boxes), self.capacity)
+            self.levels.append(np.column_stack([np.minimum.reduceat(boxes[:, 0], starts),
+                                                np.minimum.reduceat(boxes[:, 1], starts),
+                                                np.maximum.reduceat(boxes[:, 2], starts),
+                                                np.maximum.reduceat(boxes[:, 3], starts)]))
+
+    def __len__(self):
+        return len(self.items)
+
+    @staticmethod
+    def _contains(boxes, xy):
+        return (xy[:, 0] >= boxes[:, 0]) & (xy[:, 0] <= boxes[:, 2]) & \
+               (xy[:, 1] >= boxes[:, 1]) & (xy[:, 1] <= boxes[:, 3])
+
+    def query(self, xy):
+        """(point, item) index pairs of every box containing a point"""
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        if len(self.items) == 0 or len(xy) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        top = self.levels[-1]
+        q = np.repeat(np.arange(len(xy)), len(top))
+        node = np.tile(np.arange(len(top)), len(xy))
+        keep = self._contains(top[node], xy[q])
+        q, node = q[keep], node[keep]
+
+        for level in range(len(self.levels) - 2, -1, -1):
+            boxes = self.levels[level]
+            start = node * self.capacity
+            counts = np.minimum(self.capacity, len(boxes) - start)
+            q = np.repeat(q, counts)
+            node = np.repeat(start, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            keep = self._contains(boxes[node], xy[q])
+            q, node = q[keep], node[keep]
+
+        return q, self.items[node]
+
+
+class PolygonIndex:
+    """Point in polygon queries on a `LXG.geometry.RaggedGeometry` of polygons.
+
+    Args:
+        geoms: RaggedGeometry of polygons / multipolygons (holes supported, even-odd rule)
+        shrink: only points at least this far inside the boundary are inside (meters)
+        node_capacity: STR-tree node capacity
+        batch_size: candidate polygon edges tested at once, bounds the memory
+    """
+    def __init__(self, geoms, shrink=0.0, node_capacity=16, batch_size=4_000_000):
+        self.geoms = geoms
+        self.shrink = float(shrink)
+        self.batch_size = batch_size
+        xy = geoms.xy
+
+        # edges: every vertex but the last (closing) one of its ring
+        first = np.ones(len(xy), dtype=bool)
+        first[geoms.ring_offsets[1:][np.diff(geoms.ring_offsets) > 0] - 1] = False
+        self.edges = np.flatnonzero(first)
+        edge_geom = geoms.geometry_index()[self.edges]
+        counts = np.bincount(edge_geom, minlength=len(geoms))
+        self.edge_counts = counts
+        self.edge_starts = np.cumsum(counts) - counts
+
+        vertex_geom = geoms.geometry_index()
+        bounds = np.full((len(geoms), 4), np.nan)
+        if len(xy):
+            starts = np.flatnonzero(np.r_[True, vertex_geom[1:] != vertex_geom[:-1]])
+            owners = vertex_geom[starts]
+            bounds[owners] = np.column_stack([np.minimum.reduceat(xy[:, 0], starts),
+                                              np.minimum.reduceat(xy[:, 1], starts),
+                                              np.maximum.reduceat(xy[:, 0], starts),
+                                              np.maximum.reduceat(xy[:, 1], starts)])
+        # a point `shrink` inside a polygon is `shrink` inside its box too
+        bounds += np.array([self.shrink, self.shrink, -self.shrink, -self.shrink])
+        bounds[(bounds[:, 0] > bounds[:, 2]) | (bounds[:, 1] > bounds[:, 3])] = np.nan
+        self.tree = STRTree(bounds, node_capacity)
+
+    def _inside(self, xy, q, g):
+        """Even-odd test (and boundary distance when shrinking) of the (point, polygon) pairs"""
+        counts = self.edge_counts[g]
+        pair = np.repeat(np.arange(len(q)), counts)
+        edge = self.edges[np.repeat(self.edge_starts[g], counts) +
+                          np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)]
+        coords = self.geoms.xy
+        a, b = coords[edge], coords[edge + 1]
+        p = xy[q][pair]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            straddle = (a[:, 1] > p[:, 1]) != (b[:, 1] > p[:, 1])
+            x_cross = a[:, 0] + (p[:, 1] - a[:, 1]) * (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1])
+            crossings = np.bincount(pair, weights=straddle & (p[:, 0] < x_cross), minlength=len(q))
+        inside = crossings % 2 == 1
+        if self.shrink <= 0:
+            return inside
+
+        ab = b - a
+        length2 = (ab ** 2).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(((p - a) * ab).sum(axis=1) / length2, 0.0, 1.0)
+        t[length2 == 0] = 0.0
+        d2 = ((p - a - t[:, None] * ab) ** 2).sum(axis=1)
+        starts = np.cumsum(counts) - counts
+        nearest = np.minimum.reduceat(d2, starts)
+
+        return inside & (nearest >= self.shrink ** 2)
+
+    def locate(self, xy):
+        """Index of a polygon containing each point, -1 when none"""
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        result = np.full(len(xy), -1, dtype=np.int64)
+        q, g = self.tree.query(xy)
+        keep = self.edge_counts[g] > 0
+        q, g = q[keep], g[keep]
+
+        # batches of candidate pairs with about `batch_size` edges each
+        ends = np.cumsum(self.edge_counts[g])
+        cuts = np.searchsorted(ends, np.arange(self.batch_size, ends[-1], self.batch_size), side="right") \
+            if len(ends) else []
+        for q_batch, g_batch in zip(np.split(q, cuts), np.split(g, cuts)):
+            if len(q_batch) == 0:
+                continue
+            inside = self._inside(xy, q_batch, g_batch)
+            result[q_batch[inside]] = g_batch[inside]
+
+        return result
+
+    def contains(self, xy):
+        """True where a polygon contains the point"""
+        return self.locate(xy) >= 0
@@ -0,0 +1,431 @@
+"""
+Author : Lerry William
+
+Synthetic geodatabases for benchmarking, built from the bundled workspace XML schemas.
+
+Polygons are a jittered parcel tessellation in BRSO coordinates (neighbouring lots share their
+boundary vertices exactly, with road reserves every few rows/columns), lines are lot boundaries and
+points are boundary pegs. Attributes follow the XML field definitions, coded-value domains and
+subtypes. `create_latest` writes a perturbed copy with a known set of inserts, edits and deletions.
+
+Usage:
+    ```
+    gen = SyntheticGDB(lots=100000, lines=50000, points=50000, seed=1)
+    gen.create("/data/bench/init.gpkg")
+    truth = gen.create_latest("/data/bench/latest.gpkg", inserts=0.01, edits=0.02, deletes=0.005)
+    ```
+    or `python -m LXG.synthetic /data/bench/init.gdb --lots 100000 --latest /data/bench/latest.gdb`
+"""
+import os
+import sys
+import zlib
+import argparse
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from osgeo import ogr, osr
+from .assets import BRSO_WKT
+from .geometry import RaggedGeometry, POINT, LINESTRING, POLYGON
+
+ogr.UseExceptions()
+
+XSI_TYPE = '{http://www.w3.org/2001/XMLSchema-instance}type'
+DEFAULT_XML = os.path.join(os.path.abspath(os.path.dirname(__file__)), "assets", "workspace_xml", "kch",
+                           "KCH_CMS_DCDB.XML")
+
+SHAPE_TYPES = {'esriGeometryPoint': POINT,
+               'esriGeometryPolyline': LINESTRING,
+               'esriGeometryPolygon': POLYGON}
+
+OGR_GEOMETRY = {POINT: ogr.wkbPoint,
+                LINESTRING: ogr.wkbMultiLineString,
+                POLYGON: ogr.wkbMultiPolygon}
+
+FIELD_TYPES = {'esriFieldTypeString': (ogr.OFTString, ogr.OFSTNone),
+               'esriFieldTypeGUID': (ogr.OFTString, ogr.OFSTNone),
+               'esriFieldTypeSmallInteger': (ogr.OFTInteger, ogr.OFSTInt16),
+               'esriFieldTypeInteger': (ogr.OFTInteger, ogr.OFSTNone),
+               'esriFieldTypeSingle': (ogr.OFTReal, ogr.OFSTFloat32),
+               'esriFieldTypeDouble': (ogr.OFTReal, ogr.OFSTNone),
+               'esriFieldTypeDate': (ogr.OFTDateTime, ogr.OFSTNone)}
+
+# lot size (metres) and road reserve spacing of the tessellation
+LOT_SIZE = 30.0
+ROAD_EVERY = 8
+
+
+def _strip_owner(name):
+    return name.split(".")[-1]
+
+
+def read_workspace_xml(xml_file):
+    """Parse an ESRI XML workspace document into a plain dict schema.
+
+    Returns:
+        {"domains": {name: {code: description}},
+         "featureclasses": [{"name", "dataset", "shape_type", "fields", "subtypes", "subtype_field",
+                             "extent", "resolution"}]}
+    """
+    root = ET.parse(xml_file).getroot()
+
+    domains = {}
+    for domain in root.iter('Domain'):
+        if domain.get(XSI_TYPE) == 'esri:CodedValueDomain':
+            domains[domain.findtext('DomainName')] = {cv.findtext('Code'): cv.findtext('Name')
+                                                      for cv in domain.iter('CodedValue')}
+
+    featureclasses = []
+    for ds in root.iter('DataElement'):
+        if ds.get(XSI_TYPE) != 'esri:DEFeatureDataset':
+            continue
+        children = ds.find('Children')
+        for fc in ([] if children is None else children.findall('DataElement')):
+            if fc.get(XSI_TYPE) != 'esri:DEFeatureClass' or fc.findtext('FeatureType') != 'esriFTSimple':
+                continue
+            shape_type = SHAPE_TYPES.get(fc.findtext('ShapeType'))
+            if shape_type is None:
+                continue
+
+            fields = []
+            for field in fc.iter('Field'):
+                ftype = field.findtext('Type')
+                name = field.findtext('Name')
+                if ftype not in FIELD_TYPES or '.' in name or field.findtext('Editable') == 'false':
+                    continue
+                fields.append({"name": name,
+                               "type": ftype,
+                               "length": int(field.findtext('Length') or 0),
+                               "domain": field.findtext('Domain/DomainName')})
+
+            extent = fc.find('Extent')
+            bounds = None
+            if extent is not None and extent.findtext('XMin') is not None:
+                bounds = tuple(float(extent.findtext(k)) for k in ('XMin', 'YMin', 'XMax', 'YMax'))
+            scale = fc.findtext('SpatialReference/XYScale')
+
+            featureclasses.append({"name": _strip_owner(fc.findtext('Name')),
+                                   "dataset": _strip_owner(ds.findtext('Name')),
+                                   "shape_type": shape_type,
+                                   "fields": fields,
+                                   "subtype_field": fc.findtext('SubtypeFieldName') or None,
+                                   "subtypes": [int(s.findtext('SubtypeCode')) for s in fc.iter('Subtype')],
+                                   "extent": bounds,
+                                   "resolution": 1.0 / float(scale) if scale else 0.0001})
+
+    return {"domains": domains, "featureclasses": featureclasses}
+
+
+def tessellation(lots, origin, rng, lot_size=LOT_SIZE, jitter=0.25):
+    """Parcel-like polygons: a jittered lattice with 8-vertex lots sharing their boundaries exactly.
+
+    Returns:
+        RaggedGeometry of polygons, (n, 2) lot grid indices (column, row) and the lattice vertices
+    """
+    # leave out every ROAD_EVERY-th row/column as road reserve
+    per_side = int(np.ceil(np.sqrt(lots) * ROAD_EVERY / (ROAD_EVERY - 1.0))) + 1
+    cols, rows = np.meshgrid(np.arange(per_side), np.arange(per_side))
+    keep = ((cols % ROAD_EVERY) != ROAD_EVERY - 1) & ((rows % ROAD_EVERY) != ROAD_EVERY - 1)
+    cells = np.column_stack([cols[keep], rows[keep]])[:lots]
+
+    # fine lattice: corners on even indices, edge midpoints on odd indices
+    n = 2 * per_side + 1
+    fx, fy = np.meshgrid(np.arange(n, dtype=np.float64), np.arange(n, dtype=np.float64))
+    lattice = np.stack([fx, fy], axis=-1) * (lot_size / 2.0)
+    lattice += rng.uniform(-jitter, jitter, size=lattice.shape) * (lot_size / 2.0)
+    lattice += np.asarray(origin, dtype=np.float64)
+
+    # closed ring of 8 boundary vertices per lot, clockwise from the lower left corner
+    ring = np.array([(0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0), (1, 0), (0, 0)])
+    ix = 2 * cells[:, 0:1] + ring[:, 0]
+    iy = 2 * cells[:, 1:2] + ring[:, 1]
+    coords = lattice[iy, ix].reshape(-1, 2)
+
+    count = len(cells)
+    offsets = np.arange(count + 1, dtype=np.int64)
+    geoms = RaggedGeometry(np.full(count, POLYGON), coords, offsets * len(ring), offsets, offsets)
+
+    return geoms, cells, lattice
+
+
+def boundary_lines(lattice, count, rng):
+    """Lot boundary lines (corner - midpoint - corner) drawn from the lattice"""
+    n = (lattice.shape[0] - 1) // 2
+    horizontal = rng.random(count) < 0.5
+    i = rng.integers(0, n, size=count)
+    j = rng.integers(0, n + 1, size=count)
+    step = np.arange(3)
+    ix = np.where(horizontal[:, None], 2 * i[:, None] + step, 2 * j[:, None])
+    iy = np.where(horizontal[:, None], 2 * j[:, None], 2 * i[:, None] + step)
+    coords = lattice[iy, ix].reshape(-1, 2)
+
+    offsets = np.arange(count + 1, dtype=np.int64)
+    return RaggedGeometry(np.full(count, LINESTRING), coords, offsets * 3, offsets, offsets)
+
+
+def boundary_pegs(lattice, count, rng):
+    """Pegs on lot corners"""
+    n = (lattice.shape[0] - 1) // 2 + 1
+    flat = rng.choice(n * n, size=min(count, n * n), replace=False)
+    coords = lattice[2 * (flat // n), 2 * (flat % n)]
+
+    offsets = np.arange(len(coords) + 1, dtype=np.int64)
+    return RaggedGeometry(np.full(len(coords), POINT), coords, offsets, offsets, offsets)
+
+
+def attributes(featureclass, domains, count, rng, serial_start=0, cells=None):
+    """Column dict of synthetic attribute values following the XML field definitions"""
+    start = datetime(2005, 1, 1)
+    columns = {}
+    for field in featureclass["fields"]:
+        name, ftype, length = field["name"], field["type"], field["length"]
+        codes = list(domains.get(field["domain"], {})) if field["domain"] else []
+
+        if codes:
+            values = np.asarray(codes, dtype=object)[rng.integers(0, len(codes), size=count)]
+        elif name == featureclass["subtype_field"] and featureclass["subtypes"]:
+            values = np.asarray(featureclass["subtypes"])[rng.integers(0, len(featureclass["subtypes"]), size=count)]
+        elif name == "LOT_NO_LABEL":
+            values = np.asarray([str(i) for i in range(serial_start + 1, serial_start + count + 1)], dtype=object)
+        elif name == "BLOCK_SECTION" and cells is not None:
+            values = np.asarray([f"{b % 1000:03d}" for b in cells[:, 1] // ROAD_EVERY], dtype=object)
+        elif ftype == 'esriFieldTypeDate':
+            days = rng.integers(0, 18 * 365, size=count)
+            values = np.asarray([(start + timedelta(days=int(d))).strftime("%Y/%m/%d %H:%M:%S") for d in days],
+                                dtype=object)
+        elif ftype in ('esriFieldTypeString', 'esriFieldTypeGUID'):
+            width = max(1, min(length, 12))
+            values = np.asarray([f"{name[:3]}{v}"[:width] for v in rng.integers(0, 10 ** 6, size=count)],
+                                dtype=object)
+        elif ftype in ('esriFieldTypeSmallInteger', 'esriFieldTypeInteger'):
+            values = rng.integers(0, 1000, size=count)
+        else:
+            values = np.round(rng.uniform(0, 10000, size=count), 3)
+        columns[name] = values
+
+    return columns
+
+
+class SyntheticGDB:
+    """Generate synthetic FileGDB/GeoPackage datasets from bundled workspace XML schemas.
+
+    Args:
+        xml_files (optional): list of workspace XML documents, default KCH_CMS_DCDB.XML
+        lots (optional): number of features per polygon featureclass
+        lines (optional): number of features per polyline featureclass, default same as lots
+        points (optional): number of features per point featureclass, default same as lots
+        seed (optional): random seed, same seed gives the same datasets
+    """
+    def __init__(self, xml_files=None, lots=10000, lines=None, points=None, seed=0):
+        self.xml_files = [DEFAULT_XML] if xml_files is None else list(xml_files)
+        self.counts = {POLYGON: lots,
+                       LINESTRING: lots if lines is None else lines,
+                       POINT: lots if points is None else points}
+        self.seed = seed
+
+        self.domains = {}
+        self.featureclasses = []
+        for xml_file in self.xml_files:
+            schema = read_workspace_xml(xml_file)
+            self.domains.update(schema["domains"])
+            self.featureclasses.extend(schema["featureclasses"])
+
+    def _rng(self, featureclass, salt=0):
+        return np.random.default_rng([self.seed, zlib.crc32(featureclass["name"].encode()), salt])
+
+    def generate(self, featureclass):
+        """Geometries and attribute columns of one featureclass (deterministic for a seed)"""
+        rng = self._rng(featureclass)
+        count = self.counts[featureclass["shape_type"]]
+        xmin, ymin, xmax, ymax = featureclass["extent"] or (1983000.0, 5115000.0, 2101000.0, 5230000.0)
+        size = np.sqrt(count) * LOT_SIZE * 1.2
+        origin = (rng.uniform(xmin, max(xmin, xmax - size)), rng.uniform(ymin, max(ymin, ymax - size)))
+
+        # lines and pegs use the lot lattice of the same area
+        lots, cells, lattice = tessellation(max(count, 1), origin, rng)
+        if featureclass["shape_type"] == POLYGON:
+            geoms = lots
+        elif featureclass["shape_type"] == LINESTRING:
+            geoms, cells = boundary_lines(lattice, count, rng), None
+        else:
+            geoms, cells = boundary_pegs(lattice, count, rng), None
+
+        geoms.coords = self.snap(geoms.coords, featureclass["resolution"])
+        return geoms, attributes(featureclass, self.domains, len(geoms), rng, cells=cells), origin
+
+    @staticmethod
+    def snap(coords, resolution):
+        return np.round(coords / resolution) * resolution
+
+    def create(self, output, driver=None):
+        """Write all featureclasses to `output` (.gdb or .gpkg)"""
+        ds = self._open(output, driver)
+        for fc in self.featureclasses:
+            geoms, columns, _ = self.generate(fc)
+            layer = self._layer(ds, fc)
+            self._write(layer, geoms.to_wkb(), columns, np.arange(1, len(geoms) + 1))
+        ds = None
+
+        return output
+
+    def create_latest(self, output, inserts=0.01, edits=0.01, deletes=0.01, geometry_edits=0.0, driver=None):
+        """Write a perturbed copy of `create()` output with a known change set.
+
+        Deleted features are left out, edited features keep their FID with new attribute values
+        (and, for a `geometry_edits` share, a shift of a few centimetres), inserted features are a
+        new parcel block next to the existing one with FIDs after the last one.
+
+        Returns:
+            dataframe of FeatureClasses, FID, Change (insert/edit/delete), also saved as <output>_truth.csv
+        """
+        ds = self._open(output, driver)
+        truth = []
+        for fc in self.featureclasses:
+            geoms, columns, origin = self.generate(fc)
+            rng = self._rng(fc, salt=1)
+            count = len(geoms)
+            fids = np.arange(1, count + 1)
+
+            order = rng.permutation(count)
+            n_del = int(round(count * deletes))
+            n_edit = int(round(count * edits))
+            deleted = np.sort(order[:n_del])
+            edited = np.sort(order[n_del:n_del + n_edit])
+
+            wkbs = geoms.to_wkb()
+            if len(edited) > 0:
+                changed = attributes(fc, self.domains, len(edited), rng, serial_start=count)
+                for name, values in changed.items():
+                    if name != "LOT_NO_LABEL":
+                        columns[name] = np.asarray(columns[name], dtype=object)
+                        columns[name][edited] = values
+                moved = edited[:int(round(len(edited) * geometry_edits))]
+                if len(moved) > 0:
+                    shifted = RaggedGeometry.from_wkb([wkbs[i] for i in moved])
+                    shifted.coords[:, :2] += rng.uniform(0.01, 0.05, size=2)
+                    for i, wkb in zip(moved, shifted.to_wkb()):
+                        wkbs[i] = wkb
+
+            keep = np.ones(count, dtype=bool)
+            keep[deleted] = False
+            layer = self._layer(ds, fc)
+            self._write(layer, [w for w, k in zip(wkbs, keep) if k], {k: np.asarray(v)[keep] for k, v in columns.items()},
+                        fids[keep])
+
+            n_ins = int(round(count * inserts))
+            if n_ins > 0:
+                rng_new = self._rng(fc, salt=2)
+                new_origin = (origin[0] + (np.sqrt(count) + ROAD_EVERY) * LOT_SIZE * 1.2, origin[1])
+                new_lots, cells, lattice = tessellation(n_ins, new_origin, rng_new)
+                if fc["shape_type"] == LINESTRING:
+                    new_geoms, cells = boundary_lines(lattice, n_ins, rng_new), None
+                elif fc["shape_type"] == POINT:
+                    new_geoms, cells = boundary_pegs(lattice, n_ins, rng_new), None
+                else:
+                    new_geoms = new_lots
+                new_geoms.coords = self.snap(new_geoms.coords, fc["resolution"])
+                new_fids = np.arange(count + 1, count + len(new_geoms) + 1)
+                self._write(layer, new_geoms.to_wkb(),
+                            attributes(fc, self.domains, len(new_geoms), rng_new, serial_start=count, cells=cells),
+                            new_fids)
+                truth += [(fc["name"], int(f), "insert") for f in new_fids]
+
+            truth += [(fc["name"], int(fids[i]), "edit") for i in edited]
+            truth += [(fc["name"], int(fids[i]), "delete") for i in deleted]
+        ds = None
+
+        df = pd.DataFrame(truth, columns=["FeatureClasses", "FID", "Change"])
+        df.to_csv(f"{os.path.splitext(output)[0]}_truth.csv", index=False)
+
+        return df
+
+    def _open(self, output, driver):
+        if driver is None:
+            if os.path.splitext(output)[1].lower() == '.gdb':
+                driver = 'OpenFileGDB' if ogr.GetDriverByName('OpenFileGDB').TestCapability(ogr.ODrCCreateDataSource) \
+                    else 'FileGDB'
+            else:
+                driver = 'GPKG'
+        drv = ogr.GetDriverByName(driver)
+        if os.path.exists(output):
+            drv.DeleteDataSource(output)
+        ds = drv.CreateDataSource(output)
+
+        if hasattr(ogr, 'CreateCodedFieldDomain') and ds.TestCapability('AddFieldDomain'):
+            for name, codes in self.domains.items():
+                ds.AddFieldDomain(ogr.CreateCodedFieldDomain(name, name, ogr.OFTString, ogr.OFSTNone, codes))
+
+        return ds
+
+    def _layer(self, ds, featureclass):
+        layer = ds.GetLayerByName(featureclass["name"])
+        if layer is not None:
+            return layer
+
+        srs = osr.SpatialReference()
+        srs.SetFromUserInput(BRSO_WKT())
+        options = []
+        if ds.GetDriver().GetName() in ('OpenFileGDB', 'FileGDB'):
+            options.append(f"FEATURE_DATASET={featureclass['dataset']}")
+        layer = ds.CreateLayer(featureclass["name"], srs, OGR_GEOMETRY[featureclass["shape_type"]], options)
+
+        for field in featureclass["fields"]:
+            ftype, subtype = FIELD_TYPES[field["type"]]
+            defn = ogr.FieldDefn(field["name"], ftype)
+            defn.SetSubType(subtype)
+            if ftype == ogr.OFTString:
+                defn.SetWidth(field["length"])
+            if field["domain"] and hasattr(defn, 'SetDomainName') and ds.GetFieldDomain(field["domain"]) is not None:
+                defn.SetDomainName(field["domain"])
+            layer.CreateField(defn)
+
+        return layer
+
+    @staticmethod
+    def _write(layer, wkbs, columns, fids, batch=20000):
+        defn = layer.GetLayerDefn()
+        names = list(columns)
+        values = [np.asarray(columns[n]).tolist() for n in names]
+        promote = ogr.ForceToMultiPolygon if defn.GetGeomType() == ogr.wkbMultiPolygon else \
+            (ogr.ForceToMultiLineString if defn.GetGeomType() == ogr.wkbMultiLineString else None)
+
+        layer.StartTransaction()
+        for i, (wkb, fid) in enumerate(zip(wkbs, fids)):
+            feature = ogr.Feature(defn)
+            feature.SetFID(int(fid))
+            for name, column in zip(names, values):
+                feature.SetField(name, column[i])
+            if wkb is not None:
+                geom = ogr.CreateGeometryFromWkb(wkb)
+                feature.SetGeometryDirectly(promote(geom) if promote is not None else geom)
+            layer.CreateFeature(feature)
+            if (i + 1) % batch == 0:
+                layer.CommitTransaction()
+                layer.StartTransaction()
+        layer.CommitTransaction()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic geodatabase from workspace XML schemas")
+    parser.add_argument("output", help="output .gdb or .gpkg")
+    parser.add_argument("--xml", nargs="*", default=None, help="workspace XML document(s)")
+    parser.add_argument("--lots", type=int, default=10000)
+    parser.add_argument("--lines", type=int, default=None)
+    parser.add_argument("--points", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latest", default=None, help="also write a perturbed latest copy here")
+    parser.add_argument("--inserts", type=float, default=0.01)
+    parser.add_argument("--edits", type=float, default=0.01)
+    parser.add_argument("--deletes", type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    gen = SyntheticGDB(args.xml, lots=args.lots, lines=args.lines, points=args.points, seed=args.seed)
+    gen.create(args.output)
+    print(f"[INFO]\t{args.output} created")
+    if args.latest:
+        truth = gen.create_latest(args.latest, args.inserts, args.edits, args.deletes)
+        print(f"[INFO]\t{args.latest} created, {len(truth)} known changes")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,3 @@
 from .detect_new_layers import TOLNewFeatures, TOLReplication
+from .batch import TOLBatch
+from .replicas import TOLReplicaManager
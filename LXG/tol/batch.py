@@ -0,0 +1,125 @@
+"""
+Author : Lerry William
+"""
+import os
+import time
+import fnmatch
+import pandas as pd
+from tqdm import tqdm
+from ..apis import get_backend
+from ..logger import worker_pool
+from ..metrics import span, export
+from .detect_new_layers import TOLNewFeatures
+
+# the 12 LASIS divisions, as in LXG.assets
+DIVISIONS = ["KCH", "BTG", "BTU", "KPT", "LBG", "MKH", "MRI", "SBU", "SMH", "SRI", "SRK", "SRN"]
+
+
+def _match(name, wildcard):
+    return fnmatch.fnmatch(name.upper(), wildcard.upper())
+
+
+def _run_division(args):
+    """Pool task: detection of one division, returns its report rows"""
+    division, init_geodatabase, latest_geodatabase, catalog, backend = args
+    start = time.perf_counter()
+    try:
+        tol = TOLNewFeatures(init_geodatabase, latest_geodatabase, division, backend=backend,
+                             catalog=catalog, report=False)
+        timings = {f"{stage.capitalize()}Seconds": round(seconds, 3) for stage, seconds in tol.timings.items()}
+        rows = [dict(FeatureClasses=fc, Count=count) for fc, count in tol.new_features_list] or \
+               [dict(FeatureClasses=None, Count=0)]
+        error = None
+    except Exception as e:
+        timings, rows, error = {}, [dict(FeatureClasses=None, Count=None)], str(e)
+
+    seconds = round(time.perf_counter() - start, 3)
+
+    return [dict(Division=division, **row, Seconds=seconds, **timings, Error=error) for row in rows]
+
+
+class TOLBatch:
+    """Run `TOLNewFeatures` for several divisions concurrently, reported in one csv.
+
+    Args:
+        init_geodatabase: initial geodatabase per division, either a dict {division: geodatabase}
+            or a path with a `{division}` placeholder, eg. r"C:\\LXG\\replica\\{division}_TOL.gdb"
+        latest_geodatabase: latest geodatabase (SDE connection file) with every division *KPG_EXT* layers
+        divisions (optional): LASIS divisional abbreviations, default all 12 divisions
+        processes (optional): concurrent divisions, default 4
+        report_output_directory (optional): directory of the consolidated csv,
+            default ~/Documents/GIS_Reports/KPG_EXT
+        backend (optional): "arcpy", "ogr" or a `LXG.apis.Backend`, default arcpy when available
+
+    Usage:
+        ```
+        batch = TOLBatch(r"C:\\LXG\\replica\\{division}_TOL.gdb",
+                         r"C:\\LXG\\connections\\tol.sde",
+                         divisions=["KCH", "SRI", "MRI"])
+        batch.run()
+        ```
+
+    Returns:
+        dataframe of Division, FeatureClasses, Count, Seconds, <Stage>Seconds and Error
+    """
+    def __init__(self, init_geodatabase, latest_geodatabase, divisions=None, processes=4,
+                 report_output_directory=None, backend=None):
+        self.init = init_geodatabase
+        self.new = latest_geodatabase
+        self.divisions = DIVISIONS if divisions is None else [d.upper() for d in divisions]
+        self.processes = max(1, min(processes, len(self.divisions)))
+        self.report_out_dir = os.path.join(os.path.expanduser('~'), "Documents", "GIS_Reports", "KPG_EXT") \
+            if report_output_directory is None else report_output_directory
+        self.backend = get_backend(backend)
+        self.report_file = None
+
+    def init_geodatabase(self, division):
+        if isinstance(self.init, dict):
+            return self.init[division]
+
+        return self.init.format(division=division)
+
+    def list_catalog(self):
+        """{dataset: [polygon featureclasses]} of every *KPG_EXT* dataset of the latest geodatabase"""
+        with span("catalog"):
+            dss = self.backend.list_datasets(self.new, "*KPG_EXT*")
+            return {ds: self.backend.list_featureclasses(self.new, "*KPG_EXT*", "Polygon", ds) for ds in dss}
+
+    @staticmethod
+    def division_catalog(catalog, division):
+        """Part of the catalog matching the TOLNewFeatures wildcards of a division"""
+        return {ds: [fc for fc in fcs if _match(fc, f"*KPG_EXT*{division}*")]
+                for ds, fcs in catalog.items() if _match(ds, f"*{division}*KPG_EXT*")}
+
+    def run(self):
+        catalog = self.list_catalog()
+        tasks = [(div, self.init_geodatabase(div), self.new, self.division_catalog(catalog, div), self.backend.name)
+                 for div in self.divisions]
+
+        rows = []
+        with worker_pool(processes=self.processes) as pool:
+            results = tqdm(pool.imap_unordered(_run_division, tasks),
+                           total=len(tasks),
+                           desc="Divisions",
+                           position=0,
+                           colour='GREEN')
+            for division_rows in results:
+                rows += division_rows
+            pool.close()
+            pool.join()
+
+        df = pd.DataFrame(rows).sort_values(["Division", "FeatureClasses"], na_position="first")
+        df = df.fillna({c: 0.0 for c in df.columns if c.endswith("Seconds")}).reset_index(drop=True)
+
+        os.makedirs(self.report_out_dir, exist_ok=True)
+        self.report_file = os.path.join(self.report_out_dir, "TOL_KPG_EXT_new_layers.csv")
+        df.to_csv(self.report_file, index=False)
+        print(f"[INFO]\t{len(self.divisions)} divisions done, report {self.report_file}")
+
+        export("tol_batch")
+
+        return df
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(init_geodatabase={self.init}, latest_geodatabase={self.new}, " \
+               f"divisions={self.divisions}, processes={self.processes}, backend={self.backend.name})"
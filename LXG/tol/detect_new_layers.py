@@ -1,14 +1,24 @@
 import sys
-import arcpy
 import re
 import os
 from tqdm import tqdm
 import multiprocessing as mp
+import numpy as np
 import pandas as pd
-import uuid
-import tempfile
-import shutil
-from ..utils import TemporaryDirectory
+import time
+import json
+from datetime import datetime
+
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
+
+from ..apis import get_backend, basename, where_in, ConnectionManager
+from ..spatial import new_points, point_keys
+from ..metrics import span, export, registry
+
+POINT_EXCLUDE_FIELDS = ('OBJECTID', 'SHAPE', 'SHAPE_LENGTH', 'SHAPE_AREA', 'ORIG_FID')
 
 
 class TOLNewFeatures:
@@ -19,6 +29,9 @@ class TOLNewFeatures:
         latest_geodatabase: latest geodatabase (SDE) which contains *KPG_EXT* layers
         division: LASIS divisional abbreviation eg. KCH, BTU, LBG ...
         datasets_wildcard (optional): Query for interested dataset layer(s)
+        backend (optional): "arcpy", "ogr" or a `LXG.apis.Backend`, default arcpy when available
+        catalog (optional): {dataset: [polygon featureclasses]} of the latest geodatabase, listed once by `TOLBatch`
+        report (optional): Save the division csv report, default True
 
     Usage:
         ```
@@ -29,6 +42,7 @@ class TOLNewFeatures:
         check_db = TOLNewFeatures(init_geodatabase=init,
                                   latest_geodatabase=new,
                                   division="KCH")
+        oids, xy = check_db.new_features["KPG_EXT_KCH"]
         ```
 
     Returns:
@@ -37,116 +51,108 @@ class TOLNewFeatures:
     Note:
         Make sure SDE connected or create a new SDE connection before running the script.
     """
+    # centroids closer than this (meters) are the same polygon
+    tolerance = 0.02
+
     def __init__(self, init_geodatabase, latest_geodatabase, division, datasets_wildcard=None,
-                 featureclass_wildcard=None):
+                 featureclass_wildcard=None, backend=None, catalog=None, report=True):
         self.init = init_geodatabase
         self.new = latest_geodatabase
         self.div = division
         self.ds_wildcard = f"*{self.div}*KPG_EXT*" if datasets_wildcard is None or datasets_wildcard == "" else datasets_wildcard
         self.fc_wildcard = f"*KPG_EXT*{self.div}*" if featureclass_wildcard is None or featureclass_wildcard == "" else featureclass_wildcard
+        self.backend = get_backend(backend)
+        self.catalog = catalog
+        self.create_report = report
 
         self.processor_num = 4 if mp.cpu_count() >= 4 else (2 if mp.cpu_count() == 2 else 1)
+        # {"init"/"new": {featureclass: (path, oids, xy)}}
+        self.centroids = {}
+        # {featureclass: (oids, xy)} of the new polygons
+        self.new_features = {}
 
-        self.scratch = "in_memory"
-        arcpy.env.workspace = self.scratch
-
+        self.new_features_list = []
+        start = time.perf_counter()
         try:
             self.prepare_features(self.init, "init")
             self.prepare_features(self.new, "new")
 
-            _ = self.check_differences()
-
-            arcpy.ClearWorkspaceCache_management()
-            arcpy.Delete_management(self.scratch)
-        except arcpy.ExecuteError as e:
+            self.new_features_list = self.check_differences()
+        except self.backend.Error as e:
             print(e)
 
+        self.seconds = time.perf_counter() - start
+        self.timings = registry.summary()
+        export(f"tol_new_features_{self.div}")
+
+    def list_polygons(self, geodatabase):
+        """{dataset: [polygon featureclasses]} matching the division wildcards"""
+        if geodatabase == self.new and self.catalog is not None:
+            return self.catalog
+
+        with span("catalog"):
+            dss = self.backend.list_datasets(geodatabase, self.ds_wildcard)
+            return {ds: self.backend.list_featureclasses(geodatabase, self.fc_wildcard, "Polygon", ds) for ds in dss}
+
     def prepare_features(self, geodatabase, name):
         fc_class_name = name
+        centroids = self.centroids.setdefault(fc_class_name, {})
 
-        arcpy.env.workspace = geodatabase
-        dss = sorted(arcpy.ListDatasets(self.ds_wildcard, "Feature"))
-        pbar01 = tqdm(dss, desc=f'Analyze {fc_class_name}', position=0, colour='GREEN')
+        catalog = self.list_polygons(geodatabase)
+        pbar01 = tqdm(sorted(catalog), desc=f'Analyze {fc_class_name}', position=0, colour='GREEN')
         for ds in pbar01:
-            fc_poly = sorted(arcpy.ListFeatureClasses(self.fc_wildcard, "Polygon", ds))
+            fc_poly = catalog[ds]
             if len(fc_poly) > 0:
                 pbar03 = tqdm(fc_poly, position=1, colour='Yellow', leave=False)
                 for poly in pbar03:
-                    if re.search('sde.', poly):
-                        poly_name = poly.split(os.extsep)[-1]
-                    elif re.search('SDE.', poly):
-                        poly_name = poly.split(os.extsep)[-1]
-                    else:
-                        poly_name = poly
-
-                    pts = os.path.join(self.scratch, f'{fc_class_name}_{poly_name}_pts')
-                    buf = os.path.join(self.scratch, f'{fc_class_name}_{poly_name}_buf')
-                    self._polys([os.path.join(geodatabase, ds, poly),
-                                 geodatabase,
-                                 pts,
-                                 buf
-                                 ])
-
-    def get_scratch_features(self):
-        arcpy.env.workspace = self.scratch
-
-        print(arcpy.ListFeatureClasses("", "All"))
-        all_feats = [fc for fc in sorted(arcpy.ListFeatureClasses("", ""))]
-
-        return all_feats
-
-    def _polys(self, fc_list):
-        geodatabase = fc_list[1]
-        pts_feat_poly = fc_list[2]
-        buf_feat_poly = fc_list[3]
-        try:
-            arcpy.FeatureToPoint_management(fc_list[0], pts_feat_poly, "CENTROID")
-            if geodatabase == self.init:
-                # Execute the Buffer tool if initial geodatabase
-                arcpy.Buffer_analysis(pts_feat_poly,
-                                      buf_feat_poly,
-                                      "0.02 meters")
-                arcpy.Delete_management(pts_feat_poly)
-        except arcpy.ExecuteError as e:
-            arcpy.AddError(e)
-
-        del geodatabase, pts_feat_poly, buf_feat_poly
+                    path = os.path.join(geodatabase, ds, poly)
+                    try:
+                        with span("centroid", layer=poly) as s:
+                            oids, xy = self.backend.centroids(path)
+                            s.rows = len(oids)
+                        centroids[basename(poly)] = (path, oids, xy)
+                    except self.backend.Error as e:
+                        self.backend.error(e)
+
+    def detect(self, featureclass):
+        """OIDs and centroids of the polygons of `featureclass` missing from the initial geodatabase"""
+        _, old_oids, old_xy = self.centroids["init"][featureclass]
+        _, new_oids, new_xy = self.centroids["new"][featureclass]
+
+        return new_points(new_oids, new_xy, old_xy, self.tolerance)
 
     def check_differences(self):
-        arcpy.env.workspace = self.new
         new_features_list = []
 
-        dss = sorted(arcpy.ListDatasets(self.ds_wildcard, "Feature"))
-        pbar01 = tqdm(dss, desc='Detect changes', position=0, colour='GREEN')
+        catalog = self.list_polygons(self.new)
+        pbar01 = tqdm(sorted(catalog), desc='Detect changes', position=0, colour='GREEN')
         for ds in pbar01:
-            fcs = sorted(arcpy.ListFeatureClasses(self.fc_wildcard, "Polygon", ds))
+            fcs = catalog[ds]
             pbar02 = tqdm(fcs, position=1, colour='Yellow', leave=False)
             for fc in pbar02:
                 pbar02.set_description(fc)
-                if re.search('sde.', fc):
-                    fc = fc.split(os.extsep)[-1]
-                elif re.search('SDE.', fc):
-                    fc = fc.split(os.extsep)[-1]
-                else:
-                    fc = fc
-                fc_pts = os.path.join(self.scratch, f'new_{fc}_pts')
-
-                old_fc_buf = os.path.join(self.scratch, f'init_{fc}_buf')
+                fc = basename(fc)
                 try:
-                    if arcpy.Exists(fc_pts):
-                        if arcpy.Exists(old_fc_buf):
-                            get_count = self.intersect(fc_pts, old_fc_buf)
+                    if fc in self.centroids.get("new", {}):
+                        if fc in self.centroids.get("init", {}):
+                            with span("detection", layer=fc) as s:
+                                oids, xy = self.new_features[fc] = self.detect(fc)
+                                get_count = s.rows = len(oids)
                             if get_count > 0:
                                 new_features_list.append((fc, get_count))
                             # start copy/append
+                            source = self.centroids["new"][fc][0]
                             target_point_fc = os.path.join(self.new, ds, f"KPG_EXT_POINT_{self.div}")
-                            if arcpy.Exists(target_point_fc):
-                                self.truncate_append(target_point_fc, fc_pts)
-                            else:
-                                arcpy.CopyFeatures_management(fc_pts, target_point_fc)
-                except arcpy.ExecuteError as e:
-                    arcpy.AddError(e)
-        if len(new_features_list) > 0:
+                            with span("append", layer=f"KPG_EXT_POINT_{self.div}"):
+                                if self.backend.exists(target_point_fc):
+                                    self.upsert(target_point_fc, source, oids, xy)
+                                else:
+                                    oid_field = self.backend.describe(source)["oid_field"]
+                                    self.backend.feature_to_point(source, target_point_fc, "CENTROID",
+                                                                  where=where_in(oid_field, oids))
+                except self.backend.Error as e:
+                    self.backend.error(e)
+        if len(new_features_list) > 0 and self.create_report:
             df = pd.DataFrame(new_features_list, columns=["FeatureClasses", "Count"])
             report_dir = os.path.join(os.path.expanduser('~'), "Documents", "GIS_Reports", "KPG_EXT")
             os.makedirs(report_dir, exist_ok=True)
@@ -154,70 +160,71 @@ class TOLNewFeatures:
 
         return new_features_list
 
-    def intersect(self, in_layer, select_features):
-        _, _, selected_count = arcpy.SelectLayerByLocation_management(
-            in_layer=in_layer,
-            overlap_type="INTERSECT",
-            select_features=select_features,
-            selection_type="NEW_SELECTION",
-            invert_spatial_relationship="INVERT")
-
-        arcpy.SelectLayerByAttribute_management(select_features, "CLEAR_SELECTION")
-
-        selected_layer, _, _ = arcpy.SelectLayerByLocation_management(
-            in_layer=in_layer,
-            overlap_type="INTERSECT",
-            select_features=select_features,
-            selection_type="NEW_SELECTION",
-            invert_spatial_relationship="NOT_INVERT")
-
-        arcpy.DeleteRows_management(selected_layer)
-
-        arcpy.SelectLayerByAttribute_management(in_layer, "CLEAR_SELECTION")
-
-        return int(selected_count)
-
-    def truncate_append(self, featureclass_target, feature_point):
+    def point_rows(self, featureclass_target, source, oids, xy):
+        """Fields and rows (attributes of the source polygons, centroid, ORIG_FID) for the target points"""
+        target = {name.upper(): name for name, _type, editable in self.backend.describe(featureclass_target)["fields"]
+                  if editable and _type not in ("OID", "Geometry", "GlobalID")}
+        desc = self.backend.describe(source)
+        fields = [name for name, _type, _ in desc["fields"]
+                  if name.upper() in target and name.upper() not in POINT_EXCLUDE_FIELDS
+                  and _type not in ("OID", "Geometry", "GlobalID")]
+        # long IN lists are slower than one pass over the layer
+        where = where_in(desc["oid_field"], oids) if len(oids) <= 1000 else None
+        wanted = set(int(oid) for oid in oids)
+        attributes = {row[0]: row[1:] for row in self.backend.search(source, ["OID@"] + fields, where)
+                      if row[0] in wanted}
+        orig_fid = "ORIG_FID" in target
+        rows = [tuple(attributes.get(int(oid), (None,) * len(fields))) + ((float(x), float(y)),) +
+                ((int(oid),) if orig_fid else ()) for oid, (x, y) in zip(oids, xy)]
+
+        return fields + ["SHAPE@XY"] + ([target["ORIG_FID"]] if orig_fid else []), rows
+
+    def upsert(self, featureclass_target, source, oids, xy):
+        """Insert the missing target points and delete the stale ones (keyed by ORIG_FID and centroid cell),
+        returns (inserted, deleted)"""
+        desc = self.backend.describe(featureclass_target)
+        orig_fid = next((name for name, _, _ in desc["fields"] if name.upper() == "ORIG_FID"), None)
+        if orig_fid is None:
+            # no source polygon ID to key on
+            self.truncate_append(featureclass_target, source, oids, xy)
+            return len(oids), None
+
+        rows = [row for row in self.backend.search(featureclass_target, ["OID@", orig_fid, "SHAPE@XY"])
+                if row[1] is not None and row[2] is not None]
+        existing_oids = np.array([row[0] for row in rows], dtype=np.int64)
+        existing = point_keys([row[1] for row in rows], np.array([row[2] for row in rows]).reshape(-1, 2),
+                              self.tolerance)
+        wanted = point_keys(oids, xy, self.tolerance)
+
+        stale = ~existing.isin(wanted) | existing.duplicated()
+        missing = ~wanted.isin(existing)
         try:
-            fc_uid = uuid.uuid4()
-            arcpy.MakeTableView_management(featureclass_target, f"tab_{str(fc_uid)}")
-            query = f"OBJECTID IS NOT NULL"
-            arcpy.SelectLayerByAttribute_management(f"tab_{str(fc_uid)}", "NEW_SELECTION", query)
-            arcpy.DeleteRows_management(f"tab_{str(fc_uid)}")
-            arcpy.SelectLayerByAttribute_management(f"tab_{str(fc_uid)}", "CLEAR_SELECTION")
-            arcpy.Delete_management(f"tab_{str(fc_uid)}")
-        except arcpy.ExecuteError as e:
-            arcpy.AddError(e)
-
+            deleted = self.backend.delete_oids(featureclass_target, existing_oids[stale])
+            inserted = 0
+            if missing.any():
+                fields, new_rows = self.point_rows(featureclass_target, source, oids[missing], xy[missing])
+                inserted = self.backend.insert(featureclass_target, fields, new_rows)
+        except self.backend.Error as e:
+            self.backend.error(e)
+            return None, None
+        self.backend.message(f"[INFO]\t{os.path.basename(featureclass_target)}: {inserted} inserted, "
+                             f"{deleted} deleted, {int((~stale).sum())} unchanged")
+
+        return inserted, deleted
+
+    def truncate_append(self, featureclass_target, source, oids, xy):
         try:
-            fieldMappings = self.fieldmapping(feature_point,
-                                              featureclass_target)
-            arcpy.Append_management(inputs=feature_point,
-                                    target=featureclass_target,
-                                    schema_type="NO_TEST",
-                                    field_mapping=fieldMappings
-                                    )
-            del fieldMappings
-        except arcpy.ExecuteError as e:
-            arcpy.AddError(e)
-
-    def fieldmapping(self, fc_source, fc_target):
-        fieldMappings = arcpy.FieldMappings()
-        field_tgt = arcpy.ListFields(fc_target)
-        namelist_tgt = []
-        # Creating field maps for the two files
-        fieldMappings.addTable(fc_source)
-        fieldMappings.addTable(fc_target)
+            self.backend.truncate(featureclass_target)
+        except self.backend.Error as e:
+            self.backend.error(e)
 
-        for fd in field_tgt:
-            if fd.type != "OID" and fd.editable is False:
-                namelist_tgt.append(fd.name)
-
-        for field in fieldMappings.fields:
-            if field.name not in namelist_tgt:
-                fieldMappings.removeFieldMap(fieldMappings.findFieldMapIndex(field.name))
-
-        return fieldMappings
+        if len(oids) == 0:
+            return
+        try:
+            fields, rows = self.point_rows(featureclass_target, source, oids, xy)
+            self.backend.insert(featureclass_target, fields, rows)
+        except self.backend.Error as e:
+            self.backend.error(e)
 
 
 class TOLReplication:
@@ -225,7 +232,7 @@ class TOLReplication:
     This is one way replication from SDE to local geodatabase.
 
     Args:
-        sde_connection: SDE Connection file, a temporary SDE connection will be created if not provide.
+        sde_connection: SDE Connection file, a cached SDE connection is used (or created) if not provide.
         sde_instance: Database Instance
         sde_platform: ORACLE,POSTGRESQL
         sde_username (Optional): Query for interested layers
@@ -236,6 +243,15 @@ class TOLReplication:
         wildcard_featureclass (Optional): SQL Query to select table for interested featureclass layer
         replica (Optional): Geodatabase file for replica
         replica_name (Optional): Replica name.
+        force_sync (Optional): Synchronize even when the change probe finds no new changes in the parent.
+        connections (Optional): `LXG.apis.ConnectionManager` caching the connection and capping the sessions.
+
+    Note:
+        Before synchronizing, the parent featureclasses are probed (row count, max OID and max edit date
+        when editor tracking is on). The probe of the last successful sync is cached in
+        ~/.LXG_WORKSPACE/<replica_name>_probe.json, and sync and reconcile are skipped when nothing changed.
+        After a run, `created`, `synced`, `changes` ({featureclass: net rows synchronized}), `seconds`
+        and `timings` describe what happened.
 
     Usage:
         ```
@@ -249,139 +265,197 @@ class TOLReplication:
     def __init__(self, sde_connection=None, sde_instance=None, sde_platform=None,
                  sde_username=None, sde_password=None, sde_database=None,
                  division=None, wildcard_datasets=None, wildcard_featureclass=None,
-                 replica=None, replica_name=None, unregister_replica=False):
+                 replica=None, replica_name=None, unregister_replica=False, force_sync=False, connections=None):
+        self.force_sync = force_sync
+        self._replicas = None
+        self.created, self.synced, self.changes = False, False, {}
+        self.platform = sde_platform
+        self.instance = "127.0.0.1" if sde_instance is None else sde_instance
+        self.usr = "sde" if sde_username is None else sde_username
+        self.pwd = sde_password
+        self.database = "sde_gis" if sde_database is None else sde_database
+        self.connections = ConnectionManager(backend="arcpy") if connections is None else connections
         if sde_connection is None:
-            with TemporaryDirectory() as self.tempdir:
-                os.makedirs(self.tempdir, exist_ok=True)
-                self.sde_name_uid = uuid.uuid4()
-                self.platform = sde_platform
-                self.instance = "127.0.0.1" if sde_instance is None else sde_instance
-                self.usr = "sde" if sde_username is None else sde_username
-                self.pwd = "sde" if sde_password is None else sde_password
-                self.database = "sde_gis" if sde_database is None else sde_database
-                _sde = self.temp_connection()
-                self.sde = _sde if sde_connection is None else sde_connection
-                self.division = division
-                self.wildcard_ds = "*" if wildcard_datasets is None else wildcard_datasets
-                self.wildcard_fc = "*" if wildcard_featureclass is None else wildcard_featureclass
-
-                self.unregister_replica = unregister_replica
-                if self.unregister_replica:
-                    self.unregister()
-
-                work_dir = os.path.join(os.path.expanduser('~'), ".LXG_WORKSPACE")
-                if not os.path.isdir(work_dir):
-                    os.makedirs(work_dir)
-                else:
-                    pass
-
-                replica_gdb = os.path.join(work_dir, "tol_replica.gdb")
-
-                if arcpy.Exists(replica_gdb):
-                    # if file exist, keep it. It is a replica geodatabase by the way.
-                    self.replica = replica_gdb if replica is None else replica
-                else:
-                    # create a new replica if not exist in the system.
-                    self.replica = arcpy.CreateFileGDB_management(work_dir, "tol_replica.gdb") if replica is None else replica
-
-                self.replica_name = "tol_replication" if replica_name is None else replica_name
-
-                try:
-                    self.check()
-                    self.run()
-                    self.sync()
-                except arcpy.ExecuteError as e:
-                    arcpy.AddError(e)
+            # cached connection file, the password is only needed to create it
+            self.sde = self.connections.get(self.platform, self.instance, self.usr, self.pwd, self.database)
         else:
             self.sde = sde_connection
-            self.division = division
-            self.wildcard_ds = "*" if wildcard_datasets is None else wildcard_datasets
-            self.wildcard_fc = "*" if wildcard_featureclass is None else wildcard_featureclass
+        self.division = division
+        self.wildcard_ds = "*" if wildcard_datasets is None else wildcard_datasets
+        self.wildcard_fc = "*" if wildcard_featureclass is None else wildcard_featureclass
+        self.replica_name = "tol_replication" if replica_name is None else replica_name
 
-            self.unregister_replica = unregister_replica
-            if self.unregister_replica:
-                self.unregister()
+        self.unregister_replica = unregister_replica
+        if self.unregister_replica:
+            self.unregister()
 
-            work_dir = os.path.join(os.path.expanduser('~'), ".LXG_WORKSPACE")
-            if not os.path.isdir(work_dir):
-                os.makedirs(work_dir)
-            else:
-                pass
+        work_dir = os.path.join(os.path.expanduser('~'), ".LXG_WORKSPACE")
+        if not os.path.isdir(work_dir):
+            os.makedirs(work_dir)
 
-            replica_gdb = os.path.join(work_dir, "tol_replica.gdb")
+        replica_gdb = os.path.join(work_dir, "tol_replica.gdb")
 
-            if arcpy.Exists(replica_gdb):
-                # if file exist, keep it. It is a replica geodatabase by the way.
-                self.replica = replica_gdb if replica is None else replica
-            else:
-                # create a new replica if not exist in the system.
-                self.replica = arcpy.CreateFileGDB_management(work_dir,
-                                                              "tol_replica.gdb") if replica is None else replica
+        if arcpy.Exists(replica_gdb):
+            # if file exist, keep it. It is a replica geodatabase by the way.
+            self.replica = replica_gdb if replica is None else replica
+        else:
+            # create a new replica if not exist in the system.
+            self.replica = arcpy.CreateFileGDB_management(work_dir, "tol_replica.gdb") if replica is None else replica
 
-            self.replica_name = "tol_replication" if replica_name is None else replica_name
-            self.unregister_replica = unregister_replica
+        self.work_dir = work_dir
+        start = time.perf_counter()
+        try:
+            with self.connections.session(self.sde):
+                self.replicate()
+        except arcpy.ExecuteError as e:
+            arcpy.AddError(e)
 
-            try:
-                self.check()
-                self.run()
-                self.sync()
-            except arcpy.ExecuteError as e:
-                arcpy.AddError(e)
+        self.seconds = time.perf_counter() - start
+        self.timings = registry.summary()
+        export("tol_replication")
+
+    def replicate(self):
+        """Create the replica when missing, then synchronize it if the parent changed"""
+        self.check()
+        self.created = self.run()
+
+        probe = self.probe()
+        cached = self.load_probe()
+        if self.created or self.force_sync or probe is None or probe != cached:
+            before = self.replica_counts()
+            self.synced = self.sync()
+            if self.synced:
+                self.save_probe(probe)
+                after = self.replica_counts()
+                self.changes = {fc: after[fc] - before.get(fc, 0) for fc in after}
+        else:
+            arcpy.AddMessage(f"[INFO]\tNo changes in {self.parent_dataset()} since the last sync, skip synchronize...")
+
+    def replicas(self):
+        """Replicas of the child geodatabase, listed once per run"""
+        if self._replicas is None:
+            with span("catalog"):
+                self._replicas = [replica.name for replica in arcpy.da.ListReplicas(self.replica)]
+
+        return self._replicas
+
+    def replica_counts(self):
+        """{featureclass: rows} of the child geodatabase"""
+        arcpy.env.workspace = self.replica
+        counts = {}
+        for ds in arcpy.ListDatasets("", "Feature") or []:
+            for fc in arcpy.ListFeatureClasses("", "All", ds) or []:
+                counts[basename(fc)] = int(arcpy.GetCount_management(os.path.join(self.replica, ds, fc)).getOutput(0))
+
+        return counts
+
+    def parent_dataset(self):
+        return f"{self.database}.sde.{self.division}_LAND_KPG_EXT" if self.platform == "POSTGRESQL" \
+            else f"SDE.{self.division}_LAND_KPG_EXT"
+
+    def probe(self):
+        """{featureclass: [count, max OID, max edit date]} of the parent dataset, None without editor tracking"""
+        result = {}
+        with span("probe", layer=self.parent_dataset()):
+            arcpy.env.workspace = self.sde
+            for fc in sorted(arcpy.ListFeatureClasses("", "All", self.parent_dataset()) or []):
+                path = os.path.join(self.sde, self.parent_dataset(), fc)
+                desc = arcpy.Describe(path)
+                if not getattr(desc, "editorTrackingEnabled", False) or not desc.editedAtFieldName:
+                    return None
+                count = int(arcpy.GetCount_management(path).getOutput(0))
+                result[fc] = [count,
+                              self._max_value(path, desc.OIDFieldName),
+                              self._max_value(path, desc.editedAtFieldName)]
+
+        return result
+
+    @staticmethod
+    def _max_value(path, field):
+        # the database sorts (and uses the index on OID), only one row travels
+        with arcpy.da.SearchCursor(path, [field], where_clause=f"{field} IS NOT NULL",
+                                   sql_clause=(None, f"ORDER BY {field} DESC")) as rows:
+            for row in rows:
+                return str(row[0])
+
+        return None
+
+    def probe_file(self):
+        # one file per replica, replicas synchronized concurrently never write the same file
+        return os.path.join(self.work_dir, f"{self.replica_name}_probe.json")
+
+    def load_probe(self):
+        try:
+            with open(self.probe_file()) as f:
+                return json.load(f).get(self.replica_name, {}).get("probe")
+        except (OSError, ValueError):
+            return None
+
+    def save_probe(self, probe):
+        if probe is None:
+            return
+        try:
+            with open(self.probe_file()) as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            doc = {}
+        doc[self.replica_name] = {"probe": probe, "parent": self.parent_dataset(),
+                                  "synced": datetime.now().isoformat(timespec='seconds')}
+        with open(self.probe_file(), "w") as f:
+            json.dump(doc, f, indent=2)
 
     def run(self):
-        """"Run ReplicateTOL"""
-        repl_name = []
-        for replica in arcpy.da.ListReplicas(self.replica):
-            repl_name.append(replica.name)
-
-        if self.replica_name not in repl_name:
-            kpg_ext = f"{self.database}.sde.{self.division}_LAND_KPG_EXT" if self.platform == "POSTGRESQL" \
-                else f"SDE.{self.division}_LAND_KPG_EXT"
+        """"Run ReplicateTOL, returns True when the replica was created"""
+        if self.replica_name not in self.replicas():
+            kpg_ext = self.parent_dataset()
             try:
-                arcpy.CreateReplica_management(
-                    os.path.join(self.sde, kpg_ext),
-                    "ONE_WAY_REPLICA",
-                    self.replica,
-                    self.replica_name,
-                    "FULL",
-                    "PARENT_DATA_SENDER",
-                    "USE_DEFAULTS",
-                    "DO_NOT_REUSE",
-                    "GET_RELATED",
-                    None,
-                    "DO_NOT_USE_ARCHIVING",
-                    "DO_NOT_USE_REGISTER_EXISTING_DATA",
-                    "GEODATABASE",
-                    None)
+                with span("replica", layer=kpg_ext):
+                    arcpy.CreateReplica_management(
+                        os.path.join(self.sde, kpg_ext),
+                        "ONE_WAY_REPLICA",
+                        self.replica,
+                        self.replica_name,
+                        "FULL",
+                        "PARENT_DATA_SENDER",
+                        "USE_DEFAULTS",
+                        "DO_NOT_REUSE",
+                        "GET_RELATED",
+                        None,
+                        "DO_NOT_USE_ARCHIVING",
+                        "DO_NOT_USE_REGISTER_EXISTING_DATA",
+                        "GEODATABASE",
+                        None)
                 arcpy.AddMessage(f"[INFO]\tReplica created, continue to sync...")
+                self._replicas.append(self.replica_name)
+                return True
             except arcpy.ExecuteError as e:
                 arcpy.AddError(e)
         else:
             print(f"[INFO]\t{self.replica_name} already exist, continue to sync...")
 
-        return
+        return False
 
     def sync(self):
         """Sync replica geodatabase to SDE database"""
         try:
-            arcpy.SynchronizeChanges_management(
-                self.replica,
-                self.replica_name,
-                self.sde,
-                "FROM_GEODATABASE2_TO_1",
-                "IN_FAVOR_OF_GDB2",
-                "BY_OBJECT",
-                "RECONCILE ")
+            with span("sync", layer=self.replica_name):
+                arcpy.SynchronizeChanges_management(
+                    self.replica,
+                    self.replica_name,
+                    self.sde,
+                    "FROM_GEODATABASE2_TO_1",
+                    "IN_FAVOR_OF_GDB2",
+                    "BY_OBJECT",
+                    "RECONCILE ")
             arcpy.AddMessage(f"[INFO]\t{self.replica} successfully sync with {self.sde}...")
         except arcpy.ExecuteError as e:
             arcpy.AddError(e)
+            return False
 
-        return
+        return True
 
     def check(self):
-        repl_name = []
-        for replica in arcpy.da.ListReplicas(self.replica):
-            repl_name.append(replica.name)
+        repl_name = self.replicas()
         try:
             print_out = '[INFO]\tReplica name list:\n'+'\t\t\u25A0 '+'\n\t\t\u25A0 '.join(repl_name)
             print(print_out)
@@ -390,36 +464,6 @@ class TOLReplication:
 
         return
 
-    def temp_connection(self):
-        """Create a temporary connection to SDE"""
-        if self.platform == "oracle":
-            platform = "ORACLE"
-        elif self.platform == "postgres":
-            platform = "POSTGRESQL"
-        else:
-            platform = self.platform
-
-        assert self.platform is not None or self.platform != ""
-
-        conn = {"out_folder_path": self.tempdir,
-                "out_name": f'{str(self.sde_name_uid.hex)}.sde',
-                "database_platform": platform,
-                "instance": self.instance,
-                "account_authentication": "DATABASE_AUTH",
-                "database": self.database if platform == "POSTGRESQL" else "",
-                "username": self.usr,
-                "password": self.pwd,
-                "save_user_pass": "SAVE_USERNAME"}
-
-        temp_sde = os.path.join(conn["out_folder_path"], conn["out_name"])
-
-        if arcpy.Exists(temp_sde):
-            arcpy.Delete_management(temp_sde)
-
-        arcpy.CreateDatabaseConnection_management(**conn)
-
-        return temp_sde
-
     def unregister(self):
         try:
             arcpy.UnregisterReplica_management(
@@ -433,7 +477,7 @@ class TOLReplication:
     def __repr__(self):
         return f"{self.__class__.__name__}(sde_connection={self.sde}, " \
                f"sde_instance={self.instance}, sde_platform={self.platform}, sde_username={self.usr}, " \
-               f"sde_password={self.pwd}, sde_database={self.database}, division={self.division}, " \
+               f"sde_password={'***' if self.pwd else None}, sde_database={self.database}, division={self.division}, " \
                f"wildcard_datasets={self.wildcard_ds}, wildcard_featureclass={self.wildcard_fc}, " \
                f"replica={self.replica}, replica_name={self.replica_name})"
 
@@ -0,0 +1,128 @@
+"""
+Author : Lerry William
+"""
+import os
+import time
+import pandas as pd
+from datetime import datetime
+from tqdm import tqdm
+from ..logger import worker_pool
+from ..metrics import export
+from .batch import DIVISIONS
+
+
+def _sync_replica(args):
+    """Pool task: create / synchronize one replica, returns its report row"""
+    division, sde_connection, platform, database, replica, replica_name, force_sync = args
+    import arcpy
+    from .detect_new_layers import TOLReplication
+
+    start = time.perf_counter()
+    row = dict(Division=division, Replica=replica_name, Created=False, Synced=False, Changes=None)
+    try:
+        if not arcpy.Exists(replica):
+            arcpy.CreateFileGDB_management(os.path.dirname(replica), os.path.basename(replica))
+        repl = TOLReplication(sde_connection=sde_connection, sde_platform=platform, sde_database=database,
+                              division=division, replica=replica, replica_name=replica_name,
+                              force_sync=force_sync)
+        timings = {f"{stage.capitalize()}Seconds": round(seconds, 3) for stage, seconds in repl.timings.items()}
+        row.update(Created=repl.created, Synced=repl.synced, Changes=sum(abs(n) for n in repl.changes.values()))
+        error = None
+    except Exception as e:
+        timings, error = {}, str(e)
+
+    return dict(**row, Seconds=round(time.perf_counter() - start, 3), **timings, Error=error)
+
+
+class TOLReplicaManager:
+    """One `TOLReplication` replica (child geodatabase) per division, synchronized concurrently.
+
+    Args:
+        sde_connection: SDE connection file of the parent geodatabase
+        sde_platform (optional): ORACLE, POSTGRESQL
+        sde_database (optional): SDE database name - only for POSTGRESQL
+        divisions (optional): LASIS divisional abbreviations registered at start, default all 12 divisions
+        connections (optional): concurrent replica syncs, default 4
+        work_directory (optional): directory of the child geodatabases, default ~/.LXG_WORKSPACE/replicas
+        force_sync (optional): synchronize even when the parent has no new changes
+        report_output_directory (optional): directory of the sync history csv,
+            default ~/Documents/GIS_Reports/KPG_EXT
+
+    Usage:
+        ```
+        manager = TOLReplicaManager(r"C:\\LXG\\connections\\tol.sde", "ORACLE", divisions=["KCH", "SRI"])
+        manager.register("MRI", replica=r"D:\\replicas\\MRI_TOL.gdb")
+        manager.run()
+        ```
+
+    Returns:
+        dataframe of Cycle, Division, Replica, Created, Synced, Changes, Seconds, <Stage>Seconds and Error
+    """
+    def __init__(self, sde_connection, sde_platform=None, sde_database=None, divisions=None, connections=4,
+                 work_directory=None, force_sync=False, report_output_directory=None):
+        self.sde = sde_connection
+        self.platform = sde_platform
+        self.database = sde_database
+        self.connections = max(1, connections)
+        self.work_dir = os.path.join(os.path.expanduser('~'), ".LXG_WORKSPACE", "replicas") \
+            if work_directory is None else work_directory
+        self.force_sync = force_sync
+        self.report_out_dir = os.path.join(os.path.expanduser('~'), "Documents", "GIS_Reports", "KPG_EXT") \
+            if report_output_directory is None else report_output_directory
+        self.report_file = None
+
+        self.replicas = {}
+        for division in (DIVISIONS if divisions is None else divisions):
+            self.register(division)
+
+    def register(self, division, replica=None, replica_name=None):
+        """Add (or replace) the replica of a division"""
+        division = division.upper()
+        self.replicas[division] = (os.path.join(self.work_dir, f"{division}_TOL.gdb") if replica is None else replica,
+                                   f"tol_{division.lower()}" if replica_name is None else replica_name)
+
+        return self.replicas[division]
+
+    def unregister(self, division):
+        return self.replicas.pop(division.upper(), None)
+
+    def run(self):
+        os.makedirs(self.work_dir, exist_ok=True)
+        tasks = [(div, self.sde, self.platform, self.database, replica, name, self.force_sync)
+                 for div, (replica, name) in self.replicas.items()]
+        if not tasks:
+            print(f"[INFO]\tNo replica to synchronize")
+            return pd.DataFrame(columns=["Cycle", "Division", "Replica", "Created", "Synced", "Changes", "Seconds",
+                                         "Error"])
+        cycle = datetime.now().isoformat(timespec='seconds')
+
+        rows = []
+        with worker_pool(processes=max(1, min(self.connections, len(tasks)))) as pool:
+            results = tqdm(pool.imap_unordered(_sync_replica, tasks),
+                           total=len(tasks),
+                           desc="Replicas",
+                           position=0,
+                           colour='GREEN')
+            for row in results:
+                rows.append(row)
+            pool.close()
+            pool.join()
+
+        df = pd.DataFrame(rows).sort_values("Division").reset_index(drop=True)
+        df = df.fillna({c: 0.0 for c in df.columns if c.endswith("Seconds")})
+        df.insert(0, "Cycle", cycle)
+
+        # one csv across cycles, to follow the sync durations over time
+        os.makedirs(self.report_out_dir, exist_ok=True)
+        self.report_file = os.path.join(self.report_out_dir, "TOL_replica_sync.csv")
+        history = pd.read_csv(self.report_file) if os.path.isfile(self.report_file) else None
+        pd.concat([history, df], ignore_index=True).to_csv(self.report_file, index=False)
+        print(f"[INFO]\t{len(tasks)} replicas synchronized in {df['Seconds'].max():.1f}s, report {self.report_file}")
+
+        export("tol_replicas")
+
+        return df
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(sde_connection={self.sde}, replicas={list(self.replicas)}, " \
+               f"connections={self.connections})"
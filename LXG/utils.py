@@ -1,35 +1,24 @@
 import os
 import errno
-import arcpy
+import time
 import tempfile
 from datetime import datetime
+from itertools import islice
 import multiprocessing as mp
 from tqdm import tqdm
 import shutil
-import logging
-import logging.handlers
 import numpy as np
-from .assets import BRSO
+import pandas as pd
+from osgeo import osr
 
+try:
+    import arcpy
+except ImportError:
+    arcpy = None
 
-class LXGLogging(logging.handlers.RotatingFileHandler):
-    def emitlog(self, record):
-        """
-        Write the log message
-        """
-        try:
-            msg = record.msg.format(record.args)
-        except:
-            msg = record.msg
-
-        if record.levelno >= logging.ERROR:
-            arcpy.AddError(msg)
-        elif record.levelno >= logging.WARNING:
-            arcpy.AddWarning(msg)
-        elif record.levelno >= logging.INFO:
-            arcpy.AddMessage(msg)
-
-        super(LXGLogging, self).emitlog(record)
+from .assets import BRSO, BRSO_WKT
+from .geometry import RaggedGeometry
+from .logger import LXGLogging, setup_logging, worker_pool
 
 
 class MigrationLog:
@@ -47,18 +36,8 @@ class MigrationLog:
             os.remove(self.file)
 
     def create(self):
-        logger = logging.getLogger("MIGRATION")
-        handler = LXGLogging(
-            self.file,
-            maxBytes=1024 * 1024 * 2,
-            backupCount=10
-        )
-        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        logger.setLevel(logging.DEBUG)
-
-        return logger
+        """Logger writing to this log file (and its .jsonl twin), safe to call repeatedly and from pool workers"""
+        return setup_logging("MIGRATION", self.file)
 
 
 class ReplicationLog:
@@ -78,18 +57,8 @@ class ReplicationLog:
             os.remove(self.file)
 
     def create(self):
-        logger = logging.getLogger("REPLICATION")
-        handler = LXGLogging(
-            self.file,
-            maxBytes=1024 * 1024 * 2,
-            backupCount=10
-        )
-        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-        logger.setLevel(logging.DEBUG)
-
-        return logger
+        """Logger writing to this log file (and its .jsonl twin), safe to call repeatedly and from pool workers"""
+        return setup_logging("REPLICATION", self.file)
 
 
 class ToBRSO:
@@ -103,7 +72,7 @@ class ToBRSO:
         if len(dss) > 0:
             ds_list = [os.path.join(self.gdb, ds) for ds in dss]
 
-            with mp.Pool(processes=4) as pool:
+            with worker_pool(processes=4) as pool:
                 results = tqdm(pool.imap(self.define, ds_list),
                                total=len(ds_list),
                                desc='BRSO - Dataset',
@@ -117,7 +86,7 @@ class ToBRSO:
         if len(fclasses) > 0:
             fc_list = [os.path.join(self.gdb, fc) for fc in fclasses]
 
-            with mp.Pool(processes=4) as pool:
+            with worker_pool(processes=4) as pool:
                 results = tqdm(pool.imap(self.define, fc_list),
                                total=len(fc_list),
                                desc='BRSO - Featureclass',
@@ -134,11 +103,154 @@ class ToBRSO:
             arcpy.AddError(e)
 
 
+class ReprojectToBRSO:
+    """Reproject every simple feature class of a geodatabase into BRSO.
+
+    Unlike `ToBRSO`, which only defines the projection, the coordinates are transformed.
+    Features are read in batches of `batch_size`, all vertices of a batch go through a single
+    GDAL coordinate transformation call, and the result is written into `output_geodatabase`
+    with the same dataset/featureclass layout. Layers are processed in parallel.
+
+    Args:
+        geodatabase: source geodatabase, eg. WGS84 or Timbalai/RSO survey delivery
+        output_geodatabase: target FileGDB, created if it does not exist
+        batch_size (optional): number of features per transformation call
+        processes (optional): number of layers reprojected in parallel
+        wildcard_datasets (optional): wildcard for interested dataset layer(s)
+        wildcard_featureclass (optional): wildcard for interested featureclass layer(s)
+
+    Usage:
+        ```
+        stats = ReprojectToBRSO(r"C:\Datasets\survey_wgs84.gdb", r"C:\Datasets\survey_brso.gdb").run()
+        ```
+
+    Returns:
+        dataframe of FeatureClasses, Points, Seconds and PointsPerSecond
+    """
+    def __init__(self, geodatabase, output_geodatabase, batch_size=100000, processes=4,
+                 wildcard_datasets="*", wildcard_featureclass="*"):
+        self.gdb = geodatabase
+        self.out_gdb = output_geodatabase
+        self.batch_size = batch_size
+        self.processes = processes
+        self.wildcard_ds = wildcard_datasets
+        self.wildcard_fc = wildcard_featureclass
+
+    def run(self):
+        start = time.time()
+        layers = self.create_schema()
+
+        stats = []
+        if len(layers) > 0:
+            with worker_pool(processes=self.processes) as pool:
+                results = tqdm(pool.imap(self.reproject, layers),
+                               total=len(layers),
+                               desc='BRSO - Reproject',
+                               position=0,
+                               colour='GREEN')
+                stats = [r for r in results if r is not None]
+                pool.close()
+                pool.join()
+
+        df = pd.DataFrame(stats, columns=['FeatureClasses', 'Points', 'Seconds'])
+        df['PointsPerSecond'] = df['Points'] / df['Seconds'].clip(lower=1e-9)
+
+        elapsed = time.time() - start
+        total = int(df['Points'].sum())
+        arcpy.AddMessage(f'[INFO]\tReprojected {total} points in {elapsed:.1f}s '
+                         f'({total / max(elapsed, 1e-9):,.0f} points/sec)')
+
+        arcpy.ClearWorkspaceCache_management()
+
+        return df
+
+    def create_schema(self):
+        """Create BRSO datasets and empty featureclasses in output geodatabase (in main process, to avoid schema locks)"""
+        crs = BRSO()
+        if not arcpy.Exists(self.out_gdb):
+            arcpy.CreateFileGDB_management(os.path.dirname(self.out_gdb), os.path.basename(self.out_gdb))
+
+        arcpy.env.workspace = self.gdb
+        layers = []
+        for ds in [None] + sorted(arcpy.ListDatasets(self.wildcard_ds, "Feature")):
+            out_path = self.out_gdb
+            if ds is not None:
+                out_path = os.path.join(self.out_gdb, ds)
+                if not arcpy.Exists(out_path):
+                    arcpy.CreateFeatureDataset_management(self.out_gdb, ds, crs)
+
+            for fc in sorted(arcpy.ListFeatureClasses(self.wildcard_fc, "", ds)):
+                src = os.path.join(self.gdb, ds, fc) if ds is not None else os.path.join(self.gdb, fc)
+                desc = arcpy.Describe(src)
+                if desc.featureType != 'Simple':
+                    arcpy.AddWarning(f'{fc} is {desc.featureType}, skipped')
+                    continue
+
+                dst = os.path.join(out_path, fc)
+                try:
+                    if not arcpy.Exists(dst):
+                        arcpy.CreateFeatureclass_management(out_path, fc, desc.shapeType.upper(),
+                                                            template=src,
+                                                            has_m="ENABLED" if desc.hasM else "DISABLED",
+                                                            has_z="ENABLED" if desc.hasZ else "DISABLED",
+                                                            spatial_reference=crs)
+                    layers.append([src, dst])
+                except arcpy.ExecuteError as e:
+                    arcpy.AddError(e)
+
+        return layers
+
+    def reproject(self, layer):
+        src, dst = layer
+        start = time.time()
+        points = 0
+        try:
+            transformation = brso_transformation(arcpy.Describe(src).spatialReference.exportToString())
+            crs = BRSO()
+            fields = [f.name for f in arcpy.ListFields(src)
+                      if f.editable is True and f.type not in ('OID', 'Geometry', 'GlobalID', 'Raster')]
+
+            with arcpy.da.SearchCursor(src, fields + ["SHAPE@WKB"]) as rows, \
+                    arcpy.da.InsertCursor(dst, fields + ["SHAPE@"]) as cursor:
+                while True:
+                    batch = list(islice(rows, self.batch_size))
+                    if not batch:
+                        break
+
+                    geoms = RaggedGeometry.from_wkb(row[-1] for row in batch)
+                    if geoms.num_points > 0:
+                        geoms.coords[:, :2] = np.asarray(transformation.TransformPoints(geoms.xy))[:, :2]
+                    points += geoms.num_points
+
+                    for row, wkb in zip(batch, geoms.to_wkb()):
+                        cursor.insertRow(row[:-1] + (arcpy.FromWKB(wkb, crs) if wkb is not None else None,))
+        except (arcpy.ExecuteError, RuntimeError, ValueError) as e:
+            arcpy.AddError(f'{src}: {e}')
+            return None
+
+        return os.path.basename(dst), points, time.time() - start
+
+
+def brso_transformation(source_wkt):
+    """GDAL coordinate transformation from an ESRI/OGC WKT coordinate system to BRSO (x/y axis order)"""
+    source = osr.SpatialReference()
+    source.SetFromUserInput(source_wkt)
+    target = osr.SpatialReference()
+    target.SetFromUserInput(BRSO_WKT())
+    if hasattr(osr, 'OAMS_TRADITIONAL_GIS_ORDER'):
+        source.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        target.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+    return osr.CoordinateTransformation(source, target)
+
+
 class ToShapefile:
-    def __init__(self, geodatabase, output_directory, checklist=None):
+    def __init__(self, geodatabase, output_directory, checklist=None, frozen=None):
         self.gdb = geodatabase
         self.dir = output_directory
         self.checklist = checklist
+        # `LXG.FrozenRegistry`, its layers already exported are not exported again
+        self.frozen = frozen
 
         os.makedirs(self.dir, exist_ok=True)
 
@@ -158,6 +270,8 @@ class ToShapefile:
                 if len(fcs) > 0:
                     for fc in fcs:
                         # pbar02.set_description(fc)
+                        if self.skip(fc):
+                            continue
                         desc = arcpy.Describe(fc)
                         if desc.FeatureType != 'Annotation':
                             try:
@@ -195,6 +309,8 @@ class ToShapefile:
                     # pbar02 = tqdm(fc_list, position=1, colour='YELLOW', leave=False)
                     for fc in fc_list:
                         # pbar02.set_description(fc)
+                        if self.skip(fc):
+                            continue
                         desc = arcpy.Describe(fc)
                         if desc.FeatureType != 'Annotation':
                             try:
@@ -227,6 +343,11 @@ class ToShapefile:
 
         arcpy.ClearWorkspaceCache_management()
 
+    def skip(self, featureclass):
+        """True for a frozen featureclass with its shapefile already in the output directory"""
+        return self.frozen is not None and self.frozen.is_frozen(featureclass) and \
+            os.path.isfile(os.path.join(self.dir, f"{featureclass}.shp"))
+
     def column_names(self, featureclass):
         field_names = []
         avoid_this = ['GLOBALID',
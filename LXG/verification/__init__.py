@@ -0,0 +1 @@
+from .verification import Verification
@@ -0,0 +1,292 @@
+"""
+Author : Lerry William
+
+Tiered verification (count, summary, sample, hash) of a replication against its source, per featureclass.
+"""
+import os
+import math
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from tqdm import tqdm
+from ..apis import get_backend, basename, oid_ranges, where_ranges
+from ..apis.base import SKIP_TYPES, OID, GEOMETRY, xy_resolution
+from ..geometry import RaggedGeometry, areas, lengths
+from ..canonical import canonical_hashes
+from ..snapshot import Snapshot, SnapshotBackend, canonical_columns, field_types
+from ..logger import worker_pool
+from ..metrics import span, export
+
+PASS = "PASS"
+FAIL = "FAIL"
+MISSING = "MISSING"
+ERROR = "ERROR"
+# relative tolerance of the area / length sums
+RELATIVE = 1e-6
+
+
+def layers(backend, workspace, datasets_wildcard="*", featureclass_wildcard="*"):
+    """{featureclass name: path} of a workspace, SDE owner prefixes removed"""
+    return {basename(fc): os.path.join(workspace, ds, fc)
+            for ds in backend.list_datasets(workspace, datasets_wildcard)
+            for fc in backend.list_featureclasses(workspace, featureclass_wildcard, "All", ds)}
+
+
+def attribute_fields(backend, featureclass):
+    """{upper case name: name} of the fields compared by the hash tier, shape and OID fields excluded"""
+    return {name.upper(): name for name, ftype, _ in backend.describe(featureclass)["fields"]
+            if ftype not in SKIP_TYPES and not name.upper().startswith("SHAPE")}
+
+
+def summary(geoms):
+    """extent and total area / length of a layer"""
+    xy = geoms.xy
+    extent = np.r_[xy.min(axis=0), xy.max(axis=0)] if len(xy) else np.zeros(4)
+
+    return extent, areas(geoms).sum(), lengths(geoms).sum()
+
+
+def same_summary(a, b, tolerance):
+    """True when the extents are within `tolerance` (meters) and the sums within `RELATIVE`"""
+    return np.allclose(a[0], b[0], rtol=0.0, atol=tolerance) and \
+        all(np.isclose(x, y, rtol=RELATIVE, atol=tolerance) for x, y in zip(a[1:], b[1:]))
+
+
+def content_hashes(backend, featureclass, fields, resolution, where=None):
+    """Series of the uint64 hash of every row (attribute `fields` and snapped geometry) indexed by OID,
+    the rows matching any of the `where` clauses when given"""
+    df = pd.concat([backend.read(featureclass, fields, w) for w in where], ignore_index=True) \
+        if where is not None else backend.read(featureclass, fields)
+    df = canonical_columns(df, {f: t for f, t in field_types(backend.describe(featureclass)).items() if f in fields})
+    df[GEOMETRY] = canonical_hashes(RaggedGeometry.from_wkb(df[GEOMETRY]), resolution)
+    df.columns = [c.upper() for c in df.columns]
+
+    return pd.Series(pd.util.hash_pandas_object(df[sorted(c.upper() for c in fields) + [GEOMETRY.upper()]],
+                                                index=False).values, index=df[OID].values)
+
+
+def mismatch_bound(mismatched, sampled, confidence=0.95):
+    """Upper bound (Clopper-Pearson, one-sided) of the mismatch rate given `mismatched` of `sampled` rows"""
+    if sampled == 0 or mismatched >= sampled:
+        return 1.0
+    if mismatched == 0:
+        return 1.0 - (1.0 - confidence) ** (1.0 / sampled)
+
+    def cdf(p):
+        # P(X <= mismatched) for X ~ Binomial(sampled, p)
+        return sum(math.exp(math.lgamma(sampled + 1) - math.lgamma(k + 1) - math.lgamma(sampled - k + 1) +
+                            k * math.log(p) + (sampled - k) * math.log1p(-p)) for k in range(mismatched + 1))
+
+    low, high = mismatched / sampled, 1.0
+    for _ in range(60):
+        mid = (low + high) / 2.0
+        low, high = (mid, high) if cdf(mid) > 1.0 - confidence else (low, mid)
+
+    return high
+
+
+def where_values(field, values, max_terms=1000):
+    """`field IN (...)` clauses of at most `max_terms` values, texts quoted"""
+    values = [f"'{str(v).replace(chr(39), chr(39) * 2)}'" if isinstance(v, str) else str(v) for v in values]
+    for i in range(0, len(values), max_terms):
+        yield f"{field} IN ({', '.join(values[i:i + max_terms])})"
+
+
+def _hash_tier(backends, name, source, target, resolution):
+    """Rows of source without an identical row in target, every row hashed"""
+    src_backend, tgt_backend = backends
+    with span("hash", layer=name) as s:
+        src_fields, tgt_fields = attribute_fields(src_backend, source), attribute_fields(tgt_backend, target)
+        common = sorted(set(src_fields) & set(tgt_fields))
+        before = content_hashes(src_backend, source, [src_fields[f] for f in common], resolution)
+        after = content_hashes(tgt_backend, target, [tgt_fields[f] for f in common], resolution)
+        # hashes as multisets, the OIDs of both sides need not match
+        diff = before.value_counts().sub(after.value_counts(), fill_value=0)
+        s.rows = len(before) + len(after)
+
+    return int(diff[diff > 0].sum())
+
+
+def _sample_tier(backends, name, source, target, resolution, size, seed, match=None):
+    """(sampled, mismatched) rows of a reproducible random sample of the source OIDs, paired on the OID or `match`"""
+    src_backend, tgt_backend = backends
+    with span("sample", layer=name) as s:
+        src_fields, tgt_fields = attribute_fields(src_backend, source), attribute_fields(tgt_backend, target)
+        common = sorted(set(src_fields) & set(tgt_fields))
+        oids = np.fromiter((oid for oid, in src_backend.search(source, ["OID@"])), dtype=np.int64)
+        rng = np.random.default_rng([seed, zlib.crc32(name.encode("utf-8"))])
+        sample = np.sort(rng.choice(oids, size=min(size, len(oids)), replace=False))
+
+        where = list(where_ranges(src_backend.describe(source)["oid_field"], oid_ranges(sample)))
+        before = content_hashes(src_backend, source, [src_fields[f] for f in common], resolution, where)
+        if match is None:
+            where = list(where_ranges(tgt_backend.describe(target)["oid_field"], oid_ranges(sample)))
+            after = content_hashes(tgt_backend, target, [tgt_fields[f] for f in common], resolution, where)
+        else:
+            keys = pd.concat([src_backend.read(source, [src_fields[match.upper()]], w) for w in where],
+                             ignore_index=True)
+            keys = pd.Series(keys[src_fields[match.upper()]].values, index=keys[OID].values)
+            where = list(where_values(tgt_fields[match.upper()], keys.dropna().unique().tolist()))
+            tgt_keys = pd.concat([tgt_backend.read(target, [tgt_fields[match.upper()]], w) for w in where],
+                                 ignore_index=True)
+            after = content_hashes(tgt_backend, target, [tgt_fields[f] for f in common], resolution, where)
+            # source OID -> target OID through the key, keys used twice on a side do not pair
+            tgt_keys = tgt_keys.drop_duplicates(tgt_fields[match.upper()], keep=False)
+            pairs = pd.Series(tgt_keys[OID].values, index=tgt_keys[tgt_fields[match.upper()]].values)
+            keys = keys[~keys.duplicated(keep=False)]
+            after = pd.Series(after.reindex(pairs.reindex(keys.values).values).values, index=keys.index)
+        s.rows = len(before)
+
+    paired = after.reindex(before.index)
+    return len(before), int((paired.isna() | (paired.values != before.values)).sum())
+
+
+def _verify_layer(args):
+    """Pool task: verify one featureclass, returns its report row"""
+    name, source, target, backends, tolerance, resolution, full, sample, confidence, seed, match = args
+    backends = src_backend, tgt_backend = get_backend(backends[0]), get_backend(backends[1])
+
+    start = time.perf_counter()
+    row = dict(FeatureClass=name, Status=MISSING, Tier=None, SourceCount=None, TargetCount=None, Mismatched=None,
+               Sampled=None, MismatchBound=None)
+    try:
+        if target is None:
+            return dict(**row, Seconds=0.0, Error=None)
+
+        if resolution is None:
+            resolution = xy_resolution(src_backend.describe(source))
+        with span("count", layer=name):
+            row.update(Tier="count", SourceCount=src_backend.count(source), TargetCount=tgt_backend.count(target))
+        if row["SourceCount"] != row["TargetCount"]:
+            row.update(Status=FAIL, Mismatched=abs(row["SourceCount"] - row["TargetCount"]))
+        else:
+            matched = False
+            if sample is not None and row["SourceCount"] > sample:
+                # a clean sample bounds the mismatch rate, a dirty one calls for the full check
+                row["Tier"] = "sample"
+                sampled, mismatched = _sample_tier(backends, name, source, target, resolution, sample, seed, match)
+                row.update(Sampled=sampled, MismatchBound=mismatch_bound(mismatched, sampled, confidence))
+                matched = mismatched == 0
+            elif sample is None and not full:
+                with span("summary", layer=name):
+                    row["Tier"] = "summary"
+                    matched = same_summary(summary(RaggedGeometry.from_wkb(src_backend.read(source, [])[GEOMETRY])),
+                                           summary(RaggedGeometry.from_wkb(tgt_backend.read(target, [])[GEOMETRY])),
+                                           tolerance)
+            if matched:
+                row.update(Status=PASS, Mismatched=0)
+            else:
+                row["Tier"] = "hash"
+                row["Mismatched"] = _hash_tier(backends, name, source, target, resolution)
+                row["Status"] = PASS if row["Mismatched"] == 0 else FAIL
+                if row["Sampled"] is not None:
+                    # the full check measured the rate
+                    row["MismatchBound"] = row["Mismatched"] / max(row["SourceCount"], 1)
+        error = None
+    except Exception as e:
+        row["Status"], error = ERROR, str(e)
+
+    return dict(**row, Seconds=round(time.perf_counter() - start, 3), Error=error)
+
+
+class Verification:
+    """Compare the featureclasses of a replica with their source.
+
+    Args:
+        source: source workspace (file geodatabase or SDE connection) or `LXG.Snapshot`
+        target: replicated workspace or `LXG.Snapshot`
+        datasets_wildcard (optional): Query for interested dataset layer(s)
+        feature_wildcard (optional): Query for interested featureclass layer(s)
+        processes (optional): layers verified in parallel, default 4
+        tolerance (optional): difference of the extents allowed, in meters, default 0.001
+        resolution (optional): coordinates are snapped to it (meters) before hashing, default the XY resolution
+            of each source featureclass
+        full (optional): hash every layer with equal counts, not only those with other summaries
+        sample (optional): rows sampled per layer instead of the summary tier, layers not larger are hashed
+            in full, default no sampling
+        confidence (optional): confidence of the mismatch rate bound of the sampled layers, default 0.95
+        seed (optional): seed of the samples, the same seed draws the same OIDs
+        match (optional): unique field pairing the sampled rows, default the OID
+        report_output_directory (optional): directory of the csv report,
+            default ~/Documents/GIS_Reports/Verification
+        backend (optional): "arcpy", "ogr" or a `LXG.apis.Backend`, default arcpy when available
+
+    Usage:
+        ```
+        df = Verification(r"C:\\LXG\\KCH_CMS.gdb", r"C:\\LXG\\connections\\kch.sde").run()
+        df[df.Status != "PASS"]
+        ```
+
+    Returns:
+        dataframe of FeatureClass, Status (PASS, FAIL, MISSING, ERROR), Tier (count, summary, sample, hash),
+        SourceCount, TargetCount, Mismatched, Sampled, MismatchBound, Seconds and Error
+    """
+    def __init__(self, source, target, datasets_wildcard="*", feature_wildcard="*", processes=4,
+                 tolerance=0.001, resolution=None, full=False, sample=None, confidence=0.95, seed=0, match=None,
+                 report_output_directory=None, backend=None):
+        self.source = source
+        self.target = target
+        self.ds_wildcard = "*" if not datasets_wildcard else datasets_wildcard
+        self.fc_wildcard = "*" if not feature_wildcard else feature_wildcard
+        self.processes = max(1, processes)
+        self.tolerance = tolerance
+        self.resolution = resolution
+        self.full = full
+        self.sample = sample
+        self.confidence = confidence
+        self.seed = seed
+        self.match = match
+        self.report_out_dir = os.path.join(os.path.expanduser('~'), "Documents", "GIS_Reports", "Verification") \
+            if report_output_directory is None else report_output_directory
+        self.report_file = None
+        self.backend = get_backend(backend)
+
+    def side(self, workspace):
+        """(backend, workspace path) of the source or the target, snapshots are read by `SnapshotBackend`"""
+        if isinstance(workspace, Snapshot):
+            return SnapshotBackend(), workspace.path
+        return self.backend, workspace
+
+    def run(self):
+        (src_backend, source), (tgt_backend, target) = self.side(self.source), self.side(self.target)
+        with span("catalog"):
+            src = layers(src_backend, source, self.ds_wildcard, self.fc_wildcard)
+            tgt = layers(tgt_backend, target, self.ds_wildcard, self.fc_wildcard)
+        # backends go by name into the workers, the snapshot one has no state and is pickled as is
+        backends = tuple(b if isinstance(b, SnapshotBackend) else b.name for b in (src_backend, tgt_backend))
+        tasks = [(name, path, tgt.get(name), backends, self.tolerance, self.resolution, self.full,
+                  self.sample, self.confidence, self.seed, self.match)
+                 for name, path in sorted(src.items())]
+
+        rows = []
+        with worker_pool(processes=max(1, min(self.processes, len(tasks)))) as pool:
+            results = tqdm(pool.imap_unordered(_verify_layer, tasks),
+                           total=len(tasks),
+                           desc="Verify",
+                           position=0,
+                           colour='GREEN')
+            for row in results:
+                rows.append(row)
+            pool.close()
+            pool.join()
+
+        df = pd.DataFrame(rows, columns=["FeatureClass", "Status", "Tier", "SourceCount", "TargetCount",
+                                         "Mismatched", "Sampled", "MismatchBound", "Seconds", "Error"])
+        df = df.sort_values("FeatureClass").reset_index(drop=True)
+
+        os.makedirs(self.report_out_dir, exist_ok=True)
+        self.report_file = os.path.join(self.report_out_dir,
+                                        f"verification_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        df.to_csv(self.report_file, index=False)
+        failed = int((df["Status"] != PASS).sum())
+        self.backend.message(f"[INFO]\t{len(df) - failed}/{len(df)} featureclasses verified, report {self.report_file}")
+
+        export("verification")
+
+        return df
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(source={self.source}, target={self.target}, " \
+               f"processes={self.processes}, backend={self.backend.name})"
@@ -0,0 +1,261 @@
+"""
+Benchmark cases. Each case gets the context of one data size:
+    ctx = {"init": path, "latest": path, "truth": path to ground truth csv, "workdir": scratch dir, "size": lots}
+and returns the number of items (features, layers, ...) it processed, for throughput.
+
+`setup` runs untimed before every repetition and its result is passed to the case as `state`.
+"""
+import os
+import shutil
+import pandas as pd
+from osgeo import gdal, ogr
+
+gdal.UseExceptions()
+ogr.UseExceptions()
+
+CASES = {}
+
+
+class Case:
+    def __init__(self, name, func, setup=None, requires=()):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.requires = tuple(requires)
+
+    def missing(self, ctx):
+        """Reason why the case cannot run here, None if it can"""
+        for req in self.requires:
+            if req == "arcpy":
+                try:
+                    import arcpy  # noqa: F401
+                except ImportError:
+                    return "arcpy not available"
+            elif req == "gdb" and not ctx["init"].endswith(".gdb"):
+                return "needs FileGDB data"
+
+        return None
+
+
+def case(name, setup=None, requires=()):
+    def decorator(func):
+        CASES[name] = Case(name, func, setup, requires)
+        return func
+    return decorator
+
+
+@case("count_ogr")
+def count_ogr(ctx, state=None):
+    from LXG import OGRDataLoader
+    df = OGRDataLoader(ctx["init"]).features_count()
+    return int(df["Count"].sum())
+
+
+@case("count_arcpy", requires=("arcpy", "gdb"))
+def count_arcpy(ctx, state=None):
+    from LXG import DataLoader
+    df = DataLoader(ctx["init"]).featureclasses()
+    return int(df["Count"].sum())
+
+
+def _inventories(ctx):
+    from LXG import OGRDataLoader
+    init = OGRDataLoader(ctx["init"]).features_count()
+    latest = OGRDataLoader(ctx["latest"]).features_count()
+    # scale the inventories with the data size: one row per 100 lots, like a division-wide catalog
+    copies = max(1, ctx["size"] // 100)
+    grow = lambda df: pd.concat([df.assign(FeatureClasses=df["FeatureClasses"] + f"_{i}") for i in range(copies)],
+                                ignore_index=True)
+    return grow(init), grow(latest)
+
+
+@case("check_differences", setup=_inventories)
+def check_differences(ctx, state):
+    from LXG import CheckDifferences
+    df_init, df_latest = state
+    check = CheckDifferences(df_init, df_latest)
+    check.missing()
+    check.change()
+    check.nochange()
+    check.empty()
+    return len(df_latest)
+
+
+@case("change_detection")
+def change_detection(ctx, state=None):
+    """TOLNewFeatures over every polygon layer: centroids of both geodatabases and the 0.02 m grid join"""
+    from LXG import TOLNewFeatures
+    check = TOLNewFeatures(ctx["init"], ctx["latest"], "KCH", datasets_wildcard="*", featureclass_wildcard="*",
+                           backend="ogr", report=False)
+    return sum(len(oids) for layers in check.centroids.values() for _, oids, _ in layers.values())
+
+
+def _shapefile_dir(ctx):
+    out_dir = os.path.join(ctx["workdir"], "shapefile")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    return out_dir
+
+
+@case("export_shapefile", setup=_shapefile_dir)
+def export_shapefile(ctx, out_dir):
+    try:
+        from LXG import ToShapefile
+    except ImportError:
+        ToShapefile = None
+
+    if ToShapefile is not None and ctx["init"].endswith(".gdb"):
+        ToShapefile(ctx["init"], out_dir).run()
+    else:
+        gdal.VectorTranslate(out_dir, ctx["init"], format="ESRI Shapefile")
+
+    ds = ogr.Open(out_dir)
+    return sum(ds.GetLayerByIndex(i).GetFeatureCount() for i in range(ds.GetLayerCount()))
+
+
+def _target_copy(ctx):
+    ext = os.path.splitext(ctx["init"])[1]
+    target = os.path.join(ctx["workdir"], f"append_target{ext}")
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    elif os.path.exists(target):
+        os.remove(target)
+    gdal.VectorTranslate(target, ctx["init"], format="OpenFileGDB" if ext == ".gdb" else "GPKG")
+    return target
+
+
+@case("append", setup=_target_copy)
+def append(ctx, target):
+    """AppendNewFeatures of latest into a copy of init: detection, append of the new features and their
+    shapefile export"""
+    from LXG import AppendNewFeatures
+    run = AppendNewFeatures(target, ctx["latest"], "KCH", backend="ogr")
+    return sum(len(oids) for oids in run.new_features.values())
+
+
+def _centroids(ctx):
+    from LXG.apis.ogr_backend import OGRBackend
+    backend = OGRBackend()
+    out = []
+    for name in backend.list_featureclasses(ctx["init"], "*", "Polygon"):
+        old = backend.centroids(os.path.join(ctx["init"], name))
+        new = backend.centroids(os.path.join(ctx["latest"], name))
+        out.append((new[0], new[1], old[1]))
+    shutil.rmtree(backend.scratch, ignore_errors=True)
+    return out
+
+
+@case("centroid_join", setup=_centroids)
+def centroid_join(ctx, layers):
+    """TOL detection: grid hash join of polygon centroids at 0.02 m"""
+    from LXG.spatial import new_points
+    items = 0
+    for new_oids, new_xy, old_xy in layers:
+        new_points(new_oids, new_xy, old_xy, 0.02)
+        items += len(new_oids) + len(old_xy)
+
+    return items
+
+
+@case("delete_oids", setup=_target_copy)
+def delete_oids(ctx, target):
+    """Delete the first half and every 3rd OID of the second half of each polygon layer of a copy of init"""
+    import numpy as np
+    from LXG.apis.ogr_backend import OGRBackend
+    backend = OGRBackend()
+    items = 0
+    for name in backend.list_featureclasses(target, "*", "Polygon"):
+        path = os.path.join(target, name)
+        oids, _ = backend.centroids(path)
+        half = len(oids) // 2
+        items += backend.delete_oids(path, np.r_[oids[:half], oids[half::3]])
+    shutil.rmtree(backend.scratch, ignore_errors=True)
+
+    return items
+
+
+def _polygons(ctx):
+    from LXG.apis.ogr_backend import OGRBackend
+    from LXG.geometry import RaggedGeometry
+    backend = OGRBackend()
+    out = []
+    for name in backend.list_featureclasses(ctx["init"], "*", "Polygon"):
+        wkbs = [wkb for _, wkb in backend.search(os.path.join(ctx["latest"], name), ["OID@", "SHAPE@WKB"])]
+        out.append((RaggedGeometry.from_wkb(wkbs), backend.centroids(os.path.join(ctx["init"], name))[1]))
+    shutil.rmtree(backend.scratch, ignore_errors=True)
+    return out
+
+
+@case("center_in", setup=_polygons)
+def center_in(ctx, layers):
+    """AppendNewFeatures duplicates: init centroids 0.2 m inside latest polygons, STR-tree point in polygon"""
+    from LXG.spatial import PolygonIndex
+    items = 0
+    for polygons, xy in layers:
+        PolygonIndex(polygons, shrink=0.2).locate(xy)
+        items += len(polygons) + len(xy)
+
+    return items
+
+
+@case("bulk_read")
+def bulk_read(ctx, state=None):
+    """Every layer of latest read as DataFrames of attributes and WKB through the Arrow stream"""
+    from LXG.apis.ogr_backend import OGRBackend
+    backend = OGRBackend()
+    items = 0
+    for ds in backend.list_datasets(ctx["latest"]):
+        for name in backend.list_featureclasses(ctx["latest"], "*", "All", ds):
+            for batch in backend.read_batches(os.path.join(ctx["latest"], name)):
+                items += len(batch)
+    shutil.rmtree(backend.scratch, ignore_errors=True)
+
+    return items
+
+
+def _geometries(ctx):
+    from LXG.apis.ogr_backend import OGRBackend
+    from LXG.geometry import RaggedGeometry
+    backend = OGRBackend()
+    out = []
+    for ds in backend.list_datasets(ctx["latest"]):
+        for name in backend.list_featureclasses(ctx["latest"], "*", "All", ds):
+            out.append(RaggedGeometry.from_wkb(backend.read(os.path.join(ctx["latest"], name), fields=[])["geometry"]))
+    shutil.rmtree(backend.scratch, ignore_errors=True)
+    return out
+
+
+@case("feature_points", setup=_geometries)
+def feature_points(ctx, layers):
+    """AppendNewFeatures points: polygon centroids and line midpoints of every latest layer, NumPy kernels"""
+    from LXG.geometry import feature_points as kernel
+    items = 0
+    for geoms in layers:
+        kernel(geoms)
+        items += len(geoms)
+
+    return items
+
+
+@case("canonical_hash", setup=_geometries)
+def canonical_hash(ctx, layers):
+    """64 bit canonical geometry hashes of every latest layer (snap, ring start and orientation)"""
+    from LXG.canonical import canonical_hashes
+    items = 0
+    for geoms in layers:
+        canonical_hashes(geoms)
+        items += len(geoms)
+
+    return items
+
+
+@case("canonical_hash_128", setup=_geometries)
+def canonical_hash_128(ctx, layers):
+    """128 bit canonical geometry hashes of every latest layer"""
+    from LXG.canonical import canonical_hashes
+    items = 0
+    for geoms in layers:
+        canonical_hashes(geoms, bits=128)
+        items += len(geoms)
+
+    return items
@@ -0,0 +1,204 @@
+"""
+End-to-end benchmarks of the LXG workflows on synthetic geodatabases (see `LXG.synthetic`).
+Runs on Linux with GDAL only, the arcpy cases are skipped when ArcGIS is not installed.
+
+Every case runs in a fresh process, so the peak resident memory reported is the one of the case.
+Results are appended to a history file (one JSON document per case and size) and compared against
+a stored baseline: a case slower than baseline by more than `--tolerance` is flagged and the run
+exits with status 1.
+
+Usage:
+    ```
+    python benchmarks/run.py --sizes 1000 10000 100000
+    python benchmarks/run.py --sizes 10000 --cases count_ogr append --save-baseline
+    ```
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import multiprocessing as mp
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [p for p in (ROOT, HERE) if p not in sys.path]
+
+from osgeo import gdal  # noqa: E402
+from cases import CASES  # noqa: E402
+
+RESULTS_DIR = os.path.join(HERE, "results")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset(workdir, size, fmt, seed=0):
+    """Synthetic init/latest pair for `size` lots, generated once and reused"""
+    from LXG.synthetic import SyntheticGDB
+    folder = os.path.join(workdir, str(size))
+    os.makedirs(folder, exist_ok=True)
+    init = os.path.join(folder, f"init.{fmt}")
+    latest = os.path.join(folder, f"latest.{fmt}")
+    truth = os.path.join(folder, "latest_truth.csv")
+
+    if not (os.path.exists(init) and os.path.exists(latest) and os.path.exists(truth)):
+        print(f"[INFO]\tGenerating {size} lots dataset in {folder}")
+        gen = SyntheticGDB(lots=size, seed=seed)
+        gen.create(init)
+        gen.create_latest(latest, inserts=0.01, edits=0.02, deletes=0.005)
+
+    return {"init": init, "latest": latest, "truth": truth, "workdir": folder, "size": size}
+
+
+def peak_rss():
+    """Peak resident memory of this process in MB, None when it cannot be measured"""
+    if resource is not None:
+        # ru_maxrss is in KB on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    # peak working set on Windows
+    return getattr(memory, "peak_wset", memory.rss) / 1024 ** 2
+
+
+def _measure(name, ctx, repeat, conn):
+    try:
+        case = CASES[name]
+        best, items = None, 0
+        for _ in range(repeat):
+            state = case.setup(ctx) if case.setup is not None else None
+            start = time.perf_counter()
+            items = case.func(ctx, state)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        rss = peak_rss()
+        conn.send({"seconds": best, "items": items, "peak_mb": None if rss is None else round(rss, 1)})
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def measure(name, ctx, repeat=1):
+    """Run one case in a new process, best of `repeat` runs"""
+    spawn = mp.get_context("spawn")
+    parent, child = spawn.Pipe(duplex=False)
+    proc = spawn.Process(target=_measure, args=(name, ctx, repeat, child))
+    proc.start()
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = {"error": f"process exited with code {proc.exitcode}"}
+    proc.join()
+
+    if "seconds" in result:
+        result["seconds"] = round(result["seconds"], 4)
+        result["throughput"] = round(result["items"] / result["seconds"], 1) if result["seconds"] else None
+
+    return result
+
+
+def load_baseline(filename):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename) as f:
+        return json.load(f)
+
+
+def compare(result, baseline, tolerance):
+    """Regression message, None when within tolerance (or no baseline)"""
+    base = baseline.get(f"{result['case']}@{result['size']}")
+    if base is None or "seconds" not in result:
+        return None
+    ratio = result["seconds"] / base["seconds"] if base["seconds"] else 1.0
+    result["baseline_seconds"] = base["seconds"]
+    result["ratio"] = round(ratio, 3)
+    if ratio > 1 + tolerance:
+        return f"{result['case']}@{result['size']}: {result['seconds']:.3f}s vs baseline {base['seconds']:.3f}s " \
+               f"(+{(ratio - 1) * 100:.0f}%)"
+
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LXG benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Lots per dataset")
+    parser.add_argument("--cases", nargs="+", default=None, choices=sorted(CASES), help="Cases to run (default all)")
+    parser.add_argument("--format", choices=["gpkg", "gdb"], default="gpkg")
+    parser.add_argument("--workdir", default=os.path.join(os.path.expanduser('~'), ".LXG_WORKSPACE", "benchmarks"))
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case, the best one is kept")
+    parser.add_argument("--history", default=os.path.join(RESULTS_DIR, "history.jsonl"))
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    names = args.cases or sorted(CASES)
+    baseline = load_baseline(args.baseline)
+    run = {"time": datetime.now().isoformat(timespec='seconds'), "commit": git_commit(),
+           "machine": platform.node(), "python": platform.python_version(), "gdal": gdal.__version__,
+           "cpus": os.cpu_count(), "format": args.format}
+
+    results, regressions = [], []
+    for size in args.sizes:
+        ctx = dataset(args.workdir, size, args.format)
+        for name in names:
+            reason = CASES[name].missing(ctx)
+            if reason is not None:
+                print(f"[SKIP]\t{name}@{size}: {reason}")
+                continue
+
+            result = dict(case=name, size=size, **measure(name, ctx, args.repeat))
+            if "error" in result:
+                print(f"[ERROR]\t{name}@{size}: {result['error']}")
+            else:
+                print(f"[INFO]\t{name}@{size}: {result['seconds']:.3f}s, {result['throughput']} items/s, "
+                      f"{result['peak_mb']} MB")
+            message = compare(result, baseline, args.tolerance)
+            if message is not None:
+                print(f"[REGRESSION]\t{message}")
+                regressions.append(message)
+            results.append(result)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, "a") as f:
+        for result in results:
+            f.write(json.dumps(dict(run, **result)) + "\n")
+
+    if args.save_baseline:
+        for result in results:
+            if "seconds" in result:
+                baseline[f"{result['case']}@{result['size']}"] = {k: result[k] for k in
+                                                                  ("seconds", "throughput", "peak_mb")}
+        with open(args.baseline, "w") as f:
+            json.dump(dict(baseline, _run=run), f, indent=2)
+        print(f"[INFO]\tBaseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"[WARNING]\t{len(regressions)} regression(s) against {args.baseline}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Attribute hashes follow the field types of `describe`, not the dtypes a backend happens to read.
+
+    python -m pytest -q tests
+"""
+import struct
+import numpy as np
+import pandas as pd
+from LXG.apis.base import Backend, OID, GEOMETRY
+from LXG.snapshot import row_hashes
+from LXG.verification.verification import content_hashes
+
+TYPES = {"AREA": "Double", "LOT_NO": "String", "SURVEYED": "Date"}
+
+
+def point(x, y):
+    return struct.pack("<BIdd", 1, 1, x, y)
+
+
+class FrameBackend(Backend):
+    """One featureclass read as a given dataframe"""
+    name = "frame"
+
+    def __init__(self, df):
+        self.df = df
+
+    def describe(self, featureclass):
+        return {"shape_type": "Point", "oid_field": "OBJECTID", "spatial_reference": None,
+                "fields": [("OBJECTID", "OID", False)] + [(f, t, True) for f, t in TYPES.items()]}
+
+    def read(self, featureclass, fields=None, where=None):
+        return self.df
+
+
+def frames():
+    """The same rows as read by two backends: integer vs float areas, None vs NaN and strings vs datetimes"""
+    a = pd.DataFrame({OID: [1, 2, 3], "AREA": np.array([10, 20, 30], dtype=np.int64),
+                      "LOT_NO": ["1", None, "3"], "SURVEYED": ["2010-01-02", None, "2011-05-06"],
+                      GEOMETRY: [point(0, 0), point(1, 1), point(2, 2)]})
+    b = pd.DataFrame({OID: [1, 2, 3], "AREA": [10.0, 20.0, 30.0],
+                      "LOT_NO": pd.Series(["1", np.nan, "3"], dtype=object),
+                      "SURVEYED": pd.to_datetime(["2010-01-02", None, "2011-05-06"]),
+                      GEOMETRY: [point(0, 0), point(1, 1), point(2, 2)]})
+    return a, b
+
+
+def test_row_hashes_by_field_type():
+    a, b = frames()
+    assert (row_hashes(a) != row_hashes(b)).any()
+    np.testing.assert_array_equal(row_hashes(a, TYPES), row_hashes(b, TYPES))
+
+    b.loc[1, "LOT_NO"] = "2"
+    assert (row_hashes(a, TYPES) != row_hashes(b, TYPES)).tolist() == [False, True, False]
+
+
+def test_content_hashes_by_field_type():
+    a, b = frames()
+    fields = list(TYPES)
+    pd.testing.assert_series_equal(content_hashes(FrameBackend(a), "A", fields, 0.001),
+                                   content_hashes(FrameBackend(b), "B", fields, 0.001))
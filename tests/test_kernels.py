@@ -0,0 +1,244 @@
+"""
+NumPy kernels against brute force loops on random geometries: centroids, midpoints, point in polygon,
+centroid join and canonical hashes.
+
+    python -m pytest -q tests
+"""
+import struct
+import numpy as np
+import pytest
+from LXG.geometry import RaggedGeometry, polygon_centroids, line_midpoints
+from LXG.spatial import PolygonIndex, new_points
+from LXG.canonical import canonical_hashes
+
+
+def ring_wkb(ring):
+    return struct.pack("<I", len(ring)) + np.asarray(ring, dtype="<f8").tobytes()
+
+
+def polygon_wkb(rings):
+    return struct.pack("<BII", 1, 3, len(rings)) + b"".join(ring_wkb(r) for r in rings)
+
+
+def multipolygon_wkb(polygons):
+    return struct.pack("<BII", 1, 6, len(polygons)) + b"".join(polygon_wkb(p) for p in polygons)
+
+
+def line_wkb(line):
+    return struct.pack("<BI", 1, 2) + ring_wkb(line)
+
+
+def multiline_wkb(lines):
+    return struct.pack("<BII", 1, 5, len(lines)) + b"".join(line_wkb(line) for line in lines)
+
+
+def closed(ring):
+    ring = np.asarray(ring, dtype=np.float64)
+    return np.vstack([ring, ring[:1]])
+
+
+def star(rng, centre, radius, vertices=None):
+    """Closed star shaped ring around `centre`, counterclockwise"""
+    n = rng.integers(3, 12) if vertices is None else vertices
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    r = rng.uniform(0.5, 1.0, n) * radius
+    return closed(np.column_stack([centre[0] + r * np.cos(angles), centre[1] + r * np.sin(angles)]))
+
+
+def hole(centre, half):
+    """Closed clockwise square around `centre`"""
+    x, y = centre
+    return closed([(x - half, y - half), (x - half, y + half), (x + half, y + half), (x + half, y - half)])
+
+
+def random_polygons(rng, n, cell=10.0):
+    """WKB of n disjoint (multi)polygons on a grid, some with holes, and their part rings"""
+    wkbs, shapes = [], []
+    columns = int(np.ceil(np.sqrt(n)))
+    for i in range(n):
+        origin = np.array([i % columns, i // columns]) * cell + 500_000.0
+        parts = []
+        for j in range(rng.integers(1, 3)):
+            centre = origin + np.array([cell / 4 + j * cell / 2, cell / 2])
+            rings = [star(rng, centre, cell / 4 * 0.9)]
+            if rng.random() < 0.4:
+                rings.append(hole(centre, cell / 4 * 0.9 * 0.3))
+            parts.append(rings)
+        wkbs.append(polygon_wkb(parts[0]) if len(parts) == 1 else multipolygon_wkb(parts))
+        shapes.append(parts)
+
+    return wkbs, shapes
+
+
+def shoelace(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+    area = cross.sum() / 2.0
+    return area, ((x[:-1] + x[1:]) * cross).sum() / (6 * area), ((y[:-1] + y[1:]) * cross).sum() / (6 * area)
+
+
+def brute_centroid(parts):
+    # relative to the first vertex, large coordinates would cancel out in the cross products
+    origin = parts[0][0][0]
+    total, cx, cy = 0.0, 0.0, 0.0
+    for rings in parts:
+        for k, ring in enumerate(rings):
+            area, x, y = shoelace(ring - origin)
+            weight = abs(area) * (1 if k == 0 else -1)
+            total, cx, cy = total + weight, cx + weight * x, cy + weight * y
+
+    return origin[0] + cx / total, origin[1] + cy / total
+
+
+def brute_midpoint(lines):
+    edges = [(a, b) for line in lines for a, b in zip(line[:-1], line[1:])]
+    half = sum(np.hypot(*(b - a)) for a, b in edges) / 2.0
+    for a, b in edges:
+        length = np.hypot(*(b - a))
+        if half <= length:
+            return a + (b - a) * (half / length)
+        half -= length
+
+    return edges[-1][1]
+
+
+def ray_casting(point, rings):
+    inside = False
+    for ring in rings:
+        for a, b in zip(ring[:-1], ring[1:]):
+            if (a[1] > point[1]) != (b[1] > point[1]):
+                x = a[0] + (point[1] - a[1]) * (b[0] - a[0]) / (b[1] - a[1])
+                inside ^= point[0] < x
+
+    return inside
+
+
+def boundary_distance(point, rings):
+    best = np.inf
+    for ring in rings:
+        for a, b in zip(ring[:-1], ring[1:]):
+            t = np.clip(np.dot(point - a, b - a) / np.dot(b - a, b - a), 0.0, 1.0)
+            best = min(best, np.hypot(*(point - (a + t * (b - a)))))
+
+    return best
+
+
+def test_polygon_centroids():
+    rng = np.random.default_rng(0)
+    wkbs, shapes = random_polygons(rng, 300)
+    result = polygon_centroids(RaggedGeometry.from_wkb(wkbs))
+    expected = np.array([brute_centroid(parts) for parts in shapes])
+
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-6)
+
+
+def test_polygon_centroids_ring_orientation():
+    rng = np.random.default_rng(1)
+    wkbs, shapes = random_polygons(rng, 50)
+    flipped = [multipolygon_wkb([[ring[::-1] for ring in rings] for rings in parts]) for parts in shapes]
+
+    np.testing.assert_allclose(polygon_centroids(RaggedGeometry.from_wkb(flipped)),
+                               polygon_centroids(RaggedGeometry.from_wkb(wkbs)), rtol=0, atol=1e-6)
+
+
+def test_line_midpoints():
+    rng = np.random.default_rng(2)
+    wkbs, expected = [], []
+    for _ in range(300):
+        lines = [np.cumsum(rng.normal(0, 5, (rng.integers(2, 8), 2)), axis=0) + 300_000.0
+                 for _ in range(rng.integers(1, 4))]
+        wkbs.append(line_wkb(lines[0]) if len(lines) == 1 else multiline_wkb(lines))
+        expected.append(brute_midpoint(lines))
+
+    np.testing.assert_allclose(line_midpoints(RaggedGeometry.from_wkb(wkbs)), np.array(expected), rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize("shrink", [0.0, 0.2])
+def test_polygon_index_locate(shrink):
+    rng = np.random.default_rng(3)
+    wkbs, shapes = random_polygons(rng, 100)
+    rings = [[ring for part in parts for ring in part] for parts in shapes]
+    points = rng.uniform(500_000.0, 500_100.0, (2000, 2))
+
+    expected = np.full(len(points), -1)
+    for i, point in enumerate(points):
+        for g, polygon in enumerate(rings):
+            if ray_casting(point, polygon):
+                distance = boundary_distance(point, polygon) if shrink else np.inf
+                if abs(distance - shrink) < 1e-6:
+                    # on the shrunk boundary, either answer is right
+                    expected[i] = -2
+                elif distance > shrink:
+                    expected[i] = g
+                break
+
+    result = PolygonIndex(RaggedGeometry.from_wkb(wkbs), shrink=shrink).locate(points)
+    known = expected != -2
+    np.testing.assert_array_equal(result[known], expected[known])
+
+
+def test_new_points():
+    rng = np.random.default_rng(4)
+    old_xy = rng.uniform(0, 100, (2000, 2)) + 600_000.0
+    # half of the new points are old ones moved by less than the tolerance
+    new_xy = np.vstack([old_xy[:1000] + rng.uniform(-0.01, 0.01, (1000, 2)),
+                        rng.uniform(0, 100, (1000, 2)) + 600_000.0])
+    new_oids = np.arange(len(new_xy)) + 1
+
+    oids, xy = new_points(new_oids, new_xy, old_xy, 0.02)
+    distance = np.hypot(*(new_xy[:, None, :] - old_xy[None, :, :]).transpose(2, 0, 1)).min(axis=1)
+    expected = new_oids[distance > 0.02]
+
+    np.testing.assert_array_equal(np.sort(oids), expected)
+    np.testing.assert_array_equal(xy, new_xy[np.isin(new_oids, oids)])
+
+
+@pytest.fixture
+def parcel():
+    """Polygon with a hole, vertices on the 0.001 grid"""
+    exterior = closed([(1000.0, 2000.0), (1010.0, 2000.0), (1012.5, 2006.0), (1004.0, 2011.0), (998.0, 2005.0)])
+    inner = closed([(1003.0, 2003.0), (1003.0, 2005.0), (1005.0, 2005.0), (1005.0, 2003.0)])
+    return exterior, inner
+
+
+def hashes(wkbs, **kwargs):
+    return canonical_hashes(RaggedGeometry.from_wkb(wkbs), resolution=0.001, **kwargs)
+
+
+@pytest.mark.parametrize("bits", [64, 128])
+def test_canonical_hashes_invariance(parcel, bits):
+    exterior, inner = parcel
+    rotated = closed(np.roll(exterior[:-1], 2, axis=0))
+    rng = np.random.default_rng(5)
+    jitter = lambda ring: ring + rng.uniform(-0.0004, 0.0004, ring.shape)
+    variants = [polygon_wkb([exterior, inner]),
+                polygon_wkb([rotated, inner]),
+                polygon_wkb([exterior[::-1], inner[::-1]]),
+                polygon_wkb([closed(np.roll(exterior[:-1], 3, axis=0))[::-1], closed(np.roll(inner[:-1], 1, axis=0))]),
+                multipolygon_wkb([[exterior, inner]]),
+                polygon_wkb([jitter(exterior), jitter(inner)])]
+
+    result = hashes(variants, bits=bits).reshape(len(variants), -1)
+    assert (result == result[0]).all()
+
+
+def test_canonical_hashes_differences(parcel):
+    exterior, inner = parcel
+    moved = exterior.copy()
+    moved[[1]] += 0.01
+    shapes = [polygon_wkb([exterior, inner]),
+              polygon_wkb([exterior]),
+              polygon_wkb([moved, inner]),
+              polygon_wkb([exterior + 1.0, inner + 1.0]),
+              polygon_wkb([inner[::-1]]),
+              line_wkb(exterior)]
+
+    assert len(set(hashes(shapes).tolist())) == len(shapes)
+
+
+def test_canonical_hashes_lines():
+    line = np.array([(0.0, 0.0), (5.0, 1.0), (7.0, 4.0)]) + 700_000.0
+    wkbs = [line_wkb(line), line_wkb(line[::-1]), multiline_wkb([line])]
+
+    assert len(set(hashes(wkbs).tolist())) == 1
+    assert len(set(hashes(wkbs[:2], directed=True).tolist())) == 2
@@ -0,0 +1,52 @@
+"""
+Business-key pre-matching: only the rows not matched on key and geometry reach the spatial stage.
+
+    python -m pytest -q tests
+"""
+import struct
+import numpy as np
+import pandas as pd
+from LXG.apis.base import OID, GEOMETRY
+from LXG.keyindex import key_frame, match_keys, unmatched
+
+KEY = ["DISTRICT", "LOT_NO"]
+
+
+def point(x, y):
+    return struct.pack("<BIdd", 1, 1, x, y)
+
+
+def frame(rows):
+    return key_frame(pd.DataFrame(rows, columns=[OID] + KEY + [GEOMETRY]), KEY)
+
+
+def test_match_keys():
+    init = frame([(1, "KCH", "1", point(0, 0)),
+                  (2, "KCH", "2", point(10, 0)),
+                  (3, "KCH", "3", point(20, 0)),
+                  (4, "KCH", "4", point(30, 0)),
+                  (5, "KCH", "5", point(40, 0)),
+                  (6, "KCH", "5", point(50, 0)),
+                  (7, "KCH", None, point(60, 0))])
+    latest = frame([(101, "KCH", "1", point(0, 0)),             # unchanged
+                    (102, "KCH", "2", point(10.00002, 0)),       # same geometry once snapped
+                    (103, "KCH", "3", point(21, 0)),             # moved
+                    (104, "BTU", "4", point(30, 0)),             # key changed
+                    (105, "KCH", "5", point(40, 0)),             # key not unique in init
+                    (107, "KCH", None, point(60, 0)),            # key missing
+                    (108, "KCH", "8", point(70, 0))])            # new
+
+    latest_oids, init_oids = match_keys(init, latest, KEY)
+    assert sorted(zip(latest_oids, init_oids)) == [(101, 1), (102, 2)]
+
+    spatial = latest[OID].to_numpy()[unmatched(latest[OID].to_numpy(), latest_oids)]
+    np.testing.assert_array_equal(spatial, [103, 104, 105, 107, 108])
+    np.testing.assert_array_equal(init[OID].to_numpy()[unmatched(init[OID].to_numpy(), init_oids)], [3, 4, 5, 6, 7])
+
+
+def test_match_keys_nothing_in_common():
+    init = frame([(1, "KCH", "1", point(0, 0))])
+    latest = frame([(2, "KCH", "1", point(5, 5))])
+
+    latest_oids, init_oids = match_keys(init, latest, KEY)
+    assert len(latest_oids) == len(init_oids) == 0
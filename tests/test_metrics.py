@@ -0,0 +1,28 @@
+"""
+Spans measured in pool workers reach the main registry whatever the level of the log.
+
+    python -m pytest -q tests
+"""
+import logging
+from LXG.logger import setup_logging, worker_pool, drain, shutdown
+from LXG.metrics import span, registry
+
+
+def work(i):
+    with span("work", layer=f"L{i}") as s:
+        s.rows = i
+    return i
+
+
+def test_worker_spans_at_info_level(tmp_path):
+    setup_logging("LXG.TEST", str(tmp_path / "test.log"), level=logging.INFO)
+    registry.clear()
+    try:
+        with worker_pool(2) as pool:
+            assert pool.map(work, range(4)) == [0, 1, 2, 3]
+        drain()
+        assert [(r["layer"], r["rows"]) for r in registry.records()] == [("L0", 0), ("L1", 1), ("L2", 2), ("L3", 3)]
+        assert "DEBUG" not in (tmp_path / "test.log").read_text()
+    finally:
+        registry.clear()
+        shutdown()
@@ -0,0 +1,68 @@
+"""
+AppendNewFeatures detection stages on an in-memory backend.
+
+    python -m pytest -q tests
+"""
+import struct
+import numpy as np
+import pandas as pd
+from LXG.apis.base import Backend, OID, GEOMETRY
+from LXG.replication import AppendNewFeatures
+from LXG.geometry import polygon_centroids
+
+
+def square(x, y, size=10.0):
+    ring = np.array([(x, y), (x + size, y), (x + size, y + size), (x, y + size), (x, y)], dtype="<f8")
+    return struct.pack("<BIII", 1, 3, 1, len(ring)) + ring.tobytes()
+
+
+class MemoryBackend(Backend):
+    """Featureclasses as dataframes of OID, LOT_NO and WKB geometry"""
+    name = "memory"
+
+    def __init__(self, layers):
+        self.layers = layers
+
+    def describe(self, featureclass):
+        return {"shape_type": "Polygon", "oid_field": "OBJECTID", "spatial_reference": None,
+                "fields": [("OBJECTID", "OID", False), ("LOT_NO", "String", True), ("SHAPE", "Geometry", True)]}
+
+    def read_batches(self, featureclass, fields=None, where=None, batch_size=65536):
+        yield self.layers[featureclass][[OID] + list(fields) + [GEOMETRY]]
+
+
+def lots(rows):
+    return pd.DataFrame(rows, columns=[OID, "LOT_NO", GEOMETRY])
+
+
+def detector(backend, business_key):
+    run = AppendNewFeatures.__new__(AppendNewFeatures)
+    run.gdb1, run.gdb2 = "init.gdb", "latest.gdb"
+    run.backend = backend
+    run.business_key = business_key
+    run.points, run.keys, run.frozen = {}, {}, None
+    return run
+
+
+def test_business_key_prematching():
+    init = lots([(1, "A1", square(0, 0)), (2, "A2", square(20, 0)), (3, "A3", square(40, 0))])
+    # A1 unchanged, A2 reshaped, A3 gone, A4 new
+    latest = lots([(11, "A1", square(0, 0)), (12, "A2", square(20, 0, 12.0)), (14, "A4", square(60, 0))])
+    run = detector(MemoryBackend({"init.gdb/DS/LOT": init, "latest.gdb/DS/LOT": latest}), ["LOT_NO"])
+
+    run._prepare(["init.gdb/DS/LOT", "init.gdb"], polygon_centroids)
+    run._prepare(["latest.gdb/DS/LOT", "latest.gdb"], polygon_centroids)
+    assert set(run.keys) == {("gdb1", "LOT"), ("gdb2", "LOT")}
+
+    oids, xy, old_xy = run.key_match("LOT", *run.points[("gdb2", "LOT")], *run.points[("gdb1", "LOT")])
+    np.testing.assert_array_equal(oids, [12, 14])
+    np.testing.assert_allclose(old_xy, [(25.0, 5.0), (45.0, 5.0)])
+
+
+def test_without_business_key():
+    init = lots([(1, "A1", square(0, 0))])
+    run = detector(MemoryBackend({"init.gdb/DS/LOT": init}), [])
+
+    run._prepare(["init.gdb/DS/LOT", "init.gdb"], polygon_centroids)
+    assert run.keys == {}
+    np.testing.assert_allclose(run.points[("gdb1", "LOT")][1], [(5.0, 5.0)])